@@ -0,0 +1,87 @@
+import argparse
+import os
+import time
+
+import runtime_profile  # noqa: F401  tuned thread/batch settings, before numpy loads
+import numpy as np
+import pandas as pd
+
+# === Streaming cohort scoring for the Alzheimer's regressor ===
+# Usage: python alz_batch.py cohort.csv -o scored.csv [--chunk-rows 100000]
+# The CSV is read in fixed-size chunks, so memory stays bounded however large
+# the input is. Feature columns are matched by name, in any order; other
+# columns (IDs etc.) are passed through to the output. Rows with missing or
+# non-numeric features get a NaN probability and the band "Missing values".
+# Output goes to a temporary file that replaces out_path only when the whole
+# input has been scored, so a failed run never leaves a truncated result.
+
+CHUNK_ROWS = 100_000
+HIGH_RISK = 0.7
+MODERATE_RISK = 0.4
+
+def risk_bands(probs):
+    # Same thresholds as AlzheimerApp.show_result
+    return np.select([probs >= HIGH_RISK, probs >= MODERATE_RISK], ["High", "Moderate"], default="Low")
+
+def check_columns(columns, feature_names):
+    missing = [name for name in feature_names if name not in columns]
+    if missing:
+        raise ValueError(f"Missing {len(missing)} feature column(s): {', '.join(missing)}")
+
+def score_chunk(chunk, feature_names, scaler, regressor):
+    features = chunk[feature_names].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=np.float64)
+    ok = np.isfinite(features).all(axis=1)
+    probs = np.full(len(features), np.nan)
+    if ok.any():
+        probs[ok] = regressor.predict(scaler.transform(np.ascontiguousarray(features[ok])))
+    chunk = chunk.copy()
+    chunk["risk_probability"] = probs
+    chunk["risk_band"] = np.where(ok, risk_bands(probs), "Missing values")
+    return chunk
+
+def _append(chunk, out_path, first):
+    if out_path.lower().endswith((".jsonl", ".json")):
+        text = chunk.to_json(orient="records", lines=True) if len(chunk) else ""
+        with open(out_path, "w" if first else "a", encoding="utf-8") as f:
+            f.write(text if not text or text.endswith("\n") else text + "\n")
+    else:
+        chunk.to_csv(out_path, mode="w" if first else "a", header=first, index=False)
+
+def score_csv(in_path, out_path, feature_names, scaler, regressor, chunk_rows=CHUNK_ROWS, progress=None):
+    """Scores in_path chunk by chunk into out_path. Returns (rows, seconds)."""
+    check_columns(pd.read_csv(in_path, nrows=0).columns, feature_names)
+
+    base, ext = os.path.splitext(out_path)
+    tmp_path = f"{base}.partial{ext}"  # same extension: _append picks the format from it
+    start = time.perf_counter()
+    rows = 0
+    try:
+        for i, chunk in enumerate(pd.read_csv(in_path, chunksize=chunk_rows)):
+            _append(score_chunk(chunk, feature_names, scaler, regressor), tmp_path, first=(i == 0))
+            rows += len(chunk)
+            if progress:
+                progress(rows, time.perf_counter() - start)
+        if rows == 0:
+            _append(pd.DataFrame(columns=list(feature_names) + ["risk_probability", "risk_band"]), tmp_path, True)
+        os.replace(tmp_path, out_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return rows, time.perf_counter() - start
+
+if __name__ == "__main__":
+    import alz_gui
+
+    parser = argparse.ArgumentParser(description="Score every row of an Alzheimer's cohort CSV.")
+    parser.add_argument("input")
+    parser.add_argument("-o", "--output", default="alz_scored.csv", help=".csv or .jsonl")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    args = parser.parse_args()
+
+    def progress(rows, elapsed):
+        print(f"\r{rows} rows ({rows / max(elapsed, 1e-9):.0f} rows/sec)", end="", flush=True)
+
+    rows, elapsed = score_csv(args.input, args.output, alz_gui.feature_names, alz_gui.get_scaler(),
+                              alz_gui.get_regressor(), args.chunk_rows, progress)
+    print(f"\nScored {rows} rows in {elapsed:.2f}s ({rows / max(elapsed, 1e-9):.0f} rows/sec) -> {args.output}")
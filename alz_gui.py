@@ -1,83 +1,115 @@
+from startup_timer import lazy_import, mark, warm_up_in_background
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
-import joblib
 import numpy as np
-import os
-import pandas as pd
 import subprocess
 import sys
-
-# --- Load model and scaler ---
-MODEL_DIR = r"C:\Users\anasr\Desktop\machine learnng\alz\alz_models"
-regressor = joblib.load(os.path.join(MODEL_DIR, "stacked_regressor.pkl"))
-scaler = joblib.load(os.path.join(MODEL_DIR, "scaler.pkl"))
-
-feature_names = [
-    "Age", "Gender", "Ethnicity", "EducationLevel", "BMI", "Smoking", "AlcoholConsumption",
-    "PhysicalActivity", "DietQuality", "SleepQuality", "FamilyHistoryAlzheimers",
-    "CardiovascularDisease", "Diabetes", "Depression", "HeadInjury", "Hypertension",
-    "SystolicBP", "DiastolicBP", "CholesterolTotal", "CholesterolLDL", "CholesterolHDL",
-    "CholesterolTriglycerides", "MMSE", "FunctionalAssessment", "MemoryComplaints",
-    "BehavioralProblems", "ADL", "Confusion", "Disorientation", "PersonalityChanges",
-    "DifficultyCompletingTasks", "Forgetfulness"
-]
-
-# --- Window Setup ---
-root = tk.Tk()
-root.title("🧠 Alzheimer's Risk Prediction")
-root.state('zoomed')  # Fullscreen for Windows
+import model_registry
+from inference_executor import TaskStatus
+from stage_timer import stage, timed
+from audit_log import audit
+
+# --- Model and scaler (loaded on first use, alz_models/ under the model root) ---
+def get_regressor():
+    return model_registry.load("alz.regressor")
+
+def get_scaler():
+    return model_registry.load("alz.scaler")
+
+def warm_up():
+    get_scaler()
+    get_regressor()
+
+# Inference, run on the background executor
+@timed("alz.predict")
+def predict_risk(features):
+    with audit("alz", "alz.regressor", inputs=features) as record:
+        scaler = get_scaler()
+        with stage("alz.scaler"):
+            scaled = scaler.transform(features)
+        regressor = get_regressor()
+        with stage("alz.regressor"):
+            record.output = regressor.predict(scaled)[0]
+    return record.output
+
+feature_names = model_registry.features("alz")  # model input order
+
+# Streams a whole cohort CSV through the regressor in chunks (see alz_batch.py)
+def score_file(in_path, out_path):
+    alz_batch = lazy_import("alz_batch")
+    with audit("alz", "alz.regressor", inputs=in_path) as record:
+        rows, seconds = alz_batch.score_csv(in_path, out_path, feature_names, get_scaler(), get_regressor())
+        record.output = {"rows": rows, "path": out_path}
+    return rows, seconds
 
 def return_to_main_menu():
-    root.destroy()
     if getattr(sys, 'frozen', False):
         subprocess.Popen(["main_menu.py"])
     else:
         subprocess.Popen([sys.executable, "main_menu.py"])
 
-def on_close():
-    return_to_main_menu()
-
-root.protocol("WM_DELETE_WINDOW", on_close)
-
-# --- Title ---
-header = tk.Label(root, text="Alzheimer's Risk Probability Predictor", font=("Helvetica", 20, "bold"), fg="darkblue")
-header.pack(pady=10)
-
-# --- Layout Frames ---
-main_frame = ttk.Frame(root)
-main_frame.pack(padx=20, pady=10, expand=True)
-
-left_frame = ttk.Frame(main_frame)
-right_frame = ttk.Frame(main_frame)
-
-left_frame.grid(row=0, column=0, padx=25, sticky="n")
-right_frame.grid(row=0, column=1, padx=25, sticky="n")
-
-entries = {}
-mid_index = len(feature_names) // 2
-left_features = feature_names[:mid_index]
-right_features = feature_names[mid_index:]
-
-for i, name in enumerate(left_features):
-    ttk.Label(left_frame, text=name, width=25).grid(row=i, column=0, sticky="w", pady=2)
-    e = ttk.Entry(left_frame, width=20)
-    e.grid(row=i, column=1, pady=2)
-    entries[name] = e
-
-for i, name in enumerate(right_features):
-    ttk.Label(right_frame, text=name, width=25).grid(row=i, column=0, sticky="w", pady=2)
-    e = ttk.Entry(right_frame, width=20)
-    e.grid(row=i, column=1, pady=2)
-    entries[name] = e
-
-# --- Button Functions ---
-def predict():
-    try:
-        values = [float(entries[name].get()) for name in feature_names]
-        features = np.array(values).reshape(1, -1)
-        scaled = scaler.transform(features)
-        prob = regressor.predict(scaled)[0]
-
+# --- Window Setup ---
+class AlzheimerApp(tk.Frame):
+    def __init__(self, master, on_back=None):
+        super().__init__(master)
+        self.on_back = on_back
+        warm_up_in_background("alz_gui", warm_up)
+
+        # --- Title ---
+        header = tk.Label(self, text="Alzheimer's Risk Probability Predictor", font=("Helvetica", 20, "bold"), fg="darkblue")
+        header.pack(pady=10)
+
+        # --- Layout Frames ---
+        main_frame = ttk.Frame(self)
+        main_frame.pack(padx=20, pady=10, expand=True)
+
+        left_frame = ttk.Frame(main_frame)
+        right_frame = ttk.Frame(main_frame)
+
+        left_frame.grid(row=0, column=0, padx=25, sticky="n")
+        right_frame.grid(row=0, column=1, padx=25, sticky="n")
+
+        self.entries = {}
+        mid_index = len(feature_names) // 2
+        left_features = feature_names[:mid_index]
+        right_features = feature_names[mid_index:]
+
+        for i, name in enumerate(left_features):
+            ttk.Label(left_frame, text=name, width=25).grid(row=i, column=0, sticky="w", pady=2)
+            e = ttk.Entry(left_frame, width=20)
+            e.grid(row=i, column=1, pady=2)
+            self.entries[name] = e
+
+        for i, name in enumerate(right_features):
+            ttk.Label(right_frame, text=name, width=25).grid(row=i, column=0, sticky="w", pady=2)
+            e = ttk.Entry(right_frame, width=20)
+            e.grid(row=i, column=1, pady=2)
+            self.entries[name] = e
+
+        # --- Buttons ---
+        button_frame = ttk.Frame(self)
+        button_frame.pack(pady=20)
+
+        ttk.Button(button_frame, text="📂 Load from File", command=self.load_from_file).pack(side=tk.LEFT, padx=15)
+        ttk.Button(button_frame, text="🧠 Predict Risk", command=self.predict).pack(side=tk.LEFT, padx=15)
+        ttk.Button(button_frame, text="📊 Score Cohort CSV", command=self.score_cohort).pack(side=tk.LEFT, padx=15)
+        ttk.Button(button_frame, text="🔙 Back to Main Menu", command=self.back_to_main_menu).pack(side=tk.LEFT, padx=15)
+
+        self.tasks = TaskStatus(self)
+        self.tasks.pack()
+
+    # --- Button Functions ---
+    def predict(self):
+        try:
+            values = [float(self.entries[name].get()) for name in feature_names]
+            features = np.array(values).reshape(1, -1)
+        except Exception as e:
+            messagebox.showerror("Input Error", f"Please enter valid numerical values.\n\n{e}")
+            return
+        self.tasks.submit(predict_risk, features, on_done=self.show_result,
+                          on_error=lambda e: messagebox.showerror("Input Error", f"Please enter valid numerical values.\n\n{e}"))
+
+    def show_result(self, prob):
         result = f"Predicted Risk Probability: {prob:.3f}\n"
         if prob >= 0.7:
             result += "🔴 High Risk of Alzheimer's"
@@ -86,43 +118,71 @@ def predict():
         else:
             result += "🟢 Low Risk"
 
+        mark("first_prediction")
         messagebox.showinfo("Prediction Result", result)
-    except Exception as e:
-        messagebox.showerror("Input Error", f"Please enter valid numerical values.\n\n{e}")
-
-def load_from_file():
-    path = filedialog.askopenfilename(filetypes=[("Text/CSV Files", "*.txt *.csv")])
-    if not path:
-        return
-    try:
-        if path.endswith(".txt"):
-            with open(path, "r") as f:
-                values = [float(x.strip()) for x in f.readlines()]
-        elif path.endswith(".csv"):
-            df = pd.read_csv(path)
-            if df.shape[0] > 1:
-                df = df.iloc[0:1]
-            values = df.iloc[0].tolist()
-        else:
-            raise ValueError("Unsupported file type")
-
-        if len(values) != len(feature_names):
-            raise ValueError(f"Expected {len(feature_names)} values, got {len(values)}")
-
-        for name, val in zip(feature_names, values):
-            entries[name].delete(0, tk.END)
-            entries[name].insert(0, str(val))
-
-        messagebox.showinfo("Loaded", "Values loaded successfully from file.")
-    except Exception as e:
-        messagebox.showerror("File Error", f"Error loading file:\n\n{e}")
-
-# --- Buttons ---
-button_frame = ttk.Frame(root)
-button_frame.pack(pady=20)
-
-ttk.Button(button_frame, text="📂 Load from File", command=load_from_file).pack(side=tk.LEFT, padx=15)
-ttk.Button(button_frame, text="🧠 Predict Risk", command=predict).pack(side=tk.LEFT, padx=15)
-ttk.Button(button_frame, text="🔙 Back to Main Menu", command=return_to_main_menu).pack(side=tk.LEFT, padx=15)
 
-root.mainloop()
+    def load_from_file(self):
+        path = filedialog.askopenfilename(filetypes=[("Text/CSV Files", "*.txt *.csv")])
+        if not path:
+            return
+        try:
+            if path.endswith(".txt"):
+                with open(path, "r") as f:
+                    values = [float(x.strip()) for x in f.readlines()]
+            elif path.endswith(".csv"):
+                pd = lazy_import("pandas")
+                df = pd.read_csv(path, nrows=1)  # only the first row is shown
+                if all(name in df.columns for name in feature_names):
+                    df = df[feature_names]
+                values = df.iloc[0].tolist()
+            else:
+                raise ValueError("Unsupported file type")
+
+            if len(values) != len(feature_names):
+                raise ValueError(f"Expected {len(feature_names)} values, got {len(values)}")
+
+            for name, val in zip(feature_names, values):
+                self.entries[name].delete(0, tk.END)
+                self.entries[name].insert(0, str(val))
+
+            messagebox.showinfo("Loaded", "Values loaded successfully from file.")
+        except Exception as e:
+            messagebox.showerror("File Error", f"Error loading file:\n\n{e}")
+
+    # Scores every row of a cohort file (chunked, runs on the background executor)
+    def score_cohort(self):
+        in_path = filedialog.askopenfilename(filetypes=[("CSV Files", "*.csv")])
+        if not in_path:
+            return
+        out_path = filedialog.asksaveasfilename(defaultextension=".csv", initialfile="alz_scored.csv",
+                                                filetypes=[("CSV", "*.csv"), ("JSON Lines", "*.jsonl")])
+        if not out_path:
+            return
+
+        def done(result):
+            rows, elapsed = result
+            messagebox.showinfo("Scoring Complete", f"Scored {rows} rows in {elapsed:.1f}s "
+                                f"({rows / max(elapsed, 1e-9):.0f} rows/sec)\n\nSaved to {out_path}")
+
+        self.tasks.submit(score_file, in_path, out_path, on_done=done,
+                          on_error=lambda e: messagebox.showerror("Scoring Error", str(e)))
+
+    def back_to_main_menu(self):
+        if self.on_back:
+            self.on_back()
+            return
+        self.winfo_toplevel().destroy()
+        return_to_main_menu()
+
+if __name__ == "__main__":
+    root = tk.Tk()
+    root.title("🧠 Alzheimer's Risk Prediction")
+    root.state('zoomed')  # Fullscreen for Windows
+
+    app = AlzheimerApp(root)
+    app.pack(fill="both", expand=True)
+    root.protocol("WM_DELETE_WINDOW", app.back_to_main_menu)
+    root.update()
+    mark("first_window")
+
+    root.mainloop()
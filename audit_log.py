@@ -0,0 +1,312 @@
+import argparse
+import atexit
+import hashlib
+import json
+import os
+import queue
+import sys
+import threading
+import time
+import zlib
+from datetime import datetime
+
+from stage_timer import trace
+from startup_timer import lazy_import
+
+# === Prediction audit log ===
+# Every prediction entry point wraps its work in audit(module, model, inputs)
+# and sets record.output. On exit the record (time, module, model, inputs,
+# output or error, total and per-stage timings) goes onto an in-memory queue;
+# the caller never touches the disk. A background thread writes the queue in
+# batches, at least once per FLUSH_INTERVAL_S.
+#
+# Files: one segment per process under MEDAI_AUDIT_DIR (default audit_log/),
+# <YYYYmmdd-HHMMSS>-<pid>.audit, rotated daily and at MEDAI_AUDIT_SEGMENT_MB.
+# Each batch is one gzip member of JSON lines, so segments are append-only and
+# `zcat` reads them. A <segment>.idx sidecar holds one line per batch (offset,
+# length, time range, modules, models); queries decompress only the batches
+# that can match.
+#
+# Inputs are stored as values when small (feature rows), otherwise as a
+# sha256 and shape; file paths as path + content sha256. Hashing happens on
+# the writer thread, so arrays passed as inputs must not be modified afterwards.
+#
+#   python audit_log.py query --since 2026-10-01 --module heart [--model heart.random_forest]
+#   python audit_log.py stats                 # counts, errors and latency per module/model
+#   MEDAI_AUDIT=0 python main_menu.py         # no audit records
+
+ENABLED = os.environ.get("MEDAI_AUDIT", "1") != "0"
+AUDIT_DIR = os.environ.get("MEDAI_AUDIT_DIR", "audit_log")
+SEGMENT_BYTES = int(float(os.environ.get("MEDAI_AUDIT_SEGMENT_MB", "16")) * 2**20)
+FLUSH_INTERVAL_S = 1.0
+BATCH_RECORDS = 512
+MAX_PENDING = 10000       # records queued beyond this are dropped (and counted), never waited for
+MAX_INLINE_VALUES = 64    # larger arrays are stored as a hash
+
+_local = threading.local()
+
+# === Recording (prediction threads) ===
+class Record:
+    __slots__ = ("module", "model", "inputs", "output", "ts", "start", "stages", "_trace", "_enabled")
+
+    def __init__(self, module, model, inputs, enabled):
+        self.module = module
+        self.model = model
+        self.inputs = inputs
+        self.output = None
+        self._enabled = enabled
+
+    def __enter__(self):
+        if self._enabled:
+            _local.active = True
+            self.ts = time.time()
+            self._trace = trace()
+            self.stages = self._trace.__enter__()
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if not self._enabled:
+            return
+        total = time.perf_counter() - self.start
+        self._trace.__exit__()
+        _local.active = False
+        error = f"{exc_type.__name__}: {exc}" if exc_type is not None else None
+        writer().put((self.ts, self.module, self.model, self.inputs, self.output, total, self.stages, error))
+
+def audit(module, model=None, inputs=None):
+    """with audit("heart", "heart.random_forest", inputs=x) as record: ...; record.output = prob
+
+    Inside another audit on the same thread (e.g. a WAV prediction calling the
+    feature prediction) this is a no-op, so one inference is one record.
+    """
+    return Record(module, model, inputs, ENABLED and not getattr(_local, "active", False))
+
+# === Encoding (writer thread) ===
+def _digest_array(a):
+    if a.dtype == object:
+        data = "\x1f".join(map(str, a.ravel())).encode("utf-8")
+    else:
+        data = a.tobytes()
+    return {"sha256": hashlib.sha256(data).hexdigest(), "shape": list(a.shape), "dtype": str(a.dtype)}
+
+def describe(value, files=False):
+    """JSON-ready form of an input (files=True: paths get a content hash) or output."""
+    np = lazy_import("numpy")
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, str):
+        if files and os.path.isfile(value):
+            return {"path": value, "sha256": lazy_import("feature_extractor").file_digest(value)}
+        return value
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, dict):
+        return {str(k): describe(v, files) for k, v in value.items()}
+    if isinstance(value, (list, tuple)) and any(isinstance(v, (str, dict, tuple)) for v in value):
+        return [describe(v, files) for v in value]
+    if hasattr(value, "to_numpy"):  # pandas
+        value = value.to_numpy()
+    a = np.asarray(value)
+    if a.size <= MAX_INLINE_VALUES and a.dtype != object:
+        return a.tolist()
+    return _digest_array(np.ascontiguousarray(a))
+
+def encode(item):
+    ts, module, model, inputs, output, total, stages, error = item
+    record = {"ts": round(ts, 3), "module": module, "model": model, "input": describe(inputs, files=True),
+              "output": describe(output), "total_ms": round(total * 1000, 3),
+              "stages_ms": {name: round(s * 1000, 3) for name, s in stages.items()}}
+    if error is not None:
+        record["error"] = error
+    return record
+
+# === Writer ===
+class AuditWriter:
+    def __init__(self, root=AUDIT_DIR, segment_bytes=SEGMENT_BYTES):
+        self.root = root
+        self.segment_bytes = segment_bytes
+        self.queue = queue.Queue(MAX_PENDING)
+        self.dropped = 0
+        self.written = 0
+        self.write_errors = 0
+        self._segment = None
+        self._segment_day = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True, name="audit-writer")
+        self._thread.start()
+
+    def put(self, item):
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        stop = False
+        while not stop:
+            item = self.queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = time.monotonic() + FLUSH_INTERVAL_S
+            while len(batch) < BATCH_RECORDS:
+                try:
+                    item = self.queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            self._write(batch)
+
+    def _segment_path(self, ts):
+        day = time.strftime("%Y%m%d", time.localtime(ts))
+        if (self._segment is None or day != self._segment_day
+                or os.path.getsize(self._segment) >= self.segment_bytes):
+            os.makedirs(self.root, exist_ok=True)
+            stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(ts))
+            self._segment = os.path.join(self.root, f"{stamp}-{os.getpid()}.audit")
+            n = 1
+            while os.path.exists(self._segment):  # rotated twice within a second
+                n += 1
+                self._segment = os.path.join(self.root, f"{stamp}-{os.getpid()}-{n}.audit")
+            self._segment_day = day
+        return self._segment
+
+    def _write(self, batch):
+        try:
+            records = [encode(item) for item in batch]
+            data = "".join(json.dumps(r, default=str, separators=(",", ":")) + "\n" for r in records)
+            compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31: one gzip member
+            member = compressor.compress(data.encode("utf-8")) + compressor.flush()
+            path = self._segment_path(records[0]["ts"])
+            with open(path, "ab") as f:
+                offset = f.tell()
+                f.write(member)
+            index = {"offset": offset, "length": len(member), "count": len(records),
+                     "first": records[0]["ts"], "last": records[-1]["ts"],
+                     "modules": sorted({r["module"] for r in records}),
+                     "models": sorted({str(r["model"]) for r in records})}
+            with open(path + ".idx", "a", encoding="utf-8") as f:
+                f.write(json.dumps(index, separators=(",", ":")) + "\n")
+            self.written += len(records)
+        except Exception as e:  # auditing must never take the app down
+            self.write_errors += 1
+            if self.write_errors == 1:
+                print(f"Audit log write failed: {e}", file=sys.stderr)
+
+    def close(self):
+        """Writes everything queued so far and stops the writer thread."""
+        if self._closed:
+            return
+        self._closed = True
+        self.queue.put(None)
+        self._thread.join()
+
+_writer = None
+_writer_lock = threading.Lock()
+
+def writer():
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = AuditWriter()
+                atexit.register(_writer.close)
+    return _writer
+
+# === Queries ===
+def _members(data):
+    # Yields decompressed gzip members until the data ends or a member is cut short
+    while data:
+        d = zlib.decompressobj(31)
+        try:
+            text = d.decompress(data)
+        except zlib.error:
+            return
+        if not d.eof:
+            return
+        yield text
+        data = d.unused_data
+
+def _read_batches(segment, wanted):
+    # Compressed bytes of the indexed batches wanted(entry) accepts, then any
+    # unindexed tail (a crash between the data and the index write)
+    index = []
+    if os.path.exists(segment + ".idx"):
+        with open(segment + ".idx", "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    index.append(json.loads(line))
+                except ValueError:
+                    break
+    with open(segment, "rb") as f:
+        for entry in index:
+            if wanted(entry):
+                f.seek(entry["offset"])
+                yield f.read(entry["length"])
+        f.seek(index[-1]["offset"] + index[-1]["length"] if index else 0)
+        tail = f.read()
+    if tail:
+        yield tail
+
+def segments(root=AUDIT_DIR):
+    if not os.path.isdir(root):
+        return []
+    return sorted(os.path.join(root, name) for name in os.listdir(root) if name.endswith(".audit"))
+
+def query(since=None, until=None, module=None, model=None, root=AUDIT_DIR):
+    """Yields audit records (dicts) with since <= ts <= until (epoch seconds) for module/model."""
+    def wanted(entry):
+        return not ((since is not None and entry["last"] < since) or (until is not None and entry["first"] > until)
+                    or (module is not None and module not in entry["modules"])
+                    or (model is not None and model not in entry["models"]))
+
+    for segment in segments(root):
+        for data in _read_batches(segment, wanted):
+            for text in _members(data):
+                for line in text.decode("utf-8").splitlines():
+                    record = json.loads(line)
+                    if ((since is None or record["ts"] >= since) and (until is None or record["ts"] <= until)
+                            and (module is None or record["module"] == module)
+                            and (model is None or str(record["model"]) == model)):
+                        yield record
+
+def stats(records):
+    groups = {}
+    for record in records:
+        groups.setdefault((record["module"], str(record["model"])), []).append(record)
+    rows = []
+    for (module, model), group in sorted(groups.items()):
+        latencies = sorted(r["total_ms"] for r in group)
+        times = [r["ts"] for r in group]
+        rows.append({"module": module, "model": model, "count": len(group),
+                     "errors": sum(1 for r in group if "error" in r),
+                     "p50_ms": latencies[len(latencies) // 2], "max_ms": latencies[-1],
+                     "first": datetime.fromtimestamp(min(times)).isoformat(timespec="seconds"),
+                     "last": datetime.fromtimestamp(max(times)).isoformat(timespec="seconds")})
+    return rows
+
+def _timestamp(text):
+    return datetime.fromisoformat(text).timestamp() if text else None
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Read the prediction audit log.")
+    parser.add_argument("command", choices=["query", "stats"])
+    parser.add_argument("--since", default=None, help="ISO date/time, e.g. 2026-10-01 or 2026-10-01T14:30")
+    parser.add_argument("--until", default=None, help="ISO date/time")
+    parser.add_argument("--module", default=None, help="brain, skin, heart, alz, park, py3")
+    parser.add_argument("--model", default=None, help="registry name, e.g. skin.voting")
+    parser.add_argument("--root", default=AUDIT_DIR)
+    args = parser.parse_args()
+
+    records = query(_timestamp(args.since), _timestamp(args.until), args.module, args.model, args.root)
+    if args.command == "query":
+        for record in records:
+            print(json.dumps(record))
+    else:
+        for row in stats(records):
+            print(f"{row['module']:<6} {row['model']:<28} {row['count']:>7} records {row['errors']:>5} errors  "
+                  f"p50 {row['p50_ms']:.1f}ms max {row['max_ms']:.1f}ms  {row['first']} .. {row['last']}")
@@ -0,0 +1,289 @@
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+import runtime_profile
+
+# === Thread and batch-size autotuner ===
+# Usage: python autotune.py [--workloads densenet keras sklearn] [--concurrent 2] [--root MODEL_ROOT]
+# Sweeps TensorFlow intra/inter-op threads and batch_size for the DenseNet
+# extractor, batch_size for the heart Keras model, and BLAS/OpenMP threads,
+# n_jobs and chunk rows for the sklearn/XGBoost ensembles. Thread pools are
+# sized when a process starts, so every thread setting runs in fresh
+# interpreters. --concurrent N runs N copies of each probe at once, as when N
+# modules share the machine: throughput is their sum, latency the worst copy.
+#
+# For each workload the chosen setting is the one with the fewest threads, then
+# the smallest batch, that keeps single-sample latency within LATENCY_SLACK of
+# the best and throughput within THROUGHPUT_SLACK of the best. The choices are
+# saved to tuning_profile.json, which runtime_profile.py applies at start-up;
+# every setting tried goes to autotune_report.json.
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+REPORT_PATH = "autotune_report.json"
+MIN_SECONDS = 0.5         # per measurement, after one warm-up call
+THROUGHPUT_SLACK = 0.05
+LATENCY_SLACK = 1.25
+PROBE_BYTES = 64 * 2**20   # caps the rows generated per model
+
+DENSENET_BATCHES = [1, 8, 16, 32, 64]
+KERAS_BATCHES = [256, 1024, 4096, 8192, 32768]
+KERAS_ROWS = 65536
+SKLEARN_CHUNKS = [1024, 4096, 8192, 32768]
+SKLEARN_MODELS = ["brain.voting_model", "skin.random_forest", "skin.xgboost", "skin.voting",
+                  "heart.random_forest", "heart.gradient_boosting", "park.random_forest",
+                  "py3.model", "alz.regressor"]
+
+def thread_candidates(cap):
+    counts = {cap}
+    n = 1
+    while n < cap:
+        counts.add(n)
+        n *= 2
+    return sorted(counts)
+
+# === Probes (run in the child interpreters) ===
+def _measure(call, rows):
+    # (median ms per call, rows/sec) over at least MIN_SECONDS
+    call()
+    times = []
+    start = time.perf_counter()
+    while len(times) < 2 or time.perf_counter() - start < MIN_SECONDS:
+        t = time.perf_counter()
+        call()
+        times.append(time.perf_counter() - t)
+    return float(np.median(times)) * 1000, rows * len(times) / sum(times)
+
+def _result(single_ms, batches):
+    return {"single_ms": single_ms,
+            "batches": {str(b): {"batch_ms": ms, "throughput_per_s": tput} for b, (ms, tput) in batches.items()}}
+
+def _probe_densenet():
+    import feature_extractor
+    images = np.random.default_rng(0).uniform(0, 255, (max(DENSENET_BATCHES), 224, 224, 3)).astype(np.float32)
+    feature_extractor.get_model()
+
+    def run():
+        batches = {b: _measure(lambda: feature_extractor.extract_batch(images[:b], b), b) for b in DENSENET_BATCHES}
+        return _result(batches[1][0], batches)
+    return run
+
+def _probe_keras():
+    import model_registry
+    model = model_registry.load("heart.keras")
+    rows = np.random.default_rng(0).normal(size=(KERAS_ROWS, model.input_shape[-1])).astype(np.float32)
+
+    def run():
+        single_ms, _ = _measure(lambda: model.predict(rows[:1], verbose=0), 1)
+        return _result(single_ms, {b: _measure(lambda: model.predict(rows, batch_size=b, verbose=0), len(rows))
+                                   for b in KERAS_BATCHES})
+    return run
+
+def _probe_sklearn():
+    import model_registry
+    rng = np.random.default_rng(0)
+    models = []
+    for name in SKLEARN_MODELS:
+        if not os.path.exists(model_registry.path(name)):
+            continue
+        width = model_registry.load(name, compiled=False, indexed=False).n_features_in_
+        rows = rng.normal(size=(min(max(SKLEARN_CHUNKS), PROBE_BYTES // (8 * width)), width))
+        models.append((name, model_registry.load(name), rows))
+    if not models:
+        raise RuntimeError("no sklearn model files found (set --root)")
+
+    def chunked(model, rows, chunk):
+        for start in range(0, len(rows), chunk):
+            model.predict(rows[start:start + chunk])
+
+    def run():
+        # Geometric means, so every model counts the same however fast it is
+        single, batches = [], {c: [] for c in SKLEARN_CHUNKS}
+        for name, model, rows in models:
+            single.append(_measure(lambda: model.predict(rows[:1]), 1)[0])
+            for chunk in SKLEARN_CHUNKS:
+                batches[chunk].append(_measure(lambda: chunked(model, rows, chunk), len(rows)))
+        gmean = lambda values: float(np.exp(np.mean(np.log(values))))
+        result = _result(gmean(single), {c: (gmean([ms for ms, _ in r]), gmean([t for _, t in r]))
+                                         for c, r in batches.items()})
+        result["models"] = [name for name, _, _ in models]
+        return result
+    return run
+
+PROBES = {"densenet": _probe_densenet, "keras": _probe_keras, "sklearn": _probe_sklearn}
+
+def probe(workload):
+    """Child side: load, report ready, wait for the start signal, print the measurements."""
+    run = PROBES[workload]()
+    print("ready", flush=True)
+    sys.stdin.readline()  # all copies start measuring together
+    print(json.dumps(run()), flush=True)
+
+_PROBE = "import sys, autotune; autotune.probe(sys.argv[1])"
+
+# === Sweep ===
+def run_setting(workload, env, concurrent=1, root=None):
+    """Runs `concurrent` probes of workload with env. Returns combined measurements, or {"error": ...}."""
+    # Without the current profile: only the swept settings and what the user set
+    child_env = {name: value for name, value in os.environ.items() if name not in runtime_profile.applied}
+    child_env.update(PYTHONPATH=REPO_DIR, MEDAI_TUNING_PROFILE="", **{name: str(value) for name, value in env.items()})
+    if root:
+        child_env["MEDAI_MODEL_ROOT"] = os.path.abspath(root)
+    procs = []
+    for _ in range(concurrent):
+        log = tempfile.TemporaryFile(mode="w+")  # a stderr pipe could fill up and block the child
+        procs.append((subprocess.Popen([sys.executable, "-c", _PROBE, workload], stdin=subprocess.PIPE,
+                                       stdout=subprocess.PIPE, stderr=log, text=True, env=child_env), log))
+    try:
+        for proc, _ in procs:
+            while True:
+                line = proc.stdout.readline()
+                if not line or line.strip() == "ready":
+                    break
+        for proc, _ in procs:
+            if proc.poll() is None:
+                proc.stdin.write("go\n")
+                proc.stdin.flush()
+        results = []
+        for proc, log in procs:
+            out, _ = proc.communicate()
+            if proc.returncode != 0:
+                log.seek(0)
+                lines = log.read().strip().splitlines()
+                return {"error": lines[-1] if lines else "failed"}
+            results.append(json.loads(out.strip().splitlines()[-1]))
+    finally:
+        for proc, log in procs:
+            if proc.poll() is None:
+                proc.kill()
+            log.close()
+
+    combined = dict(results[0], single_ms=max(r["single_ms"] for r in results))
+    combined["batches"] = {b: {"batch_ms": max(r["batches"][b]["batch_ms"] for r in results),
+                               "throughput_per_s": sum(r["batches"][b]["throughput_per_s"] for r in results)}
+                           for b in results[0]["batches"]}
+    return combined
+
+def _settings(workload, cap):
+    # (label fields, environment) for every thread setting of workload
+    for threads in thread_candidates(cap):
+        if workload == "densenet":
+            for inter_op in [i for i in (1, 2) if i <= cap]:
+                yield ({"threads": threads, "inter_op": inter_op},
+                       {"TF_NUM_INTRAOP_THREADS": threads, "TF_NUM_INTEROP_THREADS": inter_op})
+        elif workload == "keras":
+            yield {"threads": threads}, {"TF_NUM_INTRAOP_THREADS": threads, "TF_NUM_INTEROP_THREADS": 1}
+        else:
+            env = {name: threads for name in runtime_profile.BLAS_VARIABLES}
+            yield {"threads": threads}, dict(env, MEDAI_SKLEARN_JOBS=threads)
+
+def sweep(workload, concurrent=1, root=None, progress=print):
+    """One row per (thread setting, batch size) tried, plus errors."""
+    cap = max(1, (os.cpu_count() or 1) // concurrent)
+    rows, errors = [], []
+    for fields, env in _settings(workload, cap):
+        result = run_setting(workload, env, concurrent, root)
+        if "error" in result:
+            errors.append(dict(fields, error=result["error"]))
+            progress(f"{workload:<8} {fields} failed: {result['error']}")
+            continue
+        for batch, measured in result["batches"].items():
+            rows.append(dict(fields, batch=int(batch), single_ms=round(result["single_ms"], 3),
+                             batch_ms=round(measured["batch_ms"], 3),
+                             throughput_per_s=round(measured["throughput_per_s"], 1)))
+        best = max(result["batches"].values(), key=lambda m: m["throughput_per_s"])
+        progress(f"{workload:<8} {fields}  single {result['single_ms']:.2f}ms  "
+                 f"best {best['throughput_per_s']:.0f}/s")
+    return rows, errors
+
+def choose(rows):
+    best_single = min(r["single_ms"] for r in rows)
+    fast = [r for r in rows if r["single_ms"] <= LATENCY_SLACK * best_single]
+    best = max(r["throughput_per_s"] for r in fast)
+    good = [r for r in fast if r["throughput_per_s"] >= (1 - THROUGHPUT_SLACK) * best]
+    return min(good, key=lambda r: (r["threads"], r.get("inter_op", 1), r["batch"]))
+
+def profile_env(choices):
+    env = {}
+    if "keras" in choices:
+        env.update(TF_NUM_INTRAOP_THREADS=choices["keras"]["threads"], TF_NUM_INTEROP_THREADS=1,
+                   MEDAI_KERAS_BATCH=choices["keras"]["batch"])
+    if "densenet" in choices:  # the DenseNet pass dominates TensorFlow time, so its threads win
+        env.update(TF_NUM_INTRAOP_THREADS=choices["densenet"]["threads"],
+                   TF_NUM_INTEROP_THREADS=choices["densenet"]["inter_op"],
+                   MEDAI_DENSENET_BATCH=choices["densenet"]["batch"])
+    if "sklearn" in choices:
+        env.update({name: choices["sklearn"]["threads"] for name in runtime_profile.BLAS_VARIABLES})
+        env.update(MEDAI_SKLEARN_JOBS=choices["sklearn"]["threads"], MEDAI_SKLEARN_CHUNK_ROWS=choices["sklearn"]["batch"])
+    return {name: str(value) for name, value in env.items()}
+
+def autotune(workloads, concurrent=1, root=None, profile_path=runtime_profile.PROFILE_PATH,
+             report_path=REPORT_PATH, progress=print):
+    report = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "concurrent": concurrent,
+        "workloads": {},
+    }
+    choices = {}
+    for workload in workloads:
+        if workload in ("densenet", "keras") and importlib.util.find_spec("tensorflow") is None:
+            report["workloads"][workload] = {"skipped": "TensorFlow is not installed"}
+            progress(f"{workload:<8} skipped: TensorFlow is not installed")
+            continue
+        rows, errors = sweep(workload, concurrent, root, progress)
+        entry = report["workloads"][workload] = {"results": rows, "errors": errors}
+        if rows:
+            choices[workload] = entry["choice"] = choose(rows)
+
+    # Keep earlier choices for workloads not tuned this time
+    previous = runtime_profile.load_profile(profile_path) or {}
+    profile = {
+        "timestamp": report["timestamp"],
+        "cpu_count": os.cpu_count(),
+        "concurrent": concurrent,
+        "choices": dict(previous.get("choices", {}), **choices),
+    }
+    profile["env"] = profile_env(profile["choices"])
+    report["profile"] = profile
+    with open(profile_path, "w", encoding="utf-8") as f:
+        json.dump(profile, f, indent=2)
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    return report
+
+def print_report(report):
+    for workload, entry in report["workloads"].items():
+        if "skipped" in entry:
+            continue
+        print(f"\n{workload}: threads  batch  throughput/s   batch ms  single ms")
+        for row in entry["results"]:
+            threads = f"{row['threads']}" + (f"/{row['inter_op']}" if "inter_op" in row else "")
+            marker = "*" if row == entry.get("choice") else " "
+            print(f"  {marker} {threads:>12} {row['batch']:>6} {row['throughput_per_s']:>12.1f} "
+                  f"{row['batch_ms']:>10.2f} {row['single_ms']:>10.2f}")
+    print("\nProfile environment: " + " ".join(f"{k}={v}" for k, v in report["profile"]["env"].items()))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tune thread counts and batch sizes for this machine.")
+    parser.add_argument("--workloads", nargs="*", choices=list(PROBES), help="default: all")
+    parser.add_argument("--concurrent", type=int, default=1, help="modules expected to run at the same time")
+    parser.add_argument("--root", default=None, help="model root (default: MEDAI_MODEL_ROOT or the repo)")
+    parser.add_argument("--profile", default=runtime_profile.PROFILE_PATH or "tuning_profile.json")
+    parser.add_argument("--report", default=REPORT_PATH)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    report = autotune(args.workloads or list(PROBES), max(1, args.concurrent), args.root, args.profile, args.report)
+    print_report(report)
+    print(f"\nSaved {args.profile} and {args.report} ({time.perf_counter() - start:.0f}s)")
@@ -0,0 +1,372 @@
+import argparse
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+# === Headless benchmark suite ===
+# The real model folders are not part of the repo, so this script can write
+# shape-compatible stand-ins (random data, same file names and input sizes)
+# and then time each module's inference path without opening a window.
+#
+#   python benchmark.py generate                 # -> bench_artifacts/
+#   python benchmark.py run [--modules heart alz] [--baseline old.json]
+#
+# Every module runs in a fresh interpreter (model root = artifact folder), so cold
+# start and peak RSS are per module. Results go to benchmark_results/ as JSON,
+# tagged with the git commit, so runs can be compared across commits.
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+ARTIFACT_DIR = "bench_artifacts"
+RESULTS_DIR = "benchmark_results"
+DENSENET_WEIGHTS = "densenet169_random.weights.h5"
+IMAGE_DIR = "images"
+N_IMAGES = 8
+TRAIN_ROWS = 400
+
+HEART_FEATURES = ["age", "sex", "cp", "trestbps", "chol", "fbs", "restecg",
+                  "thalach", "exang", "oldpeak", "slope", "ca", "thal"]
+PARK_FEATURES = ["Jitter(%)", "Jitter(Abs)", "Jitter:RAP", "Jitter:PPQ5", "Jitter:DDP",
+                 "Shimmer", "Shimmer(dB)", "Shimmer:APQ3", "Shimmer:APQ5", "Shimmer:APQ11",
+                 "Shimmer:DDA", "NHR", "HNR", "RPDE", "DFA", "PPE"]
+BRAIN_CLASSES = ["glioma", "meningioma", "notumor", "pituitary"]
+
+# === Stand-in artifacts ===
+def _has_tensorflow():
+    try:
+        import tensorflow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def _dump(obj, *parts):
+    import joblib
+    path = os.path.join(*parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    joblib.dump(obj, path)
+
+def _keras_mlp(n_features, path, rng):
+    from tensorflow import keras
+    model = keras.Sequential([keras.Input((n_features,)),
+                              keras.layers.Dense(32, activation="relu"),
+                              keras.layers.Dense(16, activation="relu"),
+                              keras.layers.Dense(1, activation="sigmoid")])
+    model.compile(optimizer="adam", loss="binary_crossentropy")
+    x = rng.normal(size=(TRAIN_ROWS, n_features)).astype(np.float32)
+    model.fit(x, rng.integers(0, 2, TRAIN_ROWS), epochs=1, verbose=0)
+    model.save(path)
+
+def _boosted_classifier():
+    try:
+        from xgboost import XGBClassifier
+        return XGBClassifier(n_estimators=50, max_depth=4)
+    except ImportError:
+        from sklearn.ensemble import HistGradientBoostingClassifier
+        return HistGradientBoostingClassifier(max_iter=50)  # same role when xgboost is missing
+
+def _write_images(root, rng):
+    # Binary PPM needs no imaging library and is read by both OpenCV and PIL
+    os.makedirs(os.path.join(root, IMAGE_DIR), exist_ok=True)
+    for i in range(N_IMAGES):
+        pixels = rng.integers(0, 256, size=(256, 256, 3), dtype=np.uint8)
+        with open(os.path.join(root, IMAGE_DIR, f"img_{i:03d}.ppm"), "wb") as f:
+            f.write(b"P6\n256 256\n255\n" + pixels.tobytes())
+
+def generate(root=ARTIFACT_DIR, seed=0):
+    """Writes stand-in artifacts for every module under root. Returns what was skipped."""
+    from sklearn.decomposition import PCA
+    from sklearn.ensemble import (AdaBoostClassifier, GradientBoostingClassifier, RandomForestClassifier,
+                                  RandomForestRegressor, StackingRegressor, VotingClassifier)
+    from sklearn.linear_model import LogisticRegression, Ridge
+    from sklearn.neighbors import KNeighborsClassifier
+    from sklearn.preprocessing import LabelEncoder, StandardScaler
+    from sklearn.svm import SVC
+
+    rng = np.random.default_rng(seed)
+    tf = _has_tensorflow()
+    skipped = []
+    from feature_extractor import FEATURE_DIM
+
+    # Brain: DenseNet embedding -> scaler -> PCA -> voting
+    x = rng.normal(size=(TRAIN_ROWS, FEATURE_DIM))
+    encoder = LabelEncoder().fit(BRAIN_CLASSES)
+    y = encoder.transform(rng.choice(BRAIN_CLASSES, TRAIN_ROWS))
+    scaler = StandardScaler().fit(x)
+    pca = PCA(n_components=100, random_state=seed).fit(scaler.transform(x))
+    voting = VotingClassifier([("svm", SVC()), ("knn", KNeighborsClassifier()),
+                               ("rf", RandomForestClassifier(n_estimators=100, random_state=seed))])
+    voting.fit(pca.transform(scaler.transform(x)), y)
+    for name, obj in [("voting_model", voting), ("label_encoder", encoder), ("scaler", scaler), ("pca", pca)]:
+        _dump(obj, root, "models", f"{name}.pkl")
+
+    # Skin: 7 classes straight on the embedding
+    y = rng.integers(0, 7, TRAIN_ROWS)
+    skin = {
+        "model_rf_7class.pkl": RandomForestClassifier(n_estimators=100, random_state=seed),
+        "model_svm_7class.pkl": SVC(),
+        "model_knn_7class.pkl": KNeighborsClassifier(),
+        "model_xgb_7class.pkl": _boosted_classifier(),
+        "model_voting_7class.pkl": VotingClassifier([("rf", RandomForestClassifier(n_estimators=100, random_state=seed)),
+                                                     ("svm", SVC()), ("knn", KNeighborsClassifier())]),
+    }
+    for name, model in skin.items():
+        _dump(model.fit(x, y), root, "modelsskin", name)
+
+    # Heart and Parkinson's: scaler + binary classifiers + Keras MLP
+    for folder, n_features, models, mlp in [
+        ("modelsheart", len(HEART_FEATURES), {
+            "logistic_regression.pkl": LogisticRegression(max_iter=500),
+            "random_forest.pkl": RandomForestClassifier(n_estimators=100, random_state=seed),
+            "svm_model.pkl": SVC(probability=True, random_state=seed),
+            "gradient_boosting.pkl": GradientBoostingClassifier(random_state=seed),
+        }, "keras_model.h5"),
+        ("modelsp", len(PARK_FEATURES), {
+            "rf_classifier.pkl": RandomForestClassifier(n_estimators=100, random_state=seed),
+            "logreg_classifier.pkl": LogisticRegression(max_iter=500),
+            "svm_classifier.pkl": SVC(probability=True, random_state=seed),
+            "knn_classifier.pkl": KNeighborsClassifier(),
+            "adaboost_classifier.pkl": AdaBoostClassifier(random_state=seed),
+        }, "parkinsons_mlp_model.h5"),
+    ]:
+        x = rng.normal(size=(TRAIN_ROWS, n_features))
+        y = rng.integers(0, 2, TRAIN_ROWS)
+        scaler = StandardScaler().fit(x)
+        _dump(scaler, root, folder, "scaler.pkl")
+        for name, model in models.items():
+            _dump(model.fit(scaler.transform(x), y), root, folder, name)
+        if tf:
+            _keras_mlp(n_features, os.path.join(root, folder, mlp), rng)
+        else:
+            skipped.append(os.path.join(folder, mlp))
+    with open(os.path.join(root, "modelsp", "feature_list.json"), "w") as f:
+        json.dump(PARK_FEATURES, f)
+
+    # UPDRS (18 features) and Alzheimer's (32 features) regressors
+    x = rng.normal(size=(TRAIN_ROWS, 18))
+    scaler = StandardScaler().fit(x)
+    _dump(scaler, root, "newmodels", "scaler.pkl")
+    _dump(RandomForestRegressor(n_estimators=100, random_state=seed).fit(scaler.transform(x), rng.uniform(5, 60, TRAIN_ROWS)),
+          root, "newmodels", "best_model.pkl")
+
+    x = rng.normal(size=(TRAIN_ROWS, 32))
+    scaler = StandardScaler().fit(x)
+    stacked = StackingRegressor([("rf", RandomForestRegressor(n_estimators=100, random_state=seed)), ("ridge", Ridge())],
+                                final_estimator=Ridge())
+    _dump(scaler, root, "alz_models", "scaler.pkl")
+    _dump(stacked.fit(scaler.transform(x), rng.uniform(0, 1, TRAIN_ROWS)), root, "alz_models", "stacked_regressor.pkl")
+
+    # Random DenseNet169 weights, so no imagenet download is needed
+    if tf:
+        from tensorflow.keras.applications import DenseNet169
+        DenseNet169(weights=None, include_top=False, pooling="avg",
+                    input_shape=(224, 224, 3)).save_weights(os.path.join(root, DENSENET_WEIGHTS))
+    else:
+        skipped.append(DENSENET_WEIGHTS)
+    _write_images(root, rng)
+    return skipped
+
+# === Per-module inference paths (no Tk root is created) ===
+def _available(paths):
+    return {name: path for name, path in paths.items() if os.path.exists(path)}
+
+def _bench_heart(rng, batch_rows):
+    import pandas as pd
+    import heart_batch
+    import heart_gui
+    names = list(_available(heart_gui.model_paths))
+    model_name = "Keras Neural Network" if "Keras Neural Network" in names else "Logistic Regression"
+    x = rng.normal(size=(1, len(HEART_FEATURES)))
+    df = pd.DataFrame(rng.normal(size=(batch_rows, len(HEART_FEATURES))), columns=HEART_FEATURES)
+    single = lambda: heart_gui.predict_probability(model_name, x)
+    batch = lambda: heart_batch.score_frame(df, {n: heart_gui.get_model(n) for n in names},
+                                            heart_gui.get_scaler(), model_name)
+    return single, batch, batch_rows, {"model": model_name, "batch_models": names}
+
+def _bench_alz(rng, batch_rows):
+    import pandas as pd
+    import alz_batch
+    import alz_gui
+    x = rng.normal(size=(1, len(alz_gui.feature_names)))
+    df = pd.DataFrame(rng.normal(size=(batch_rows, len(alz_gui.feature_names))), columns=alz_gui.feature_names)
+    single = lambda: alz_gui.predict_risk(x)
+    batch = lambda: alz_batch.score_chunk(df, alz_gui.feature_names, alz_gui.get_scaler(), alz_gui.get_regressor())
+    return single, batch, batch_rows, {}
+
+def _bench_park(rng, batch_rows):
+    import park_gui
+    model_name = "Random Forest"
+    x = list(rng.normal(size=len(park_gui.feature_names)))
+    rows = rng.normal(size=(batch_rows, len(park_gui.feature_names)))
+    single = lambda: park_gui.predict(model_name, x)
+    batch = lambda: park_gui.get_model(model_name).predict_proba(park_gui.get_scaler().transform(rows))
+    return single, batch, batch_rows, {"model": model_name}
+
+def _bench_py3(rng, batch_rows):
+    import py3_gui
+    x = list(rng.normal(size=len(py3_gui.feature_names)))
+    rows = rng.normal(size=(batch_rows, len(py3_gui.feature_names)))
+    single = lambda: py3_gui.predict_updrs(x)
+    batch = lambda: py3_gui.get_model().predict(py3_gui.get_scaler().transform(rows))
+    return single, batch, batch_rows, {}
+
+def _image_bench(variant, classify, classify_features, preprocess, batch_images):
+    import feature_extractor
+    # Measure the uncached path: every call decodes and runs DenseNet
+    feature_extractor.cached_embedding = lambda variant, digest: None
+    feature_extractor.store_embedding = lambda variant, digest, features: features
+    folder = os.path.join(os.getcwd(), IMAGE_DIR)
+    paths = sorted(os.path.join(folder, name) for name in os.listdir(folder))
+    calls = itertools.count()
+    images = np.stack([preprocess(paths[i % len(paths)]) for i in range(batch_images)])
+    single = lambda: classify(paths[next(calls) % len(paths)])
+    batch = lambda: classify_features(feature_extractor.extract_batch(images))
+    return single, batch, batch_images, {"variant": variant}
+
+def _bench_brain(rng, batch_images):
+    import brain_gui
+
+    def classify_features(features):
+        voting_model, label_encoder, _, _ = brain_gui.get_models()
+        return label_encoder.inverse_transform(voting_model.predict(brain_gui.get_projection().transform(features)))
+
+    return _image_bench("brain", brain_gui.classify_image, classify_features,
+                        brain_gui.preprocess_image, batch_images)
+
+def _bench_skin(rng, batch_images):
+    import skin_gui
+    model_name = "Voting Classifier"
+    classify_features = lambda features: skin_gui.get_model(model_name).predict(features)
+    single, batch, n, info = _image_bench("skin", lambda path: skin_gui.classify(path, model_name),
+                                          classify_features, skin_gui.preprocess_image, batch_images)
+    return single, batch, n, dict(info, model=model_name)
+
+BENCHMARKS = {
+    "heart": (_bench_heart, 10000),
+    "alz": (_bench_alz, 10000),
+    "park": (_bench_park, 10000),
+    "py3": (_bench_py3, 10000),
+    "brain": (_bench_brain, 32),
+    "skin": (_bench_skin, 32),
+}
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        try:
+            import psutil
+            return round(psutil.Process().memory_info().peak_wset / 2**20, 1)
+        except (ImportError, AttributeError):
+            return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / 2**20 if sys.platform == "darwin" else rss / 1024, 1)
+
+def _percentiles(samples):
+    ms = np.asarray(samples) * 1000
+    return {"p50": round(float(np.percentile(ms, 50)), 3), "p90": round(float(np.percentile(ms, 90)), 3),
+            "p99": round(float(np.percentile(ms, 99)), 3), "mean": round(float(ms.mean()), 3)}
+
+def run_module(name, repeats=50, batch=None, seed=0):
+    """Runs inside the fresh interpreter started by benchmark_module()."""
+    start = time.perf_counter()
+    import stage_timer
+    setup, default_batch = BENCHMARKS[name]
+    single, run_batch, batch_size, info = setup(np.random.default_rng(int(seed)), int(batch or default_batch))
+    single()  # first call includes imports and model loading
+    cold_start = time.perf_counter() - start
+
+    latencies = []
+    for _ in range(int(repeats)):
+        t = time.perf_counter()
+        single()
+        latencies.append(time.perf_counter() - t)
+
+    run_batch()  # warm-up (allocations, thread pools)
+    t = time.perf_counter()
+    run_batch()
+    batch_s = time.perf_counter() - t
+
+    stages = {name: {k: v for k, v in hist.items() if k != "buckets_s"}
+              for name, hist in stage_timer.snapshot().items()}
+    return dict(info, cold_start_s=round(cold_start, 4), single_ms=_percentiles(latencies),
+                batch_size=batch_size, batch_s=round(batch_s, 4),
+                throughput_per_s=round(batch_size / max(batch_s, 1e-9), 1), peak_rss_mb=peak_rss_mb(),
+                stages=stages)
+
+_PROBE = "import json, sys, benchmark; print(json.dumps(benchmark.run_module(*sys.argv[1:])))"
+
+def benchmark_module(name, root=ARTIFACT_DIR, repeats=50, batch=None):
+    env = dict(os.environ, MEDAI_EXTRACTOR_BACKEND="keras", PYTHONPATH=REPO_DIR,
+               MEDAI_MODEL_ROOT=os.path.abspath(root),
+               MEDAI_DENSENET_WEIGHTS=os.path.abspath(os.path.join(root, DENSENET_WEIGHTS)))
+    args = [sys.executable, "-c", _PROBE, name, str(repeats)] + ([str(batch)] if batch else [])
+    proc = subprocess.run(args, capture_output=True, text=True, cwd=root, env=env)
+    if proc.returncode != 0:
+        return {"error": proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "failed"}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+def git_commit():
+    proc = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=REPO_DIR)
+    return proc.stdout.strip() if proc.returncode == 0 else None
+
+def compare(results, baseline):
+    for name, new in results["modules"].items():
+        old = baseline.get("modules", {}).get(name, {})
+        if "error" in new or "error" in old or not old:
+            continue
+        p50 = new["single_ms"]["p50"] / max(old["single_ms"]["p50"], 1e-9)
+        tput = new["throughput_per_s"] / max(old["throughput_per_s"], 1e-9)
+        print(f"{name:<6} p50 x{p50:.2f}  throughput x{tput:.2f}  (vs {baseline.get('commit')})")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Headless inference benchmarks on stand-in models.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_gen = sub.add_parser("generate", help="write stand-in model artifacts")
+    p_gen.add_argument("--root", default=ARTIFACT_DIR)
+    p_run = sub.add_parser("run", help="benchmark each module")
+    p_run.add_argument("--root", default=ARTIFACT_DIR)
+    p_run.add_argument("--modules", nargs="*", choices=list(BENCHMARKS), help="default: all")
+    p_run.add_argument("--repeats", type=int, default=50, help="warm single-sample calls")
+    p_run.add_argument("--batch", type=int, default=None, help="rows/images per batch (default per module)")
+    p_run.add_argument("-o", "--output", default=None, help=f"default: {RESULTS_DIR}/<time>-<commit>.json")
+    p_run.add_argument("--baseline", default=None, help="earlier results JSON to compare against")
+    args = parser.parse_args()
+
+    if args.command == "generate" or not os.path.isdir(args.root):
+        skipped = generate(args.root)
+        print(f"Stand-in artifacts written to {args.root}" + (f" (skipped, no TensorFlow: {', '.join(skipped)})" if skipped else ""))
+        if args.command == "generate":
+            sys.exit(0)
+
+    results = {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "modules": {},
+    }
+    for name in args.modules or BENCHMARKS:
+        result = benchmark_module(name, args.root, args.repeats, args.batch)
+        results["modules"][name] = result
+        if "error" in result:
+            print(f"{name:<6} failed: {result['error']}")
+        else:
+            lat = result["single_ms"]
+            print(f"{name:<6} cold {result['cold_start_s']:.2f}s  single p50 {lat['p50']:.2f}ms p99 {lat['p99']:.2f}ms  "
+                  f"batch {result['throughput_per_s']:.0f}/s  peak RSS {result['peak_rss_mb']} MB")
+
+    out_path = args.output or os.path.join(RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}-{results['commit'] or 'nogit'}.json")
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    with open(out_path, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Saved {out_path}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(results, json.load(f))
@@ -0,0 +1,103 @@
+import argparse
+import itertools
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import runtime_profile  # noqa: F401  tuned thread/batch settings, before numpy loads
+import numpy as np
+
+import brain_gui
+from feature_extractor import BATCH_SIZE, FEATURE_DIM, cached_embedding, extract_batch, file_digest, store_embedding
+from result_writer import ResultWriter, collect_files
+
+# === Batched folder inference for brain MRI ===
+# Usage: python brain_batch.py STUDY_DIR [more dirs/files, @list.txt] -o results.csv
+# Images are decoded and resized on a thread pool a few batches ahead of the
+# DenseNet forward pass; the fused scaler+PCA projection and voting run once per batch.
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff")
+FIELDS = ["path", "label", "error"]
+
+def collect_images(inputs):
+    return collect_files(inputs, IMAGE_EXTENSIONS)
+
+# Runs on a worker thread: cache lookup, then decode + resize on a miss
+def _load(path):
+    try:
+        digest = file_digest(path)
+        features = cached_embedding("brain", digest)
+        image = None if features is not None else brain_gui.preprocess_image(path)
+        return path, digest, features, image, None
+    except Exception as e:
+        return path, None, None, None, str(e) or type(e).__name__
+
+def prefetch(paths, workers, window):
+    # Keeps at most `window` images decoded or in flight, yielding in input order
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        it = iter(paths)
+        pending = deque(pool.submit(_load, p) for p in itertools.islice(it, window))
+        while pending:
+            result = pending.popleft().result()
+            for p in itertools.islice(it, 1):
+                pending.append(pool.submit(_load, p))
+            yield result
+
+def score_batch(batch):
+    features = np.empty((len(batch), FEATURE_DIM), dtype=np.float32)
+    misses = []
+    for i, (path, digest, cached, image, error) in enumerate(batch):
+        if cached is not None:
+            features[i] = cached
+        elif error is None:
+            misses.append(i)
+
+    if misses:
+        computed = extract_batch(np.stack([batch[i][3] for i in misses]))
+        for i, feat in zip(misses, computed):
+            features[i] = store_embedding("brain", batch[i][1], feat)
+
+    ok = [i for i, item in enumerate(batch) if item[4] is None]
+    labels = {}
+    if ok:
+        voting_model, label_encoder, _, _ = brain_gui.get_models()
+        x = brain_gui.get_projection().transform(features[ok])
+        predicted = label_encoder.inverse_transform(voting_model.predict(x))
+        labels = dict(zip(ok, predicted))
+
+    return [
+        {"path": item[0], "label": str(labels[i]) if i in labels else "", "error": item[4] or ""}
+        for i, item in enumerate(batch)
+    ]
+
+def classify_batch(paths, out_path, batch_size=BATCH_SIZE, workers=None, prefetch_batches=4):
+    workers = workers or min(8, os.cpu_count() or 1)
+    start = time.perf_counter()
+    done = 0
+    with ResultWriter(out_path, FIELDS) as writer:
+        loaded = prefetch(paths, workers, batch_size * prefetch_batches)
+        while True:
+            batch = list(itertools.islice(loaded, batch_size))
+            if not batch:
+                break
+            writer.write_rows(score_batch(batch))
+            done += len(batch)
+            elapsed = time.perf_counter() - start
+            print(f"{done}/{len(paths)} images, {done / elapsed:.1f} images/sec", flush=True)
+
+    elapsed = time.perf_counter() - start
+    rate = done / elapsed if elapsed > 0 else 0.0
+    print(f"Classified {done} images in {elapsed:.2f}s ({rate:.1f} images/sec) -> {out_path}")
+    return rate
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Classify a folder of brain MRI slices.")
+    parser.add_argument("inputs", nargs="+", help="image files, directories, or @file_list.txt")
+    parser.add_argument("-o", "--output", default="brain_results.csv", help=".csv or .jsonl")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="images per DenseNet pass")
+    parser.add_argument("--workers", type=int, default=None, help="decode threads")
+    parser.add_argument("--prefetch", type=int, default=4, help="batches decoded ahead")
+    args = parser.parse_args()
+
+    classify_batch(collect_images(args.inputs), args.output, args.batch_size, args.workers, args.prefetch)
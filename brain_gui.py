@@ -1,113 +1,146 @@
+from startup_timer import lazy_import, mark, warm_up_in_background
 import tkinter as tk
-from tkinter import filedialog, Toplevel, Label
-from PIL import Image, ImageTk
-import cv2
+from tkinter import filedialog, messagebox
+from PIL import ImageTk
 import numpy as np
-import joblib
-from tensorflow.keras.applications.densenet import DenseNet169, preprocess_input
-from tensorflow.keras.layers import GlobalAveragePooling2D
-from tensorflow.keras.models import Model
 import os
 import subprocess
-
-# === Load trained models and tools ===
-model_dir = "models"
-voting_model = joblib.load(os.path.join(model_dir, "voting_model.pkl"))
-label_encoder = joblib.load(os.path.join(model_dir, "label_encoder.pkl"))
-scaler = joblib.load(os.path.join(model_dir, "scaler.pkl"))
-pca = joblib.load(os.path.join(model_dir, "pca.pkl"))
+from feature_extractor import get_embedding, get_model
+import model_registry
+from model_cache import model_cache
+import linear_fusion
+from inference_executor import TaskStatus
+from stage_timer import stage, timed
+from audit_log import audit
+import image_ingest
+
+# === Trained models and tools (loaded on first use, see models_manifest.json) ===
+def get_models():
+    voting_model = model_registry.load("brain.voting_model")
+    label_encoder = model_registry.load("brain.label_encoder")
+    scaler = model_registry.load("brain.scaler")
+    pca = model_registry.load("brain.pca")
+    return voting_model, label_encoder, scaler, pca
+
+# scaler + PCA folded into one projection (x @ W + b), built once per model load
+def get_projection():
+    def build():
+        _, _, scaler, pca = get_models()
+        return linear_fusion.fuse_scaler_pca(scaler, pca)
+    _, _, scaler, pca = get_models()
+    key = ("fused", model_registry.path("brain.scaler"), model_registry.path("brain.pca"))
+    return model_cache.get(key, build, size=scaler.n_features_in_ * pca.n_components_ * 8)
+
+# === Background warm-up: OpenCV, TensorFlow, DenseNet169 and the models ===
+def warm_up():
+    lazy_import("cv2")
+    lazy_import("tensorflow.keras.applications.densenet")
+    get_models()
+    get_projection()
+    get_model()
 
 model_accuracy = 0.74
 IMG_SIZE = 224
 
-# === Build feature extractor once ===
-base_model = DenseNet169(weights='imagenet', include_top=False, input_shape=(224, 224, 3))
-feature_extractor = Model(inputs=base_model.input, outputs=GlobalAveragePooling2D()(base_model.output))
+# === Preprocessing (cache variant "brain") ===
+def preprocess_image(img_path):
+    cv2 = lazy_import("cv2")
+    preprocess_input = lazy_import("tensorflow.keras.applications.densenet").preprocess_input
+    with stage("brain.decode"):
+        # Shared decode with the preview; BGR with EXIF orientation, as cv2.imread returned
+        image = np.asarray(image_ingest.load(img_path, exif_transpose=True))[:, :, ::-1]
+        image = np.ascontiguousarray(image)
+    with stage("brain.resize"):
+        image = cv2.resize(image, (IMG_SIZE, IMG_SIZE))
+    with stage("brain.preprocess_input"):
+        image = image.astype("float32") / 255.0
+        return preprocess_input(image)
 
 # === Prediction Function ===
+@timed("brain.classify_image")
 def classify_image(img_path):
-    image = cv2.imread(img_path)
-    image = cv2.resize(image, (IMG_SIZE, IMG_SIZE))
-    image = image.astype("float32") / 255.0
-    image = np.expand_dims(image, axis=0)
-    image = preprocess_input(image)
-
-    features = feature_extractor.predict(image)
-    features = scaler.transform(features)
-    features = pca.transform(features)
-
-    prediction = voting_model.predict(features)
-    predicted_label = label_encoder.inverse_transform(prediction)[0]
+    with audit("brain", "brain.voting_model", inputs=img_path) as record:
+        voting_model, label_encoder, _, _ = get_models()
+        projection = get_projection()
+        features = get_embedding(img_path, "brain", preprocess_image).reshape(1, -1)
+        with stage("brain.scaler_pca"):
+            features = projection.transform(features)
+
+        with stage("brain.classifier"):
+            prediction = voting_model.predict(features)
+            predicted_label = label_encoder.inverse_transform(prediction)[0]
+        record.output = predicted_label
     return predicted_label
 
-# === Run prediction with loading popup ===
-def load_image():
-    file_path = filedialog.askopenfilename()
-    if file_path:
-        img = Image.open(file_path).resize((224, 224))
-        img_tk = ImageTk.PhotoImage(img)
-        panel.config(image=img_tk)
-        panel.image = img_tk
-
-        loading = Toplevel(root)
-        loading.title("Please Wait")
-        loading.configure(bg="#ffffff")
-
-        width, height = 300, 100
-        loading.update_idletasks()
-        screen_width = loading.winfo_screenwidth()
-        screen_height = loading.winfo_screenheight()
-        x = (screen_width // 2) - (width // 2)
-        y = (screen_height // 2) - (height // 2)
-        loading.geometry(f"{width}x{height}+{x}+{y}")
-
-        Label(loading, text="⏳ Predicting...", font=("Arial", 12), bg="#ffffff").pack(pady=30)
-        loading.update()
-
-        root.after(100, lambda: run_prediction(file_path, loading))
-
-def run_prediction(file_path, loading_window):
-    label = classify_image(file_path)
-    loading_window.destroy()
-    result_label.config(text=f"Predicted Tumor Type: {label}")
-
-# === Return to main menu
-def back_to_main_menu():
-    root.destroy()
-    subprocess.Popen(["python", "main_menu.py"])
-
-# === Create Window ===
-root = tk.Tk()
-root.title("Brain Tumor Classification")
-root.state('zoomed')
-root.configure(bg="#f4f4f4")
-
-# === Layout frames
-top_frame = tk.Frame(root, bg="#f4f4f4")
-top_frame.pack(pady=20)
-
-bottom_frame = tk.Frame(root, bg="#f4f4f4")
-bottom_frame.pack(pady=10)
-
-# === Title and Accuracy
-tk.Label(top_frame, text="🧠 Brain Tumor Classifier (Voting Model)", font=("Arial", 22, "bold"), bg="#f4f4f4", fg="#333").pack(pady=5)
-tk.Label(top_frame, text=f"Model Accuracy: {model_accuracy*100:.2f}%", font=("Arial", 14), bg="#f4f4f4", fg="#444").pack()
-
-# === Upload button
-tk.Button(bottom_frame, text="📁 Upload MRI Image", command=load_image,
-          font=("Arial", 14), width=30, bg="#007acc", fg="white", activebackground="#005f99").pack(pady=20)
-
-# === Image preview
-panel = tk.Label(bottom_frame, bg="#f4f4f4")
-panel.pack()
-
-# === Prediction label
-result_label = tk.Label(bottom_frame, text="Predicted Tumor Type: ", font=("Arial", 16), bg="#f4f4f4", fg="#111")
-result_label.pack(pady=20)
-
-# === Back button
-tk.Button(bottom_frame, text="⬅ Back to Main Menu", command=back_to_main_menu,
-          font=("Arial", 12), width=25, bg="#999", fg="white", activebackground="#666").pack(pady=10)
+# === GUI ===
+class BrainTumorApp(tk.Frame):
+    def __init__(self, master, on_back=None):
+        super().__init__(master, bg="#f4f4f4")
+        self.on_back = on_back
+        warm_up_in_background("brain_gui", warm_up)
+
+        # === Layout frames
+        top_frame = tk.Frame(self, bg="#f4f4f4")
+        top_frame.pack(pady=20)
+
+        bottom_frame = tk.Frame(self, bg="#f4f4f4")
+        bottom_frame.pack(pady=10)
+
+        # === Title and Accuracy
+        tk.Label(top_frame, text="🧠 Brain Tumor Classifier (Voting Model)", font=("Arial", 22, "bold"), bg="#f4f4f4", fg="#333").pack(pady=5)
+        tk.Label(top_frame, text=f"Model Accuracy: {model_accuracy*100:.2f}%", font=("Arial", 14), bg="#f4f4f4", fg="#444").pack()
+
+        # === Upload button
+        tk.Button(bottom_frame, text="📁 Upload MRI Image", command=self.load_image,
+                  font=("Arial", 14), width=30, bg="#007acc", fg="white", activebackground="#005f99").pack(pady=20)
+
+        # === Image preview
+        self.panel = tk.Label(bottom_frame, bg="#f4f4f4")
+        self.panel.pack()
+
+        # === Prediction label
+        self.result_label = tk.Label(bottom_frame, text="Predicted Tumor Type: ", font=("Arial", 16), bg="#f4f4f4", fg="#111")
+        self.result_label.pack(pady=20)
+
+        # === Busy indicator / cancel
+        self.tasks = TaskStatus(bottom_frame, bg="#f4f4f4")
+        self.tasks.pack()
+
+        # === Back button
+        tk.Button(bottom_frame, text="⬅ Back to Main Menu", command=self.back_to_main_menu,
+                  font=("Arial", 12), width=25, bg="#999", fg="white", activebackground="#666").pack(pady=10)
+
+    # === Run prediction in the background ===
+    def load_image(self):
+        file_path = filedialog.askopenfilename()
+        if file_path:
+            img_tk = ImageTk.PhotoImage(image_ingest.preview(file_path, (224, 224)))
+            self.panel.config(image=img_tk)
+            self.panel.image = img_tk
+
+            self.tasks.submit(classify_image, file_path,
+                              on_done=lambda label: self.show_result(file_path, label),
+                              on_error=lambda e: messagebox.showerror("Prediction Error", str(e)))
+
+    def show_result(self, file_path, label):
+        self.result_label.config(text=f"Predicted Tumor Type: {label}\n({os.path.basename(file_path)})")
+        mark("first_prediction")
+
+    # === Return to main menu
+    def back_to_main_menu(self):
+        if self.on_back:
+            self.on_back()
+            return
+        self.winfo_toplevel().destroy()
+        subprocess.Popen(["python", "main_menu.py"])
 
 # === Start GUI
-root.mainloop()
+if __name__ == "__main__":
+    root = tk.Tk()
+    root.title("Brain Tumor Classification")
+    root.state('zoomed')
+    root.configure(bg="#f4f4f4")
+    BrainTumorApp(root).pack(fill="both", expand=True)
+    root.update()
+    mark("first_window")
+    root.mainloop()
@@ -0,0 +1,153 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from stage_timer import stage
+from startup_timer import lazy_import
+
+# === Shared DenseNet169 feature extractor ===
+# Brain and skin both use DenseNet169 (imagenet, average pooled) as a 1664-d
+# embedding. One instance serves both modules, and embeddings are cached on
+# disk by image content hash and preprocessing variant.
+#
+# MEDAI_EXTRACTOR_BACKEND picks the runtime (see onnx_backend.py):
+#   auto      - exported ONNX model if present and onnxruntime is installed, else Keras
+#   keras     - TensorFlow/Keras only
+#   onnx      - ONNX Runtime, fp32
+#   onnx-int8 - ONNX Runtime, int8 quantized (embeddings cached separately)
+# MEDAI_DENSENET_WEIGHTS overrides the imagenet weights with a local
+# .weights.h5 file (benchmark.py uses this for random stand-in weights);
+# its embeddings are cached under a version tagged with the file's hash.
+
+IMG_SIZE = 224
+FEATURE_DIM = 1664
+BACKEND = os.environ.get("MEDAI_EXTRACTOR_BACKEND", "auto")
+WEIGHTS = os.environ.get("MEDAI_DENSENET_WEIGHTS", "imagenet")
+CACHE_DIR = "embedding_cache"
+CACHE_VERSION = "densenet169-imagenet-avg-v2"  # bump when the extractor or preprocessing changes
+if WEIGHTS != "imagenet":
+    # Other weights give other embeddings; a file replaced in place gets a new tag
+    _h = hashlib.sha256(WEIGHTS.encode("utf-8"))
+    if os.path.isfile(WEIGHTS):
+        with open(WEIGHTS, "rb") as _f:
+            for _block in iter(lambda: _f.read(1 << 20), b""):
+                _h.update(_block)
+    CACHE_VERSION += "-weights-" + _h.hexdigest()[:12]
+if BACKEND == "onnx-int8":
+    CACHE_VERSION += "-int8"
+MEMORY_CACHE_SIZE = 256
+BATCH_SIZE = int(os.environ.get("MEDAI_DENSENET_BATCH", "32"))  # images per forward pass (autotune.py)
+
+_model = None
+backend_name = None  # backend actually in use once the model is loaded
+_model_lock = threading.Lock()
+_predict_lock = threading.Lock()  # one forward pass at a time; TF already uses every core
+_cache_lock = threading.Lock()
+_memory_cache = OrderedDict()
+_digests = {}
+
+def build_keras_model():
+    DenseNet169 = lazy_import("tensorflow.keras.applications.densenet").DenseNet169
+    return DenseNet169(weights=WEIGHTS, include_top=False, pooling='avg',
+                       input_shape=(IMG_SIZE, IMG_SIZE, 3))
+
+def _load_backend():
+    if BACKEND != "keras":
+        onnx_backend = lazy_import("onnx_backend")
+        model = onnx_backend.load_extractor(BACKEND)
+        if model is not None:
+            return model, BACKEND if BACKEND != "auto" else "onnx"
+    return build_keras_model(), "keras"
+
+def get_model():
+    global _model, backend_name
+    with _model_lock:
+        if _model is None:
+            _model, backend_name = _load_backend()
+    return _model
+
+# === Content hashing ===
+def file_digest(path):
+    # Re-hash only when the file changed on disk
+    stat = os.stat(path)
+    stamp = (stat.st_size, stat.st_mtime_ns)
+    cached = _digests.get(path)
+    if cached and cached[0] == stamp:
+        return cached[1]
+
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    digest = h.hexdigest()
+    _digests[path] = (stamp, digest)
+    return digest
+
+def _cache_path(variant, digest):
+    return os.path.join(CACHE_DIR, CACHE_VERSION, variant, digest[:2], digest + ".npy")
+
+# === Embedding cache ===
+def _remember(key, features):
+    with _cache_lock:
+        _memory_cache[key] = features
+        _memory_cache.move_to_end(key)
+        while len(_memory_cache) > MEMORY_CACHE_SIZE:
+            _memory_cache.popitem(last=False)
+
+def cached_embedding(variant, digest):
+    key = (variant, digest)
+    with _cache_lock:
+        features = _memory_cache.get(key)
+        if features is not None:
+            _memory_cache.move_to_end(key)
+            return features
+
+    path = _cache_path(variant, digest)
+    if not os.path.exists(path):
+        return None
+    try:
+        features = np.load(path)
+    except (OSError, ValueError):
+        return None  # partial or corrupt entry, recompute
+    if features.shape != (FEATURE_DIM,):
+        return None
+    _remember(key, features)
+    return features
+
+def store_embedding(variant, digest, features):
+    features = np.asarray(features, dtype=np.float32).reshape(-1)
+    _remember((variant, digest), features)
+
+    path = _cache_path(variant, digest)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, features)
+    os.replace(tmp_path, path)  # atomic, so readers never see half a file
+    return features
+
+# === Public API ===
+def extract_batch(images, batch_size=None):
+    # images: preprocessed float32 array of shape (n, 224, 224, 3)
+    model = get_model()
+    with _predict_lock, stage("densenet.forward"):
+        return model.predict(images, batch_size=batch_size or BATCH_SIZE, verbose=0)
+
+def get_embedding(img_path, variant, preprocess):
+    """Returns the 1664-d embedding for img_path, computing it only on a cache miss.
+
+    variant names the preprocessing applied by preprocess(img_path), which must
+    return a single (224, 224, 3) model input.
+    """
+    with stage("densenet.cache_lookup"):
+        digest = file_digest(img_path)
+        features = cached_embedding(variant, digest)
+    if features is not None:
+        return features
+
+    x = preprocess(img_path)
+    features = extract_batch(np.expand_dims(x, axis=0))[0]
+    return store_embedding(variant, digest, features)
@@ -0,0 +1,81 @@
+import argparse
+import os
+import time
+
+import runtime_profile  # noqa: F401  tuned thread/batch settings, before numpy loads
+import numpy as np
+import pandas as pd
+
+# === Whole-CSV scoring for the heart models ===
+# Usage: python heart_batch.py patients.csv -o scored.csv [--model "Random Forest"]
+# The table is scaled once, then every model scores the whole matrix.
+# Rows with missing or non-numeric cells (e.g. '?') get NaN probabilities
+# and the result "Missing values".
+
+KERAS_MODEL = "Keras Neural Network"
+# Defaults below; autotune.py can tune both per machine (see runtime_profile.py)
+KERAS_BATCH_SIZE = int(os.environ.get("MEDAI_KERAS_BATCH", "8192"))  # tiny MLP, large batches amortise per-call overhead
+SKLEARN_CHUNK_ROWS = int(os.environ.get("MEDAI_SKLEARN_CHUNK_ROWS", "32768"))  # bounds SVM kernel / tree temporaries
+
+def prepare_features(df):
+    # Same columns the GUI reads: everything except the 'num' target
+    drop_cols = [col for col in df.columns if col.strip().lower() == 'num']
+    return df.drop(columns=drop_cols)
+
+def predict_probabilities(model_name, model, scaled):
+    if model_name == KERAS_MODEL:
+        return model.predict(scaled, batch_size=KERAS_BATCH_SIZE, verbose=0)[:, 0]
+    probs = np.empty(len(scaled), dtype=np.float64)
+    for start in range(0, len(scaled), SKLEARN_CHUNK_ROWS):
+        stop = start + SKLEARN_CHUNK_ROWS
+        probs[start:stop] = model.predict_proba(scaled[start:stop])[:, 1]
+    return probs
+
+def score_frame(df, models, scaler, label_model=KERAS_MODEL):
+    """Returns df with one probability column per model plus the `result` label."""
+    features = prepare_features(df)
+    expected = getattr(scaler, "n_features_in_", features.shape[1])
+    if features.shape[1] != expected:
+        raise ValueError(f"Expected {expected} feature columns, got {features.shape[1]}")
+
+    matrix = features.apply(pd.to_numeric, errors="coerce").to_numpy(dtype=np.float64)
+    ok = np.isfinite(matrix).all(axis=1)
+    scaled = scaler.transform(np.ascontiguousarray(matrix[ok])) if ok.any() else None
+
+    scored = df.copy()
+    for model_name, model in models.items():
+        probs = np.full(len(matrix), np.nan)
+        if scaled is not None:
+            probs[ok] = predict_probabilities(model_name, model, scaled)
+        scored[f"prob_{model_name}"] = probs
+    label_probs = scored[f"prob_{label_model}"].to_numpy()
+    scored["result"] = np.where(~ok, "Missing values", np.where(label_probs > 0.5, "CHD Detected", "No CHD"))
+    return scored
+
+def write_scores(scored, out_path):
+    if out_path.lower().endswith((".jsonl", ".json")):
+        scored.to_json(out_path, orient="records", lines=True)
+    else:
+        scored.to_csv(out_path, index=False)
+
+def score_csv(in_path, out_path, models, scaler, label_model=KERAS_MODEL):
+    start = time.perf_counter()
+    scored = score_frame(pd.read_csv(in_path), models, scaler, label_model)
+    write_scores(scored, out_path)
+    elapsed = time.perf_counter() - start
+    return len(scored), elapsed
+
+if __name__ == "__main__":
+    import heart_gui
+
+    parser = argparse.ArgumentParser(description="Score every row of a heart CSV with all models.")
+    parser.add_argument("input")
+    parser.add_argument("-o", "--output", default="heart_scored.csv", help=".csv or .jsonl")
+    parser.add_argument("--model", default=KERAS_MODEL, choices=list(heart_gui.model_paths),
+                        help="model whose probability sets the result label")
+    args = parser.parse_args()
+
+    models = heart_gui.get_models()
+    rows, elapsed = score_csv(args.input, args.output, models, heart_gui.get_scaler(), args.model)
+    print(f"Scored {rows} rows with {len(models)} models in {elapsed:.2f}s "
+          f"({rows / max(elapsed, 1e-9):.0f} rows/sec) -> {args.output}")
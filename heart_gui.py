@@ -1,152 +1,416 @@
+from startup_timer import lazy_import, mark, warm_up_in_background
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
-import pandas as pd
 import numpy as np
-import joblib
 import subprocess
-from tensorflow.keras.models import load_model
-
-# Load all models from folder
-keras_model = load_model("modelsheart/keras_model.h5")
-logreg_model = joblib.load("modelsheart/logistic_regression.pkl")
-rf_model = joblib.load("modelsheart/random_forest.pkl")
-svm_model = joblib.load("modelsheart/svm_model.pkl")
-gb_model = joblib.load("modelsheart/gradient_boosting.pkl")
-scaler = joblib.load("modelsheart/scaler.pkl")
-
-models = {
-    "Keras Neural Network": keras_model,
-    "Logistic Regression": logreg_model,
-    "Random Forest": rf_model,
-    "SVM": svm_model,
-    "Gradient Boosting": gb_model
+import time
+from concurrent.futures import ThreadPoolExecutor
+import model_registry
+from model_cache import model_cache
+import linear_fusion
+from inference_executor import TaskStatus
+from stage_timer import stage, timed
+from audit_log import audit
+
+# Models, loaded on first use (or by the background warm-up) through the registry
+model_keys = {
+    "Keras Neural Network": "heart.keras",
+    "Logistic Regression": "heart.logistic_regression",
+    "Random Forest": "heart.random_forest",
+    "SVM": "heart.svm",
+    "Gradient Boosting": "heart.gradient_boosting"
 }
+model_paths = {name: model_registry.path(key) for name, key in model_keys.items()}
+scaler_path = model_registry.path("heart.scaler")
+
+def get_model(model_name):
+    return model_registry.load(model_keys[model_name])
+
+def get_scaler():
+    return model_registry.load("heart.scaler")
+
+def get_models():
+    return {name: get_model(name) for name in model_paths}
+
+# Scaler folded into linear models (None for models that cannot be fused)
+def get_fused(model_name):
+    scaler, model = get_scaler(), get_model(model_name)
+    return model_cache.get(("fused", scaler_path, model_paths[model_name]),
+                           lambda: linear_fusion.fuse_scaler_linear(scaler, model), size=0)
+
+def warm_up():
+    get_scaler()
+    get_models()
+
+def model_probability(model_name, model, scaled_input):
+    if model_name == "Keras Neural Network":
+        return model.predict(scaled_input, verbose=0)[0][0]
+    return model.predict_proba(scaled_input)[0][1]
 
-df = None
-feature_names = []
-entries = []
-
-def load_csv():
-    global df, feature_names
-    try:
-        file_path = filedialog.askopenfilename(filetypes=[("CSV Files", "*.csv")])
-        df = pd.read_csv(file_path)
-
-        # Drop target column if present
-        drop_cols = [col for col in df.columns if col.strip().lower() == 'num']
-        if drop_cols:
-            df.drop(columns=drop_cols, inplace=True)
-
-        feature_names.clear()
-        feature_names.extend(df.columns.tolist())
-        update_fields()
-        row_slider.config(to=len(df) - 1)
-        messagebox.showinfo("Loaded", f"{len(df)} rows loaded successfully with {len(feature_names)} features.")
-    except Exception as e:
-        messagebox.showerror("Error", f"Failed to load CSV:\n{e}")
-
-def update_fields():
-    for widget in frame.winfo_children():
-        widget.destroy()
-    entries.clear()
-    for name in feature_names:
-        row = tk.Frame(frame, bg="#f0f0f0")
-        tk.Label(row, text=f"{name}: ", width=20, anchor="w", bg="#f0f0f0", font=("Arial", 10)).pack(side=tk.LEFT)
-        entry = tk.Entry(row, width=20, font=("Arial", 10))
-        entry.pack(side=tk.RIGHT)
-        row.pack(pady=2)
-        entries.append(entry)
-
-def fill_from_row(index):
-    if df is None:
-        messagebox.showwarning("Warning", "Please load a CSV file first.")
-        return
-    if index >= len(df):
-        return
-    row_data = df.iloc[index]
-    for i, name in enumerate(feature_names):
-        entries[i].delete(0, tk.END)
-        entries[i].insert(0, str(row_data[name]))
-
-def predict():
-    try:
-        input_data = [float(entry.get()) for entry in entries]
-        input_array = np.array(input_data).reshape(1, -1)
+# Inference, run on the background executor
+@timed("heart.predict")
+def predict_probability(model_name, input_array):
+    with audit("heart", model_keys[model_name], inputs=input_array) as record:
+        record.output = _probability(model_name, input_array)
+    return record.output
+
+def _probability(model_name, input_array):
+    fused = get_fused(model_name)
+    if fused is not None:
+        with stage("heart.fused_linear"):
+            return fused.predict_proba(input_array)[0][1]
+    scaler = get_scaler()
+    with stage("heart.scaler"):
         scaled_input = scaler.transform(input_array)
+    model = get_model(model_name)
+    with stage("heart.model"):
+        return model_probability(model_name, model, scaled_input)
+
+# All models at once: one scaling pass, every model on its own thread, so the
+# wall time is the slowest model rather than the sum of all of them
+_compare_pool = None
+
+def _timed_probability(model_name, scaled_input):
+    model = get_model(model_name)
+    start = time.perf_counter()
+    prob = float(model_probability(model_name, model, scaled_input))
+    return prob, (time.perf_counter() - start) * 1000
+
+@timed("heart.compare")
+def compare_models(input_array):
+    """Returns ({model: (probability, latency_ms)}, ensemble probability, wall time in ms)."""
+    global _compare_pool
+    if _compare_pool is None:
+        _compare_pool = ThreadPoolExecutor(max_workers=len(model_paths), thread_name_prefix="heart-compare")
+    start = time.perf_counter()
+    with audit("heart", "all", inputs=input_array) as record:
+        with stage("heart.scaler"):
+            scaled_input = get_scaler().transform(input_array)
+        futures = {name: _compare_pool.submit(_timed_probability, name, scaled_input) for name in model_paths}
+        results = {name: future.result() for name, future in futures.items()}
+        ensemble = float(np.mean([prob for prob, _ in results.values()]))
+        record.output = {"models": results, "ensemble": ensemble}
+    return results, ensemble, (time.perf_counter() - start) * 1000
+
+# One vectorized pass over every loaded row (rows with missing values get NaN)
+@timed("heart.score_rows")
+def score_rows(model_name, features):
+    heart_batch = lazy_import("heart_batch")
+    with audit("heart", model_keys[model_name], inputs=features) as record:
+        probs = np.full(len(features), np.nan)
+        ok = np.isfinite(features).all(axis=1)
+        fused = get_fused(model_name)
+        if fused is not None and ok.any():
+            probs[ok] = fused.predict_proba(features[ok])[:, 1]
+        elif ok.any():
+            scaled = get_scaler().transform(features[ok])
+            probs[ok] = heart_batch.predict_probabilities(model_name, get_model(model_name), scaled)
+        record.output = probs
+    return probs
+
+def score_to_file(df, label_model, out_path):
+    heart_batch = lazy_import("heart_batch")
+    start = time.perf_counter()
+    with audit("heart", "all", inputs=df) as record:
+        scored = heart_batch.score_frame(df, get_models(), get_scaler(), label_model)
+        heart_batch.write_scores(scored, out_path)
+        record.output = {"rows": len(scored), "path": out_path}
+    return len(scored), time.perf_counter() - start
+
+# ========== GUI Setup ==========
+
+class HeartDiseaseApp(tk.Frame):
+    def __init__(self, master, on_back=None):
+        super().__init__(master, bg="#f0f0f0")
+        self.on_back = on_back
+        warm_up_in_background("heart_gui", warm_up)
+
+        self.df = None
+        self.feature_names = []
+        self.entries = []
+        self.features = None     # loaded rows as one contiguous float array
+        self.row_probs = None    # selected model's probability for every row
+        self.rescored = {}       # rows scored one at a time: edits, or every row if the pass stopped
+        self.scoring = False     # whole-file pass still running
+        self.score_gen = 0
+        self.filling = False
+        self.edited = False
+
+        # Title
+        tk.Label(self, text="🫀 Coronary Heart Disease Predictor", font=("Helvetica", 24, "bold"),
+                 bg="#f0f0f0", fg="#222").pack(pady=20)
+
+        # CSV Section
+        tk.Button(self, text="📂 Load Patient CSV", command=self.load_csv,
+                  bg="#4CAF50", fg="white", font=("Arial", 11), width=25).pack(pady=5)
+
+        tk.Label(self, text="Select Patient Row:", bg="#f0f0f0", font=("Arial", 11)).pack()
+        self.row_var = tk.IntVar()
+        self.row_slider = tk.Scale(self, from_=0, to=0, orient=tk.HORIZONTAL, variable=self.row_var,
+                                   command=lambda val: self.fill_from_row(int(val)), length=800, bg="#f0f0f0")
+        self.row_slider.pack(pady=5)
+
+        # Scrollable Entry Section
+        canvas = tk.Canvas(self, height=350, bg="#f0f0f0", highlightthickness=0)
+        scroll_y = tk.Scrollbar(self, orient="vertical", command=canvas.yview)
+        self.frame = tk.Frame(canvas, bg="#f0f0f0")
+        self.frame.bind("<Configure>", lambda e: canvas.configure(scrollregion=canvas.bbox("all")))
+        canvas.create_window((0, 0), window=self.frame, anchor="nw")
+        canvas.configure(yscrollcommand=scroll_y.set)
+        canvas.pack(side="left", fill="both", expand=True, padx=10)
+        scroll_y.pack(side="right", fill="y")
+
+        # Model Selection
+        tk.Label(self, text="Select Model:", bg="#f0f0f0", font=("Arial", 11)).pack(pady=10)
+        self.model_var = tk.StringVar(value="Keras Neural Network")
+        self.model_menu = ttk.Combobox(self, textvariable=self.model_var, values=list(model_paths.keys()),
+                                       state="readonly", font=("Arial", 10), width=30)
+        self.model_menu.pack(pady=5)
+        self.model_menu.bind("<<ComboboxSelected>>", lambda e: self.score_loaded_rows())
+
+        # Predict Button
+        tk.Button(self, text="🔍 Predict", command=self.predict,
+                  bg="#007BFF", fg="white", font=("Arial", 12, "bold"), width=20).pack(pady=15)
+
+        # Every model side by side
+        tk.Button(self, text="⚖️ Compare All Models", command=self.compare_all,
+                  bg="#6f42c1", fg="white", font=("Arial", 11), width=20).pack(pady=5)
+
+        # Score every loaded row with all models
+        tk.Button(self, text="📊 Score All Rows", command=self.score_all_rows,
+                  bg="#17a2b8", fg="white", font=("Arial", 11), width=20).pack(pady=5)
 
-        model_name = model_var.get()
-        model = models[model_name]
+        # Result Display
+        self.tasks = TaskStatus(self, bg="#f0f0f0")
+        self.tasks.pack()
+        self.result_label = tk.Label(self, text="", font=("Arial", 18), bg="#f0f0f0")
+        self.result_label.pack(pady=10)
+        self.compare_frame = tk.Frame(self, bg="#f0f0f0")
+        self.compare_frame.pack(pady=5)
 
-        if model_name == "Keras Neural Network":
-            prob = model.predict(scaled_input)[0][0]
+        # Go to Main Menu Button
+        tk.Button(self, text="🏠 Go to Main Menu", command=self.open_main_menu,
+                  bg="#6c757d", fg="white", font=("Arial", 11), width=25).pack(pady=10)
+
+    def load_csv(self):
+        try:
+            file_path = filedialog.askopenfilename(filetypes=[("CSV Files", "*.csv")])
+            pd = lazy_import("pandas")
+            self.df = pd.read_csv(file_path)
+
+            # Drop target column if present
+            drop_cols = [col for col in self.df.columns if col.strip().lower() == 'num']
+            if drop_cols:
+                self.df.drop(columns=drop_cols, inplace=True)
+
+            model_registry.check_input_width("heart", self.df.shape[1])
+            self.feature_names.clear()
+            self.feature_names.extend(self.df.columns.tolist())
+            numeric = self.df.apply(pd.to_numeric, errors="coerce")
+            self.features = np.ascontiguousarray(numeric.to_numpy(dtype=np.float64))
+            self.update_fields()
+            self.row_slider.config(to=len(self.df) - 1)
+            self.score_loaded_rows()
+            messagebox.showinfo("Loaded", f"{len(self.df)} rows loaded successfully with {len(self.feature_names)} features.")
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to load CSV:\n{e}")
+
+    def update_fields(self):
+        for widget in self.frame.winfo_children():
+            widget.destroy()
+        self.entries.clear()
+        for name in self.feature_names:
+            row = tk.Frame(self.frame, bg="#f0f0f0")
+            tk.Label(row, text=f"{name}: ", width=20, anchor="w", bg="#f0f0f0", font=("Arial", 10)).pack(side=tk.LEFT)
+            entry = tk.Entry(row, width=20, font=("Arial", 10))
+            entry.pack(side=tk.RIGHT)
+            entry.bind("<KeyRelease>", self.on_edit)
+            row.pack(pady=2)
+            self.entries.append(entry)
+
+    def fill_from_row(self, index):
+        if self.df is None:
+            messagebox.showwarning("Warning", "Please load a CSV file first.")
+            return
+        if index >= len(self.df):
+            return
+        self.filling = True
+        for entry, value in zip(self.entries, self.features[index]):
+            entry.delete(0, tk.END)
+            entry.insert(0, repr(float(value)))  # full precision: Predict must see the loaded values
+        self.filling = False
+        self.edited = False
+        self.show_row_result(index)
+
+    # === Precomputed results for the slider ===
+    def score_loaded_rows(self):
+        if self.features is None:
+            return
+        self.score_gen += 1
+        self.row_probs = None
+        self.rescored = {}
+        self.scoring = True
+        gen, model_name = self.score_gen, self.model_var.get()
+        self.tasks.submit(score_rows, model_name, self.features.copy(),
+                          on_done=lambda probs: self.rows_scored(gen, probs),
+                          on_error=lambda e: self.scoring_stopped(gen, e),
+                          on_cancel=lambda: self.scoring_stopped(gen))
+
+    def rows_scored(self, gen, probs):
+        if gen != self.score_gen:
+            return  # model or file changed while scoring
+        for index, prob in self.rescored.items():
+            probs[index] = prob
+        self.row_probs = probs
+        self.scoring = False
+        self.show_row_result(self.row_var.get())
+
+    def scoring_stopped(self, gen, error=None):
+        # Cancelled or failed: the slider falls back to scoring one row at a time
+        if gen != self.score_gen:
+            return
+        self.scoring = False
+        if error is not None:
+            messagebox.showerror("Scoring Error", f"Could not score rows:\n{error}")
+        self.show_row_result(self.row_var.get())
+
+    def score_row(self, index):
+        gen, model_name = self.score_gen, self.model_var.get()
+        self.result_label.config(text="⏳ Scoring row...")
+        self.tasks.submit(score_rows, model_name, self.features[index:index + 1].copy(),
+                          on_done=lambda probs: self.row_scored(gen, index, probs[0]),
+                          on_error=lambda e: messagebox.showerror("Scoring Error", f"Could not score row:\n{e}"))
+
+    def row_scored(self, gen, index, prob):
+        if gen != self.score_gen:
+            return
+        self.rescored[index] = prob
+        if self.row_var.get() == index and not self.edited:
+            self.show_row_result(index)
+
+    def show_row_result(self, index):
+        if self.row_probs is not None:
+            prob = self.row_probs[index]
+        elif index in self.rescored:
+            prob = self.rescored[index]
+        elif self.scoring:
+            self.result_label.config(text="⏳ Scoring rows...")
+            return
+        else:
+            self.score_row(index)
+            return
+        if np.isnan(prob):
+            self.result_label.config(text="Row has missing values")
         else:
-            prob = model.predict_proba(scaled_input)[0][1]
+            self.show_result(prob)
 
+    def on_edit(self, event=None):
+        if not self.filling and self.features is not None and not self.edited:
+            self.edited = True
+            self.result_label.config(text="✏️ Edited - press Predict to re-score this row")
+
+    def row_predicted(self, gen, index, model_name, values, prob):
+        # An edited row was re-scored; keep it for later slider visits
+        if gen != self.score_gen:
+            return  # another file or model was loaded while predicting
+        self.show_result(prob)
+        if index is None or model_name != self.model_var.get():
+            return
+        self.features[index] = values
+        self.edited = False
+        if self.row_probs is not None:
+            self.row_probs[index] = prob
+        else:
+            self.rescored[index] = prob
+
+    def read_inputs(self):
+        try:
+            input_data = [float(entry.get()) for entry in self.entries]
+            return np.array(input_data).reshape(1, -1)
+        except Exception as e:
+            messagebox.showerror("Prediction Error", f"Could not make prediction:\n{e}")
+            return None
+
+    def predict(self):
+        input_array = self.read_inputs()
+        if input_array is None:
+            return
+        gen, model_name = self.score_gen, self.model_var.get()
+        index = self.row_var.get() if self.features is not None and input_array.shape[1] == self.features.shape[1] else None
+        if index is not None and not self.edited:
+            self.show_row_result(index)  # the loaded row as it is: its precomputed score
+            return
+        self.tasks.submit(predict_probability, model_name, input_array,
+                          on_done=lambda prob: self.row_predicted(gen, index, model_name, input_array[0], prob),
+                          on_error=lambda e: messagebox.showerror("Prediction Error", f"Could not make prediction:\n{e}"))
+
+    def show_result(self, prob):
         result = "🔴 CHD Detected" if prob > 0.5 else "🟢 No CHD"
-        result_label.config(text=f"{result}\nProbability: {prob:.2f}")
-    except Exception as e:
-        messagebox.showerror("Prediction Error", f"Could not make prediction:\n{e}")
+        self.result_label.config(text=f"{result}\nProbability: {prob:.2f}")
+        mark("first_prediction")
 
-def open_main_menu():
-    try:
-        subprocess.Popen(["python", "main_menu.py"])
-        root.destroy()  # Close current window
-    except Exception as e:
-        messagebox.showerror("Error", f"Could not open main_menu.py:\n{e}")
+    def compare_all(self):
+        input_array = self.read_inputs()
+        if input_array is None:
+            return
+        self.tasks.submit(compare_models, input_array, on_done=self.show_comparison,
+                          on_error=lambda e: messagebox.showerror("Prediction Error", f"Could not make prediction:\n{e}"))
 
-# ========== GUI Setup ==========
+    def show_comparison(self, comparison):
+        results, ensemble, wall_ms = comparison
+        for widget in self.compare_frame.winfo_children():
+            widget.destroy()
+        for col, text in enumerate(["Model", "Probability", "Result", "Latency"]):
+            tk.Label(self.compare_frame, text=text, font=("Arial", 10, "bold"), bg="#f0f0f0",
+                     width=22 if col == 0 else 12, anchor="w").grid(row=0, column=col)
+        rows = [(name, prob, f"{ms:.1f} ms") for name, (prob, ms) in results.items()]
+        rows.append(("Ensemble (mean)", ensemble, f"{wall_ms:.1f} ms total"))
+        for i, (name, prob, latency) in enumerate(rows, start=1):
+            bold = ("Arial", 10, "bold") if i == len(rows) else ("Arial", 10)
+            result = "🔴 CHD" if prob > 0.5 else "🟢 No CHD"
+            for col, text in enumerate([name, f"{prob:.2f}", result, latency]):
+                tk.Label(self.compare_frame, text=text, font=bold, bg="#f0f0f0", anchor="w",
+                         width=22 if col == 0 else 12).grid(row=i, column=col)
+        self.result_label.config(text="")
+        mark("first_prediction")
+
+    def score_all_rows(self):
+        if self.df is None:
+            messagebox.showwarning("Warning", "Please load a CSV file first.")
+            return
+        out_path = filedialog.asksaveasfilename(defaultextension=".csv",
+                                                filetypes=[("CSV Files", "*.csv"), ("JSON Lines", "*.jsonl")])
+        if not out_path:
+            return
+        def done(result):
+            rows, elapsed = result
+            messagebox.showinfo("Scored", f"{rows} rows scored with {len(model_paths)} models "
+                                          f"in {elapsed:.2f}s.\nSaved to {out_path}")
+
+        self.tasks.submit(score_to_file, self.df, self.model_var.get(), out_path, on_done=done,
+                          on_error=lambda e: messagebox.showerror("Scoring Error", f"Could not score rows:\n{e}"))
+
+    def open_main_menu(self):
+        if self.on_back:
+            self.on_back()
+            return
+        try:
+            subprocess.Popen(["python", "main_menu.py"])
+            self.winfo_toplevel().destroy()  # Close current window
+        except Exception as e:
+            messagebox.showerror("Error", f"Could not open main_menu.py:\n{e}")
+
+
+if __name__ == "__main__":
+    root = tk.Tk()
+    root.title("Heart Disease Prediction System")
+    root.state("zoomed")  # Open in full-screen maximized window
+    root.configure(bg="#f0f0f0")
+
+    # Ensure app closes completely when red X is clicked
+    root.protocol("WM_DELETE_WINDOW", root.destroy)
 
-root = tk.Tk()
-root.title("Heart Disease Prediction System")
-root.state("zoomed")  # Open in full-screen maximized window
-root.configure(bg="#f0f0f0")
-
-# Ensure app closes completely when red X is clicked
-root.protocol("WM_DELETE_WINDOW", root.destroy)
-
-# Title
-tk.Label(root, text="🫀 Coronary Heart Disease Predictor", font=("Helvetica", 24, "bold"),
-         bg="#f0f0f0", fg="#222").pack(pady=20)
-
-# CSV Section
-tk.Button(root, text="📂 Load Patient CSV", command=load_csv,
-          bg="#4CAF50", fg="white", font=("Arial", 11), width=25).pack(pady=5)
-
-tk.Label(root, text="Select Patient Row:", bg="#f0f0f0", font=("Arial", 11)).pack()
-row_var = tk.IntVar()
-row_slider = tk.Scale(root, from_=0, to=0, orient=tk.HORIZONTAL, variable=row_var,
-                      command=lambda val: fill_from_row(int(val)), length=800, bg="#f0f0f0")
-row_slider.pack(pady=5)
-
-# Scrollable Entry Section
-canvas = tk.Canvas(root, height=350, bg="#f0f0f0", highlightthickness=0)
-scroll_y = tk.Scrollbar(root, orient="vertical", command=canvas.yview)
-frame = tk.Frame(canvas, bg="#f0f0f0")
-frame.bind("<Configure>", lambda e: canvas.configure(scrollregion=canvas.bbox("all")))
-canvas.create_window((0, 0), window=frame, anchor="nw")
-canvas.configure(yscrollcommand=scroll_y.set)
-canvas.pack(side="left", fill="both", expand=True, padx=10)
-scroll_y.pack(side="right", fill="y")
-
-# Model Selection
-tk.Label(root, text="Select Model:", bg="#f0f0f0", font=("Arial", 11)).pack(pady=10)
-model_var = tk.StringVar(value="Keras Neural Network")
-model_menu = ttk.Combobox(root, textvariable=model_var, values=list(models.keys()),
-                          state="readonly", font=("Arial", 10), width=30)
-model_menu.pack(pady=5)
-
-# Predict Button
-tk.Button(root, text="🔍 Predict", command=predict,
-          bg="#007BFF", fg="white", font=("Arial", 12, "bold"), width=20).pack(pady=15)
-
-# Result Display
-result_label = tk.Label(root, text="", font=("Arial", 18), bg="#f0f0f0")
-result_label.pack(pady=10)
-
-# Go to Main Menu Button
-tk.Button(root, text="🏠 Go to Main Menu", command=open_main_menu,
-          bg="#6c757d", fg="white", font=("Arial", 11), width=25).pack(pady=10)
-            
-
-
-root.mainloop()
+    HeartDiseaseApp(root).pack(fill="both", expand=True)
+    root.update()
+    mark("first_window")
+    root.mainloop()
@@ -0,0 +1,110 @@
+import argparse
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image, ImageOps
+
+from stage_timer import stage
+
+# === Single-decode image ingest ===
+# Brain and skin used to decode every upload twice: once with PIL for the
+# preview and again (cv2.imread / image.load_img) for the model. load()
+# decodes a file once, keeps the result in a small LRU, and both the preview
+# and the 224x224 model input are derived from that one buffer.
+#
+# Large sources are decoded at reduced resolution: JPEG via draft mode (DCT
+# scaling by 1/2, 1/4 or 1/8), other formats by an integer reduce(), which
+# uses the resolution levels of JPEG 2000 files. The decoded image always
+# keeps at least MIN_SIDE pixels per side, so it is still larger than both
+# the model input and the preview.
+#
+# 16-bit grayscale (common for MRI exports) is scaled to 8 bits by >> 8, as
+# cv2.imread does; Image.convert("RGB") would clip everything above 255.
+
+MIN_SIDE = 448        # 2x the model input: leaves resize quality unchanged
+LRU_SIZE = 8
+
+_lock = threading.Lock()
+_decoded = OrderedDict()
+WIDE_MODES = ("I;16", "I;16B", "I;16L", "I;16N", "I")
+
+def _to_8bit(img):
+    if img.mode not in WIDE_MODES:
+        return img
+    values = np.clip(np.asarray(img, dtype=np.int64), 0, 65535) >> 8
+    return Image.fromarray(values.astype(np.uint8), "L")
+
+def _decode(path):
+    img = Image.open(path)
+    if img.format == "JPEG":
+        img.draft("RGB", (MIN_SIDE, MIN_SIDE))  # picks the largest scale that keeps both sides >= MIN_SIDE
+    img = _to_8bit(img)
+    factor = min(img.size) // MIN_SIDE
+    if factor >= 2:
+        img = img.reduce(factor)
+    img = img.convert("RGB")
+    img.load()
+    return img
+
+def load(path, exif_transpose=False):
+    """Returns the decoded RGB image for path (possibly at reduced resolution).
+
+    exif_transpose applies the EXIF orientation, as cv2.imread does.
+    """
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    with _lock:
+        img = _decoded.get(key)
+        if img is not None:
+            _decoded.move_to_end(key)
+    if img is None:
+        with stage("ingest.decode"):
+            img = _decode(path)
+        with _lock:
+            _decoded[key] = img
+            while len(_decoded) > LRU_SIZE:
+                _decoded.popitem(last=False)
+    return ImageOps.exif_transpose(img) if exif_transpose else img
+
+def preview(path, size):
+    return load(path).resize(size)
+
+def clear():
+    with _lock:
+        _decoded.clear()
+
+# === Decode cost check ===
+def _full_decode(path):
+    img = _to_8bit(Image.open(path)).convert("RGB")
+    img.load()
+    return img
+
+def compare(paths, repeats=3):
+    # Decode time and decoded buffer size: full decode vs reduced decode
+    rows = []
+    for path in paths:
+        timings = {}
+        for name, decode in (("full", _full_decode), ("reduced", _decode)):
+            best = float("inf")
+            for _ in range(repeats):
+                start = time.perf_counter()
+                img = decode(path)
+                best = min(best, time.perf_counter() - start)
+            timings[name] = (best * 1000, img.size[0] * img.size[1] * 3 / 2**20)
+        rows.append((path, timings))
+    return rows
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare full and reduced-resolution decoding.")
+    parser.add_argument("inputs", nargs="+", help="image files, directories, or @file_list.txt")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    from brain_batch import collect_images
+    for path, t in compare(collect_images(args.inputs), args.repeats):
+        (full_ms, full_mb), (red_ms, red_mb) = t["full"], t["reduced"]
+        print(f"{os.path.basename(path)}: full {full_ms:.1f} ms / {full_mb:.1f} MB, "
+              f"reduced {red_ms:.1f} ms / {red_mb:.1f} MB ({full_ms / max(red_ms, 1e-9):.1f}x faster)")
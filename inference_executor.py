@@ -0,0 +1,97 @@
+import os
+import tkinter as tk
+from concurrent.futures import ThreadPoolExecutor
+
+# === Background inference ===
+# Feature extraction and model calls run on a shared worker pool so the Tk
+# event loop keeps running. Results come back to the Tk thread by polling
+# with after(); widgets are only ever touched from the Tk thread.
+
+POLL_MS = 50
+
+class Task:
+    def __init__(self, future):
+        self.future = future
+        self.cancelled = False
+
+    def cancel(self):
+        # Queued tasks are dropped; a running one finishes but its result is discarded
+        self.cancelled = True
+        self.future.cancel()
+
+    def done(self):
+        return self.future.done()
+
+class InferenceExecutor:
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self.pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="inference")
+
+    def submit(self, fn, *args, **kwargs):
+        return Task(self.pool.submit(fn, *args, **kwargs))
+
+# Shared by every module in the process
+executor = InferenceExecutor()
+
+class TaskStatus(tk.Frame):
+    """Busy label + Cancel button that runs jobs on the shared executor.
+
+    on_done(result), on_error(exception) and on_cancel() are called on the Tk thread.
+    """
+
+    def __init__(self, master, busy_text="⏳ Predicting...", bg=None, font=("Arial", 12)):
+        super().__init__(master, bg=bg)
+        self.busy_text = busy_text
+        self.tasks = []
+        self.polling = False
+        self.label = tk.Label(self, text="", font=font, fg="green", bg=bg)
+        self.label.pack(side=tk.LEFT, padx=5)
+        self.cancel_btn = tk.Button(self, text="✖ Cancel", command=self.cancel_all)
+
+    def submit(self, fn, *args, on_done=None, on_error=None, on_cancel=None):
+        task = executor.submit(fn, *args)
+        self.tasks.append((task, on_done, on_error, on_cancel))
+        self._update_label()
+        if not self.polling:
+            self.polling = True
+            self.after(POLL_MS, self._poll)
+        return task
+
+    def _poll(self):
+        # One done() scan: a task finishing between two scans would be in neither list
+        finished = [t for t in self.tasks if t[0].done()]
+        self.tasks = [t for t in self.tasks if t not in finished]
+        for task, on_done, on_error, on_cancel in finished:
+            if task.cancelled:
+                if on_cancel:
+                    on_cancel()
+                continue
+            error = task.future.exception()
+            if error is not None:
+                if on_error:
+                    on_error(error)
+            elif on_done:
+                on_done(task.future.result())
+        self._update_label()
+        if self.tasks:
+            self.after(POLL_MS, self._poll)
+        else:
+            self.polling = False
+
+    def cancel_all(self):
+        cancelled, self.tasks = self.tasks, []
+        for task, _, _, _ in cancelled:
+            task.cancel()
+        self._update_label()
+        for _, _, _, on_cancel in cancelled:
+            if on_cancel:
+                on_cancel()
+
+    def _update_label(self):
+        if not self.tasks:
+            self.label.config(text="")
+            self.cancel_btn.pack_forget()
+            return
+        queued = len(self.tasks) - 1
+        self.label.config(text=self.busy_text + (f" ({queued} more queued)" if queued else ""))
+        self.cancel_btn.pack(side=tk.LEFT, padx=5)
@@ -0,0 +1,276 @@
+import argparse
+import os
+import sys
+import time
+
+import joblib
+import numpy as np
+
+# === Indexed nearest-neighbour search ===
+# The KNN classifiers compare every query against the whole training set. An
+# IndexedKNN is built once from a fitted KNeighborsClassifier (its stored
+# training data, labels, k and weighting) and answers the same queries from
+# an index:
+#
+#   kdtree  low-dimensional inputs (Parkinson's voice features): exact,
+#           O(log n) per query
+#   ivf     high-dimensional embeddings (skin, 1664-d): k-means cells with
+#           inverted lists; a query scans the nprobe nearest cells, about
+#           nprobe * sqrt(n) rows instead of n
+#
+# nprobe is the smallest value whose recall (the fraction of the true k
+# nearest neighbours the index returns, against brute force) reaches
+# MEDAI_KNN_RECALL when the index is built. It is measured on training rows
+# plus noise, not on stored rows, which an index finds trivially in their own
+# cell and would overstate recall.
+# If the target needs every cell (small or unclustered reference sets), the
+# IVF index would scan all rows plus the centroids and lose to brute force,
+# so the model is left unindexed; the same goes for IVF below IVF_MIN_ROWS.
+# Indexes are saved under <model root>/models_index/ and rebuilt when the
+# model file, the target or INDEX_VERSION changes.
+#
+#   python knn_index.py                # build indexes, recall and label agreement, latency
+#   python knn_index.py --scaling      # query latency as the reference set grows
+
+RECALL_TARGET = float(os.environ.get("MEDAI_KNN_RECALL", "0.99"))
+INDEX_DIR = "models_index"
+INDEX_VERSION = 3        # bump when building or tuning changes, so saved indexes are rebuilt
+KDTREE_MAX_DIM = 32      # above this a KD-tree degrades towards brute force
+IVF_MIN_ROWS = 256       # brute force over fewer rows is already cheaper than probing cells
+TUNING_QUERIES = 256
+
+class IndexedKNN:
+    """Index-backed stand-in for a fitted KNeighborsClassifier (predict / predict_proba / kneighbors)."""
+
+    def __init__(self, model, kind="auto", recall_target=RECALL_TARGET, seed=0):
+        if getattr(model, "effective_metric_", None) != "euclidean" or model.weights not in ("uniform", "distance"):
+            raise TypeError("only euclidean KNN with uniform or distance weights can be indexed")
+        X = np.ascontiguousarray(model._fit_X, dtype=np.float64)
+        self.y = np.asarray(model._y)
+        self.classes_ = model.classes_
+        self.n_features_in_ = model.n_features_in_
+        self.n_neighbors = model.n_neighbors
+        self.weights = model.weights
+        self.kind = kind if kind != "auto" else ("kdtree" if X.shape[1] <= KDTREE_MAX_DIM else "ivf")
+        self.recall_target = recall_target
+        if self.kind == "kdtree":
+            from sklearn.neighbors import KDTree
+            self.tree = KDTree(X)
+            self.nprobe, self.recall = None, 1.0
+        else:
+            self._build_ivf(X, seed)
+            self.nprobe, self.recall = self._tune(X, seed)
+
+    # --- IVF: k-means cells, rows stored grouped by cell ---
+    def _build_ivf(self, X, seed):
+        from sklearn.cluster import MiniBatchKMeans
+        n = len(X)
+        n_cells = max(1, min(int(4 * np.sqrt(n)), n // 16))
+        kmeans = MiniBatchKMeans(n_clusters=n_cells, random_state=seed, n_init=1, batch_size=4096).fit(X)
+        self.centroids = kmeans.cluster_centers_
+        cells = kmeans.predict(X)
+        self.order = np.argsort(cells, kind="stable")
+        self.offsets = np.searchsorted(cells[self.order], np.arange(n_cells + 1))
+        self.X_sorted = X[self.order]
+        self.norms_sorted = np.einsum("ij,ij->i", self.X_sorted, self.X_sorted)
+
+    def _ivf_search(self, Q, k, nprobe):
+        dist_c = (Q ** 2).sum(axis=1)[:, None] - 2 * Q @ self.centroids.T + (self.centroids ** 2).sum(axis=1)
+        nprobe = min(nprobe, len(self.centroids))
+        probes = np.argpartition(dist_c, nprobe - 1, axis=1)[:, :nprobe]
+        dist = np.empty((len(Q), k))
+        ind = np.empty((len(Q), k), dtype=np.int64)
+        for i, q in enumerate(Q):
+            rows = np.concatenate([np.arange(self.offsets[c], self.offsets[c + 1]) for c in probes[i]])
+            if len(rows) < k:  # too few rows in the probed cells: scan everything
+                rows = np.arange(len(self.X_sorted))
+            d2 = self.norms_sorted[rows] - 2 * self.X_sorted[rows] @ q + q @ q
+            top = np.argpartition(d2, k - 1)[:k] if len(rows) > k else np.arange(len(rows))
+            top = top[np.argsort(d2[top], kind="stable")]
+            dist[i] = np.sqrt(np.maximum(d2[top], 0.0))
+            ind[i] = self.order[rows[top]]
+        return dist, ind
+
+    def _tune(self, X, seed):
+        # Smallest nprobe whose recall on perturbed training rows reaches the target
+        from sklearn.neighbors import NearestNeighbors
+        Q = _queries(X, TUNING_QUERIES, seed)
+        k = min(self.n_neighbors, len(X))
+        exact = NearestNeighbors(n_neighbors=k, algorithm="brute").fit(X).kneighbors(Q)[1]
+        nprobe, n_cells = 1, len(self.centroids)
+        while True:
+            recall = _recall(exact, self._ivf_search(Q, k, nprobe)[1])
+            if recall >= self.recall_target or nprobe >= n_cells:
+                return nprobe, float(recall)
+            nprobe = min(nprobe * 2, n_cells)
+
+    # --- KNeighborsClassifier interface ---
+    def kneighbors(self, X, n_neighbors=None):
+        Q = np.atleast_2d(np.asarray(X, dtype=np.float64))
+        k = n_neighbors or self.n_neighbors
+        if self.kind == "kdtree":
+            return self.tree.query(Q, k=k)
+        return self._ivf_search(Q, k, self.nprobe)
+
+    def predict_proba(self, X):
+        # Same voting as KNeighborsClassifier.predict_proba
+        dist, ind = self.kneighbors(X)
+        if self.weights == "distance":
+            with np.errstate(divide="ignore"):
+                weights = 1.0 / dist
+            inf_mask = np.isinf(weights)
+            inf_row = np.any(inf_mask, axis=1)
+            weights[inf_row] = inf_mask[inf_row]
+        else:
+            weights = np.ones_like(dist)
+        proba = np.zeros((len(ind), len(self.classes_)))
+        rows = np.arange(len(ind))
+        for i, labels in enumerate(self.y[ind].T):
+            proba[rows, labels] += weights[:, i]
+        normalizer = proba.sum(axis=1)[:, None]
+        normalizer[normalizer == 0.0] = 1.0
+        return proba / normalizer
+
+    def predict(self, X):
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
+
+# === Persistence ===
+def _stamp(file_path, recall_target):
+    stat = os.stat(file_path)
+    return (stat.st_size, stat.st_mtime_ns, recall_target, INDEX_VERSION)
+
+def index_path(name, root):
+    return os.path.join(root, INDEX_DIR, f"{name}.joblib")
+
+skipped = {}  # artifact name -> why it was left unindexed
+
+def _build(name, model):
+    # The index, or None (with the reason in `skipped`) when it would not beat brute force
+    n, dim = model._fit_X.shape
+    if dim > KDTREE_MAX_DIM and n < IVF_MIN_ROWS:
+        skipped[name] = f"{n} rows, below IVF_MIN_ROWS ({IVF_MIN_ROWS})"
+        return None
+    index = IndexedKNN(model)
+    if index.kind == "ivf" and index.nprobe >= len(index.centroids):
+        skipped[name] = (f"recall {index.recall_target} needs all {len(index.centroids)} cells, "
+                         f"a full scan (measured recall {index.recall:.3f})")
+        return None
+    return index
+
+def load_or_build(name, model, file_path, root):
+    """Saved index for artifact `name` if it matches file_path, else a fresh one (saved for next time).
+
+    Returns the model itself when it cannot be indexed or an index would be slower.
+    """
+    from sklearn.neighbors import KNeighborsClassifier
+    if not isinstance(model, KNeighborsClassifier):
+        return model
+    stamp = _stamp(file_path, RECALL_TARGET)
+    path = index_path(name, root)
+    if os.path.exists(path):
+        try:
+            saved_stamp, index, reason = joblib.load(path)
+            if saved_stamp == stamp:
+                if index is None:
+                    skipped[name] = reason
+                return index if index is not None else model
+        except Exception:
+            pass  # unreadable or from an older layout: rebuild
+    try:
+        index = _build(name, model)
+    except TypeError:
+        return model
+    if index is None:
+        print(f"Not indexing {name}: {skipped[name]}; using brute force", file=sys.stderr)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        joblib.dump((stamp, index, skipped.get(name)), path)  # a skip is saved too, so tuning runs once
+    except OSError:
+        pass  # read-only model folder: keep the index in memory only
+    return index if index is not None else model
+
+# === Parity and latency checks ===
+def _best_ms(fn, repeats=20):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+def _queries(X, count, seed):
+    # Training rows with noise: realistic queries that are not exact copies
+    rng = np.random.default_rng(seed)
+    rows = X[rng.choice(len(X), count)]
+    return rows + rng.normal(scale=0.1, size=rows.shape) * X.std(axis=0)
+
+def _recall(exact, found):
+    # Mean fraction of each query's true neighbours that the index returned
+    return float(np.mean([len(set(e) & set(f)) / len(e) for e, f in zip(exact, found)]))
+
+def check_model(model, index, queries=200, seed=1):
+    # Fresh queries (the index was tuned with seed 0), so recall is not the tuning figure
+    Q = _queries(np.asarray(model._fit_X, dtype=np.float64), queries, seed)
+    return {
+        "kind": index.kind,
+        "nprobe": index.nprobe,
+        "recall": _recall(model.kneighbors(Q)[1], index.kneighbors(Q)[1]),
+        "label_agreement": float(np.mean(model.predict(Q) == index.predict(Q))),
+        "max_proba_diff": float(np.max(np.abs(model.predict_proba(Q) - index.predict_proba(Q)))),
+        "one_query_ms": (_best_ms(lambda: model.predict_proba(Q[:1])), _best_ms(lambda: index.predict_proba(Q[:1]))),
+    }
+
+def scaling(dim, max_rows=160_000, max_bytes=256 * 2**20, seed=0):
+    # Clustered synthetic reference sets growing 4x per step: brute force vs index, one query
+    from sklearn.neighbors import KNeighborsClassifier
+    rng = np.random.default_rng(seed)
+    largest = min(max_rows, max_bytes // (8 * dim))
+    results = []
+    for n in (largest // 16, largest // 4, largest):
+        centers = rng.normal(size=(64, dim)) * 4
+        X = centers[rng.integers(0, 64, n)] + rng.normal(size=(n, dim))
+        model = KNeighborsClassifier(algorithm="brute").fit(X, rng.integers(0, 7, n))
+        start = time.perf_counter()
+        index = IndexedKNN(model)
+        build_s = time.perf_counter() - start
+        r = check_model(model, index, queries=100)
+        results.append((n, build_s, r))
+    return results
+
+if __name__ == "__main__":
+    import knn_index  # the module model_registry loads indexes through (this script runs as __main__)
+    import model_registry
+
+    parser = argparse.ArgumentParser(description="Build and check the KNN indexes.")
+    parser.add_argument("--models", nargs="*", default=["park.knn", "skin.knn"], help="registry names")
+    parser.add_argument("--scaling", action="store_true", help="latency vs reference set size instead")
+    args = parser.parse_args()
+
+    if args.scaling:
+        for dim in (16, 1664):
+            for n, build_s, r in scaling(dim):
+                brute, indexed = r["one_query_ms"]
+                print(f"{dim}-d, {n} rows: {r['kind']} (nprobe {r['nprobe'] or '-'}) built in {build_s:.1f} s, "
+                      f"recall {r['recall']:.3f}, labels {r['label_agreement'] * 100:.1f}% equal; "
+                      f"1 query {brute:.2f} -> {indexed:.2f} ms")
+        raise SystemExit(0)
+
+    failed = False
+    for name in args.models:
+        try:
+            model = model_registry.load(name, indexed=False)
+            index = model_registry.load(name)
+        except Exception as e:
+            print(f"SKIP {name}: {e}")
+            continue
+        if index is model:
+            print(f"SKIP {name}: {knn_index.skipped.get(name, 'not an indexable KNN model')}")
+            continue
+        r = check_model(model, index)
+        failed |= r["recall"] < RECALL_TARGET
+        brute, indexed = r["one_query_ms"]
+        probe = f" (nprobe {r['nprobe']})" if r["nprobe"] else ""
+        print(f"{'OK  ' if r['recall'] >= RECALL_TARGET else 'LOW '} {name}: {r['kind']}{probe}, "
+              f"recall {r['recall']:.3f}, labels {r['label_agreement'] * 100:.1f}% equal, "
+              f"max proba diff {r['max_proba_diff']:.3f}; 1 query {brute:.2f} -> {indexed:.2f} ms")
+    raise SystemExit(1 if failed else 0)
@@ -0,0 +1,176 @@
+import argparse
+import time
+
+import numpy as np
+
+# === Fused linear preprocessing ===
+# A fitted StandardScaler (or MinMaxScaler) is an affine map, and so are PCA
+# and the decision function of a linear model. Chained, they collapse into one
+# precomputed matrix and offset, so inference is a single matrix multiply with
+# no intermediate arrays:
+#
+#   brain:  x -> scaler -> PCA                 ==  x @ W + b
+#   heart/park logistic regression:  sigmoid(x @ w + b)
+#
+# Everything is computed in float64; results match the sklearn chain to
+# float rounding (check with: python linear_fusion.py).
+
+PARITY_TOLERANCE = 1e-6  # max relative difference against the sklearn chain
+
+def _scaler_affine(scaler):
+    # Returns (a, c) with scaler.transform(x) == x * a + c, or None if not affine
+    from sklearn.preprocessing import MinMaxScaler, StandardScaler
+    n = scaler.n_features_in_
+    if isinstance(scaler, StandardScaler):
+        # mean_ / scale_ are fitted even when with_mean / with_std is off, but transform ignores them
+        a = 1.0 / scaler.scale_ if scaler.with_std and scaler.scale_ is not None else np.ones(n)
+        c = -scaler.mean_ * a if scaler.with_mean and scaler.mean_ is not None else np.zeros(n)
+        return a, c
+    if isinstance(scaler, MinMaxScaler) and not scaler.clip:
+        return scaler.scale_.astype(np.float64), scaler.min_.astype(np.float64)
+    return None
+
+class FusedAffine:
+    """transform(X) == X @ W + b, for 2-D X of any batch size."""
+
+    def __init__(self, W, b):
+        self.W = np.ascontiguousarray(W, dtype=np.float64)
+        self.b = np.ascontiguousarray(b, dtype=np.float64)
+        self.n_features_in_ = self.W.shape[0]
+
+    def transform(self, X):
+        return np.asarray(X, dtype=np.float64) @ self.W + self.b
+
+    @property
+    def nbytes(self):
+        return self.W.nbytes + self.b.nbytes
+
+class FusedLogistic(FusedAffine):
+    """Binary logistic regression with its scaler folded in (predict_proba only)."""
+
+    def __init__(self, W, b, classes):
+        super().__init__(W, b)
+        self.classes_ = classes
+
+    def predict_proba(self, X):
+        z = self.transform(X)[:, 0]
+        p = 1.0 / (1.0 + np.exp(-z))
+        return np.column_stack([1.0 - p, p])
+
+    def predict(self, X):
+        return self.classes_[(self.transform(X)[:, 0] > 0).astype(int)]
+
+class FusedLinearRegressor(FusedAffine):
+    def predict(self, X):
+        y = self.transform(X)
+        return y[:, 0] if y.shape[1] == 1 else y
+
+def _compose(scaler, M, b0):
+    # scaler followed by z @ M + b0
+    a, c = _scaler_affine(scaler)
+    return a[:, None] * M, c @ M + b0
+
+def fuse_scaler_pca(scaler, pca):
+    """Folds scaler.transform then pca.transform into one FusedAffine."""
+    if _scaler_affine(scaler) is None:
+        raise TypeError(f"{type(scaler).__name__} is not an affine scaler")
+    M = pca.components_.T.astype(np.float64)
+    if pca.whiten:
+        M = M / np.sqrt(pca.explained_variance_)
+    return FusedAffine(*_compose(scaler, M, -pca.mean_ @ M))
+
+def fuse_scaler_linear(scaler, model):
+    """Folds scaler into a linear model; None when the pair cannot be fused."""
+    from sklearn.base import is_regressor
+    from sklearn.linear_model import LogisticRegression
+    if _scaler_affine(scaler) is None or not hasattr(model, "coef_"):
+        return None
+    coef = np.atleast_2d(np.asarray(model.coef_, dtype=np.float64))
+    intercept = np.atleast_1d(np.asarray(model.intercept_, dtype=np.float64))
+    if isinstance(model, LogisticRegression) and len(model.classes_) == 2:
+        # FusedLogistic is the OvR sigmoid; binary multinomial (softmax) models, which
+        # sklearn < 1.7 could pickle, give other probabilities and stay unfused
+        if getattr(model, "multi_class", "auto") not in ("auto", "ovr", "deprecated"):
+            return None
+        return FusedLogistic(*_compose(scaler, coef.T, intercept), model.classes_)
+    if is_regressor(model) and type(model).__module__.startswith("sklearn.linear_model"):
+        return FusedLinearRegressor(*_compose(scaler, coef.T, intercept))
+    return None
+
+# === Parity and speed check against the sklearn chain ===
+def _relative_diff(a, b):
+    return float(np.max(np.abs(a - b)) / max(np.max(np.abs(b)), 1e-12))
+
+def _time(fn, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats * 1000
+
+def check_pair(name, reference, fused, X, repeats=200):
+    ref, out = reference(X), fused(X)
+    result = {
+        "rel_diff": _relative_diff(out, ref),
+        "single_ms": (_time(lambda: reference(X[:1]), repeats), _time(lambda: fused(X[:1]), repeats)),
+        "batch_ms": (_time(lambda: reference(X), 5), _time(lambda: fused(X), 5)),
+    }
+    result["ok"] = result["rel_diff"] <= PARITY_TOLERANCE
+    return name, result
+
+def check_parity(rows=10000, seed=0):
+    import brain_gui
+    import heart_gui
+    import park_gui
+
+    rng = np.random.default_rng(seed)
+    results = []
+    voting_model, label_encoder, scaler, pca = brain_gui.get_models()
+    X = rng.uniform(0, 2, size=(rows, scaler.n_features_in_))  # post-ReLU embeddings are non-negative
+    fused = fuse_scaler_pca(scaler, pca)
+    results.append(check_pair("brain scaler+pca", lambda x: pca.transform(scaler.transform(x)), fused.transform, X))
+    agree = np.mean(voting_model.predict(fused.transform(X[:500])) ==
+                    voting_model.predict(pca.transform(scaler.transform(X[:500]))))
+    results[-1][1]["label_agreement"] = float(agree)
+
+    for module, scaler_fn, model_name in ((heart_gui, heart_gui.get_scaler, "Logistic Regression"),
+                                          (park_gui, park_gui.get_scaler, "Logistic Regression")):
+        scaler, model = scaler_fn(), module.get_model(model_name)
+        fused = fuse_scaler_linear(scaler, model)
+        if fused is None:
+            continue
+        X = rng.normal(size=(rows, scaler.n_features_in_))
+        results.append(check_pair(f"{module.__name__} scaler+logreg",
+                                  lambda x: model.predict_proba(scaler.transform(x))[:, 1],
+                                  lambda x: fused.predict_proba(x)[:, 1], X))
+
+    # Scaler options the shipped models do not use, on small fitted stand-ins
+    from sklearn.decomposition import PCA
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.preprocessing import StandardScaler
+    X = rng.normal(3.0, 2.0, size=(rows, 16))
+    y = (X[:, 0] + rng.normal(size=rows) > 3.0).astype(int)
+    for with_mean, with_std in ((False, True), (True, False), (False, False)):
+        scaler = StandardScaler(with_mean=with_mean, with_std=with_std).fit(X)
+        pca = PCA(n_components=8, random_state=seed).fit(scaler.transform(X))
+        model = LogisticRegression(max_iter=500).fit(scaler.transform(X), y)
+        tag = f"with_mean={with_mean}, with_std={with_std}"
+        results.append(check_pair(f"scaler({tag})+pca", lambda x: pca.transform(scaler.transform(x)),
+                                  fuse_scaler_pca(scaler, pca).transform, X, repeats=20))
+        results.append(check_pair(f"scaler({tag})+logreg", lambda x: model.predict_proba(scaler.transform(x))[:, 1],
+                                  lambda x, fused=fuse_scaler_linear(scaler, model): fused.predict_proba(x)[:, 1],
+                                  X, repeats=20))
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parity and speed of the fused scaler chains.")
+    parser.add_argument("--rows", type=int, default=10000)
+    args = parser.parse_args()
+
+    failed = False
+    for name, r in check_parity(args.rows):
+        failed |= not r["ok"]
+        (ref1, fus1), (refb, fusb) = r["single_ms"], r["batch_ms"]
+        extra = f", labels {r['label_agreement'] * 100:.1f}% equal" if "label_agreement" in r else ""
+        print(f"{'OK  ' if r['ok'] else 'FAIL'} {name}: rel diff {r['rel_diff']:.1e}{extra}; "
+              f"1 row {ref1:.3f} -> {fus1:.3f} ms, {args.rows} rows {refb:.1f} -> {fusb:.1f} ms")
+    raise SystemExit(1 if failed else 0)
@@ -1,18 +1,49 @@
+from startup_timer import mark
 import tkinter as tk
+from tkinter import messagebox
+import importlib
 import subprocess
+import sys
+
+# Modules hosted by the launcher:
+# (button text, module, app class, window title, batch file, color, loading message)
+MODULES = [
+    ("🧠 Brain Tumor Classification", "brain_gui", "BrainTumorApp", "Brain Tumor Classification",
+     "runbrain.bat.bat", "#0096c7", "Launching Brain Tumor App..."),
+    ("🎙️ Parkinson's Detection", "py3_gui", "ParkinsonUPDRSApp", "Parkinson's Voice Predictor",
+     "runp2.bat.bat", "#38b000", "Launching Parkinson's Predictor..."),
+    ("🎙️ Parkinson's Voice Classifier", "park_gui", "ParkinsonApp", "Parkinson's Predictor",
+     "runp.bat.bat", "#2b9348", "Launching Parkinson's Classifier..."),
+    ("🧠 Alzheimer's Risk Prediction", "alz_gui", "AlzheimerApp", "🧠 Alzheimer's Risk Prediction",
+     "runalz.bat.bat", "#ff8500", "Launching Alzheimer's Predictor..."),
+    ("❤️ Heart Disease Prediction", "heart_gui", "HeartDiseaseApp", "Heart Disease Prediction System",
+     "runheart.bat.bat", "#dc3545", "Launching Heart Disease Predictor..."),
+    ("🔬 Skin Cancer Classification", "skin_gui", "SkinCancerApp", "Skin Cancer Classifier (7-Class)",
+     "runskin.bat.bat", "#6f42c1", "Launching Skin Cancer Classifier..."),
+]
 
 class MainMenu(tk.Tk):
-    def __init__(self):
+    def __init__(self, single_process=True):
         super().__init__()
         self.title("Medical AI Launcher")
         self.state('zoomed')
         self.configure(bg="#f2f2f2")
 
+        # Single-process mode hosts every module as a frame in this window.
+        # Apps are kept after first use so their models stay loaded.
+        self.single_process = single_process
+        self.apps = {}
+        self.current_app = None
+
         # ESC to exit fullscreen
         self.bind("<Escape>", lambda e: self.attributes("-fullscreen", False))
 
+        # Menu Frame
+        self.menu_frame = tk.Frame(self, bg="#f2f2f2")
+        self.menu_frame.pack(expand=True, fill="both")
+
         # Container Frame
-        container = tk.Frame(self, bg="#f2f2f2")
+        container = tk.Frame(self.menu_frame, bg="#f2f2f2")
         container.pack(expand=True)
 
         # Title
@@ -22,26 +53,15 @@ class MainMenu(tk.Tk):
         ).pack(pady=30)
 
         # Buttons
-        self.create_menu_button(
-            container, "🧠 Brain Tumor Classification", "runbrain.bat.bat", "#0096c7", "Launching Brain Tumor App..."
-        )
-        self.create_menu_button(
-            container, "🎙️ Parkinson's Detection", "runp2.bat.bat", "#38b000", "Launching Parkinson's Predictor..."
-        )
-        self.create_menu_button(
-            container, "🧠 Alzheimer's Risk Prediction", "runalz.bat.bat", "#ff8500", "Launching Alzheimer's Predictor..."
-        )
-        self.create_menu_button(
-            container, "❤️ Heart Disease Prediction", "runheart.bat.bat", "#dc3545", "Launching Heart Disease Predictor..."
-        )
-        self.create_menu_button(
-            container, "🔬 Skin Cancer Classification", "runskin.bat.bat", "#6f42c1", "Launching Skin Cancer Classifier..."
-        )
+        for text, module, app_class, title, bat_file, color, message in MODULES:
+            self.create_menu_button(
+                container, text, bat_file, color, message, module=(module, app_class, title)
+            )
         self.create_menu_button(
             container, "🚪 Exit", None, "#ef233c", is_exit=True
         )
 
-    def create_menu_button(self, parent, text, bat_file, color, message=None, is_exit=False):
+    def create_menu_button(self, parent, text, bat_file, color, message=None, is_exit=False, module=None):
         def on_enter(e): btn.config(bg=hover_color)
         def on_leave(e): btn.config(bg=color)
 
@@ -50,6 +70,8 @@ class MainMenu(tk.Tk):
         def on_click():
             if is_exit:
                 self.quit()
+            elif self.single_process and module:
+                self.show_module(*module, message)
             else:
                 self.launch_and_delay(bat_file, message)
 
@@ -63,11 +85,33 @@ class MainMenu(tk.Tk):
         btn.bind("<Enter>", on_enter)
         btn.bind("<Leave>", on_leave)
 
-    def launch_and_delay(self, bat_file, message):
-        # Start the batch file
-        subprocess.Popen([bat_file], shell=True)
+    def show_module(self, module_name, app_class, title, message):
+        app = self.apps.get(module_name)
+        if app is None:
+            popup = self.show_popup(message)
+            try:
+                module = importlib.import_module(module_name)
+                app = getattr(module, app_class)(self, on_back=self.show_menu)
+            except Exception as e:
+                messagebox.showerror("Error", f"Could not load {module_name}:\n{e}")
+                return
+            finally:
+                popup.destroy()
+            self.apps[module_name] = app
+
+        self.menu_frame.pack_forget()
+        app.pack(expand=True, fill="both")
+        self.current_app = app
+        self.title(title)
+
+    def show_menu(self):
+        if self.current_app is not None:
+            self.current_app.pack_forget()
+            self.current_app = None
+        self.menu_frame.pack(expand=True, fill="both")
+        self.title("Medical AI Launcher")
 
-        # Show popup
+    def show_popup(self, message):
         popup = tk.Toplevel(self)
         popup.title("Loading")
         popup.configure(bg="white")
@@ -82,6 +126,14 @@ class MainMenu(tk.Tk):
 
         tk.Label(popup, text=message, font=("Arial", 14), bg="white", fg="#333").pack(pady=40)
         popup.update()
+        return popup
+
+    def launch_and_delay(self, bat_file, message):
+        # Start the batch file
+        subprocess.Popen([bat_file], shell=True)
+
+        # Show popup
+        popup = self.show_popup(message)
 
         # Delay then close
         self.after(6000, lambda: (popup.destroy(), self.destroy()))
@@ -94,5 +146,8 @@ class MainMenu(tk.Tk):
         return "#{:02x}{:02x}{:02x}".format(*darker_rgb)
 
 if __name__ == "__main__":
-    app = MainMenu()
+    # --spawn keeps the old behaviour of one process per module
+    app = MainMenu(single_process="--spawn" not in sys.argv)
+    app.update()
+    mark("first_window")
     app.mainloop()
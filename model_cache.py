@@ -0,0 +1,128 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import joblib
+
+# === Lazy, memory-budgeted model cache ===
+# Artifacts load on first use and stay resident until the RAM budget is
+# exceeded, then the least recently used ones are dropped. Sizes are
+# approximated by the artifact's size on disk unless given explicitly.
+
+DEFAULT_BUDGET_MB = float(os.environ.get("MEDAI_MODEL_CACHE_MB", "2048"))
+
+def artifact_size(path):
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(dirpath, name))
+                   for dirpath, _, names in os.walk(path) for name in names)
+    return os.path.getsize(path)
+
+class _Entry:
+    __slots__ = ("value", "size", "load_time", "hits")
+
+    def __init__(self, value, size, load_time):
+        self.value = value
+        self.size = size
+        self.load_time = load_time
+        self.hits = 0
+
+class ModelCache:
+    def __init__(self, budget_mb=DEFAULT_BUDGET_MB):
+        self.budget = int(budget_mb * 1024 * 1024)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.load_time = 0.0
+
+    def get(self, key, loader, size=None):
+        """Returns the cached artifact for key, calling loader() on a miss.
+
+        size is the approximate resident size in bytes; by default the size of
+        the file or directory named by key.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                entry.hits += 1
+                self.hits += 1
+                return entry.value
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        # Load outside the cache lock so hits on other models never wait
+        with key_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    entry.hits += 1
+                    self.hits += 1
+                    return entry.value
+                self.misses += 1
+
+            start = time.perf_counter()
+            value = loader()
+            elapsed = time.perf_counter() - start
+            if size is None:
+                size = artifact_size(key) if isinstance(key, str) and os.path.exists(key) else 0
+
+            with self._lock:
+                self.load_time += elapsed
+                self._entries[key] = _Entry(value, size, elapsed)
+                self._evict(keep=key)
+            return value
+
+    def _evict(self, keep):
+        total = sum(e.size for e in self._entries.values())
+        for key in list(self._entries):
+            if total <= self.budget:
+                break
+            if key == keep:
+                continue
+            total -= self._entries.pop(key).size
+            self.evictions += 1
+
+    def set_budget(self, budget_mb):
+        with self._lock:
+            self.budget = int(budget_mb * 1024 * 1024)
+            self._evict(keep=None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "load_time_s": round(self.load_time, 4),
+                "resident_mb": round(sum(e.size for e in self._entries.values()) / 2**20, 2),
+                "budget_mb": round(self.budget / 2**20, 2),
+                "entries": {
+                    str(k): {"size_mb": round(e.size / 2**20, 2), "load_time_s": round(e.load_time, 4), "hits": e.hits}
+                    for k, e in self._entries.items()
+                },
+            }
+
+# Shared by every module in the process
+model_cache = ModelCache()
+
+# Uncached readers, for loaders that do more work on a miss (model_registry.py)
+def read_joblib(path, mmap_mode=None):
+    # mmap_mode ("r"/"c") maps the pickled numpy arrays instead of copying them
+    return joblib.load(path, mmap_mode=mmap_mode)
+
+def read_keras(path):
+    from tensorflow.keras.models import load_model
+    return load_model(path)
+
+def load_joblib(path, mmap_mode=None):
+    return model_cache.get(path, lambda: read_joblib(path, mmap_mode))
+
+def load_keras(path):
+    return model_cache.get(path, lambda: read_keras(path))
@@ -0,0 +1,228 @@
+import argparse
+import hashlib
+import json
+import os
+import threading
+
+from model_cache import artifact_size, model_cache, read_joblib, read_keras
+
+# === Model registry ===
+# models_manifest.json lists every artifact the GUIs load: its path (relative,
+# forward slashes), loader kind, expected feature set, version and optional
+# sha256. Paths resolve against MEDAI_MODEL_ROOT, or the folder holding the
+# manifest, so the apps no longer depend on the working directory.
+#
+# Loading an artifact checks its checksum (when pinned) and its feature count
+# and order against the manifest, and raises ModelManifestError with the
+# artifact name instead of failing later inside predict(). The checks run when
+# the artifact is read into the model cache; cache hits skip them. Artifacts marked
+# "mmap" are loaded with joblib memory mapping: their numpy arrays (PCA
+# components, SVM support vectors, KNN training data, ...) stay in the page
+# cache and are shared by every process that loads the same file. Tree
+# ensembles marked "compiled" are returned as tree_compiler equivalents
+# (same outputs, faster small batches); MEDAI_COMPILED_TREES=0 turns that off.
+# KNN models marked "knn_index" answer queries from a saved knn_index index
+# instead of brute force; MEDAI_KNN_INDEX=0 turns that off. MEDAI_SKLEARN_JOBS
+# (usually from the autotune.py profile) replaces the pickled n_jobs of every
+# loaded model, so models saved with n_jobs=-1 do not claim every core.
+#
+#   python model_registry.py list     # paths, versions, what is missing
+#   python model_registry.py verify   # load every artifact and check it
+#   python model_registry.py pin      # record sha256 checksums in the manifest
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+MANIFEST_PATH = os.environ.get("MEDAI_MODEL_MANIFEST", os.path.join(REPO_DIR, "models_manifest.json"))
+VERIFY_CHECKSUMS = os.environ.get("MEDAI_VERIFY_MODELS", "1") != "0"
+COMPILED_TREES = os.environ.get("MEDAI_COMPILED_TREES", "1") != "0"
+KNN_INDEX = os.environ.get("MEDAI_KNN_INDEX", "1") != "0"
+SKLEARN_JOBS = int(os.environ.get("MEDAI_SKLEARN_JOBS") or 0)  # 0: keep the pickled n_jobs
+
+class ModelManifestError(Exception):
+    pass
+
+_manifest = None
+_features = {}  # feature_set -> names, read once
+_verified = set()
+_lock = threading.Lock()
+
+def manifest():
+    global _manifest
+    if _manifest is None:
+        with open(MANIFEST_PATH, "r", encoding="utf-8") as f:
+            _manifest = json.load(f)
+    return _manifest
+
+def model_root():
+    return os.environ.get("MEDAI_MODEL_ROOT") or os.path.dirname(os.path.abspath(MANIFEST_PATH))
+
+def resolve(relative_path):
+    return os.path.join(model_root(), *relative_path.split("/"))
+
+def entry(name):
+    try:
+        return manifest()["artifacts"][name]
+    except KeyError:
+        raise ModelManifestError(f"'{name}' is not listed in {MANIFEST_PATH}") from None
+
+def path(name):
+    return resolve(entry(name)["path"])
+
+def features(feature_set):
+    """Feature names in model order for feature_set, or None if only the count is known."""
+    if feature_set not in _features:
+        spec = manifest()["feature_sets"][feature_set]
+        if "file" in spec:
+            with open(resolve(spec["file"]), "r", encoding="utf-8") as f:
+                _features[feature_set] = json.load(f)
+        else:
+            _features[feature_set] = spec.get("features")
+    return _features[feature_set]
+
+def n_features(feature_set):
+    spec = manifest()["feature_sets"][feature_set]
+    names = features(feature_set)
+    return len(names) if names is not None else spec.get("n_features")
+
+# === Integrity checks ===
+def sha256(file_path):
+    h = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def _check_checksum(name, spec, file_path):
+    if not VERIFY_CHECKSUMS or not spec.get("sha256") or os.path.isdir(file_path):
+        return
+    stat = os.stat(file_path)
+    stamp = (file_path, stat.st_size, stat.st_mtime_ns)
+    if stamp in _verified:
+        return
+    if sha256(file_path) != spec["sha256"]:
+        raise ModelManifestError(f"{name}: checksum mismatch for {file_path} "
+                                 f"(manifest version {spec.get('version')}); the file was replaced or corrupted")
+    _verified.add(stamp)
+
+def _model_features(model):
+    names = getattr(model, "feature_names_in_", None)
+    count = getattr(model, "n_features_in_", None)
+    if count is None and hasattr(model, "input_shape"):  # Keras
+        count = model.input_shape[-1]
+    return (list(names) if names is not None else None), count
+
+def check_features(name, model):
+    spec = entry(name)
+    feature_set = spec.get("features")
+    if not feature_set:
+        return
+    expected_names = features(feature_set)
+    expected = n_features(feature_set)
+    names, count = _model_features(model)
+    if count is not None and expected is not None and count != expected:
+        raise ModelManifestError(f"{name}: {spec['path']} expects {count} features, but feature set "
+                                 f"'{feature_set}' has {expected}")
+    if names is not None and expected_names is not None and names != list(expected_names):
+        raise ModelManifestError(f"{name}: {spec['path']} was trained with a different feature order "
+                                 f"than feature set '{feature_set}'")
+
+# === Loading ===
+def set_n_jobs(model, n_jobs):
+    # Ensembles (voting, stacking) keep their own n_jobs and one per member
+    if hasattr(model, "get_booster"):  # XGBoost reads nthread from the booster
+        model.get_booster().set_param("nthread", n_jobs)
+    if hasattr(model, "n_jobs"):
+        model.n_jobs = n_jobs
+    members = getattr(model, "estimators_", None)
+    if isinstance(members, list):  # not gradient boosting's array of trees
+        for member in members:
+            if hasattr(member, "get_params") and not hasattr(member, "tree_"):
+                set_n_jobs(member, n_jobs)
+
+def _read_checked(name, spec, file_path):
+    # Cache miss: read the artifact and validate it against the manifest
+    if not os.path.exists(file_path):
+        raise ModelManifestError(f"{name}: {file_path} not found (set MEDAI_MODEL_ROOT to the folder "
+                                 f"that contains '{spec['path'].split('/')[0]}')")
+    with _lock:
+        _check_checksum(name, spec, file_path)
+    if spec.get("kind") == "keras":
+        model = read_keras(file_path)
+    else:
+        # Copy-on-write: libsvm needs writable buffers, untouched pages stay shared
+        model = read_joblib(file_path, mmap_mode="c" if spec.get("mmap") else None)
+    check_features(name, model)
+    return model
+
+def load(name, compiled=True, indexed=True):
+    """Loads artifact `name` through the shared model cache, checked against the manifest.
+
+    compiled=False / indexed=False return the original model for "compiled" / "knn_index" entries.
+    """
+    spec = entry(name)
+    file_path = resolve(spec["path"])
+    model = model_cache.get(file_path, lambda: _read_checked(name, spec, file_path))
+    if SKLEARN_JOBS and spec.get("kind") != "keras":
+        # Compiled models already split large batches across MEDAI_SKLEARN_JOBS threads
+        set_n_jobs(model, 1 if compiled and COMPILED_TREES and spec.get("compiled") else SKLEARN_JOBS)
+    if compiled and COMPILED_TREES and spec.get("compiled"):
+        from tree_compiler import compile_model
+        return model_cache.get(("compiled", file_path), lambda: compile_model(model) or model,
+                               size=artifact_size(file_path))
+    if indexed and KNN_INDEX and spec.get("knn_index"):
+        from knn_index import load_or_build
+        return model_cache.get(("knn_index", file_path), lambda: load_or_build(name, model, file_path, model_root()),
+                               size=artifact_size(file_path))
+    return model
+
+def check_input_width(feature_set, width):
+    # Fail fast on user data (e.g. a loaded CSV) before any model is called
+    expected = n_features(feature_set)
+    if expected is not None and width != expected:
+        raise ModelManifestError(f"Expected {expected} feature columns for '{feature_set}', got {width}")
+
+# === Manifest maintenance ===
+def status():
+    rows = []
+    for name, spec in manifest()["artifacts"].items():
+        file_path = resolve(spec["path"])
+        rows.append((name, spec.get("version"), spec["path"], os.path.exists(file_path), bool(spec.get("sha256"))))
+    return rows
+
+def verify_all():
+    errors = {}
+    for name in manifest()["artifacts"]:
+        try:
+            load(name)
+        except Exception as e:
+            errors[name] = str(e)
+    return errors
+
+def pin():
+    data = manifest()
+    for name, spec in data["artifacts"].items():
+        file_path = resolve(spec["path"])
+        if os.path.isfile(file_path):
+            spec["sha256"] = sha256(file_path)
+    with open(MANIFEST_PATH, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+        f.write("\n")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect and verify the model manifest.")
+    parser.add_argument("command", choices=["list", "verify", "pin"])
+    args = parser.parse_args()
+
+    if args.command == "list":
+        print(f"Model root: {model_root()}")
+        for name, version, rel_path, exists, pinned in status():
+            print(f"{name:<26} v{version:<4} {'ok     ' if exists else 'MISSING'} "
+                  f"{'sha256' if pinned else '      '}  {rel_path}")
+    elif args.command == "verify":
+        errors = verify_all()
+        for name, error in errors.items():
+            print(f"FAIL {error}" if error.startswith(name) else f"FAIL {name}: {error}")
+        print(f"{len(manifest()['artifacts']) - len(errors)} ok, {len(errors)} failed")
+        raise SystemExit(1 if errors else 0)
+    else:
+        pin()
+        print(f"Pinned checksums in {MANIFEST_PATH}")
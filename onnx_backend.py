@@ -0,0 +1,149 @@
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+import feature_extractor
+from startup_timer import lazy_import
+
+# === Optimized CPU backend for the DenseNet169 extractor ===
+# Exports the Keras extractor once to ONNX and runs it with ONNX Runtime
+# (all graph optimizations on), optionally int8 quantized. feature_extractor
+# uses it when MEDAI_EXTRACTOR_BACKEND allows and falls back to Keras when
+# onnxruntime or the exported file is missing.
+#
+#   python onnx_backend.py export [--int8]
+#   python onnx_backend.py compare IMAGE_DIR [...]   # parity + latency report
+#
+# Optional dependencies: onnxruntime (runtime), tf2onnx (export only).
+
+ONNX_DIR = "models_onnx"
+FP32_PATH = os.path.join(ONNX_DIR, "densenet169_avg.onnx")
+INT8_PATH = os.path.join(ONNX_DIR, "densenet169_avg_int8.onnx")
+
+class OnnxExtractor:
+    # Same predict() signature as the Keras model, so callers need no changes
+    def __init__(self, path, intra_op_threads=0):
+        ort = lazy_import("onnxruntime")
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = intra_op_threads
+        self.path = path
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def predict(self, images, batch_size=None, verbose=0):
+        images = np.ascontiguousarray(images, dtype=np.float32)
+        batch_size = batch_size or len(images)
+        outputs = [self.session.run(None, {self.input_name: images[i:i + batch_size]})[0]
+                   for i in range(0, len(images), batch_size)]
+        return np.concatenate(outputs).reshape(len(images), -1)
+
+def load_extractor(backend):
+    """Returns an OnnxExtractor for backend ("auto", "onnx", "onnx-int8"), or None to fall back to Keras."""
+    path = INT8_PATH if backend == "onnx-int8" else FP32_PATH
+    try:
+        lazy_import("onnxruntime")
+    except ImportError:
+        if backend == "auto":
+            return None
+        raise
+    if not os.path.exists(path):
+        if backend == "auto":
+            return None
+        raise FileNotFoundError(f"{path} not found; run: python onnx_backend.py export"
+                                + (" --int8" if backend == "onnx-int8" else ""))
+    return OnnxExtractor(path)
+
+# === Export ===
+def export(path=FP32_PATH, opset=13):
+    tf = lazy_import("tensorflow")
+    tf2onnx = lazy_import("tf2onnx")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    model = feature_extractor.build_keras_model()
+    spec = (tf.TensorSpec((None, feature_extractor.IMG_SIZE, feature_extractor.IMG_SIZE, 3), tf.float32, name="input"),)
+    tf2onnx.convert.from_keras(model, input_signature=spec, opset=opset, output_path=path)
+    return path
+
+def quantize(src=FP32_PATH, dst=INT8_PATH):
+    # Dynamic quantization: int8 weights, no calibration set needed
+    quantization = lazy_import("onnxruntime.quantization")
+    quantization.quantize_dynamic(src, dst, weight_type=quantization.QuantType.QInt8)
+    return dst
+
+# === Parity and latency check ===
+def _latency_ms(model, images, repeats):
+    model.predict(images[:1])  # warm-up
+    single = []
+    for _ in range(repeats):
+        for x in images:
+            start = time.perf_counter()
+            model.predict(x[None])
+            single.append((time.perf_counter() - start) * 1000)
+    start = time.perf_counter()
+    embeddings = model.predict(images)
+    batch = (time.perf_counter() - start) * 1000 / len(images)
+    return embeddings, float(np.median(single)), batch
+
+def _downstream(variant, embeddings):
+    # Labels from every classifier that consumes this embedding
+    if variant == "brain":
+        import brain_gui
+        voting_model, label_encoder, scaler, pca = brain_gui.get_models()
+        return {"voting_model": voting_model.predict(pca.transform(scaler.transform(embeddings)))}
+    import skin_gui
+    return {name: skin_gui.get_model(name).predict(embeddings) for name in skin_gui.model_paths}
+
+def compare(paths, repeats=3, with_int8=True):
+    import brain_gui
+    import skin_gui
+
+    backends = {"keras": feature_extractor.build_keras_model(), "onnx": OnnxExtractor(FP32_PATH)}
+    if with_int8 and os.path.exists(INT8_PATH):
+        backends["onnx-int8"] = OnnxExtractor(INT8_PATH)
+
+    report = {}
+    for variant, preprocess in (("brain", brain_gui.preprocess_image), ("skin", skin_gui.preprocess_image)):
+        images = np.stack([preprocess(p) for p in paths]).astype(np.float32)
+        results, reference = {}, None
+        for name, model in backends.items():
+            embeddings, single_ms, batch_ms = _latency_ms(model, images, repeats)
+            labels = _downstream(variant, embeddings)
+            entry = {"single_image_ms": round(single_ms, 2), "batched_ms_per_image": round(batch_ms, 2)}
+            if reference is None:
+                reference = (embeddings, labels)
+            else:
+                ref_emb, ref_labels = reference
+                cosine = np.sum(embeddings * ref_emb, axis=1) / (
+                    np.linalg.norm(embeddings, axis=1) * np.linalg.norm(ref_emb, axis=1) + 1e-12)
+                entry["max_abs_diff"] = float(np.max(np.abs(embeddings - ref_emb)))
+                entry["min_cosine"] = float(np.min(cosine))
+                entry["label_agreement"] = {k: float(np.mean(labels[k] == ref_labels[k])) for k in labels}
+                entry["speedup"] = round(results["keras"]["single_image_ms"] / single_ms, 2)
+            results[name] = entry
+        report[variant] = results
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ONNX Runtime backend for the DenseNet169 extractor.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_export = sub.add_parser("export", help="export the Keras extractor to ONNX")
+    p_export.add_argument("--int8", action="store_true", help="also write an int8 quantized copy")
+    p_compare = sub.add_parser("compare", help="accuracy parity and latency against Keras")
+    p_compare.add_argument("inputs", nargs="+", help="image files, directories, or @file_list.txt")
+    p_compare.add_argument("--repeats", type=int, default=3)
+    p_compare.add_argument("-o", "--output", default="onnx_parity.json")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        print(f"Exported {export()}")
+        if args.int8:
+            print(f"Quantized {quantize()}")
+    else:
+        from brain_batch import collect_images
+        report = compare(collect_images(args.inputs), args.repeats)
+        print(json.dumps(report, indent=2))
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
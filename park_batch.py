@@ -0,0 +1,139 @@
+import argparse
+import csv
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import runtime_profile  # noqa: F401  tuned thread/batch settings, before numpy loads
+import numpy as np
+
+from result_writer import ResultWriter, collect_files
+
+# === Bulk voice analysis for Parkinson's screening ===
+# Usage: python park_batch.py RECORDINGS_DIR [more dirs/files, @list.txt] -o results.csv [--model SVM]
+# Praat feature extraction is CPU-bound and single-threaded, so every WAV is
+# analysed in a process pool with one worker per core. Finished features are
+# scored BATCH_FILES at a time with one scaler + model call, and every batch is
+# appended to the results file. Running the same command again skips the files
+# already in the results file, so an interrupted run resumes where it stopped.
+
+WAV_EXTENSIONS = (".wav",)
+BATCH_FILES = 256
+
+def collect_wavs(inputs):
+    return collect_files(inputs, WAV_EXTENSIONS)
+
+# === Resume ===
+def _drop_partial_line(path):
+    # A run killed mid-write can leave half a record; cut it before appending
+    with open(path, "rb+") as f:
+        data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            f.truncate(end)
+
+def completed_paths(out_path, retry_errors=False):
+    """Paths already recorded in out_path (those with an error too, unless retry_errors)."""
+    if not os.path.exists(out_path) or os.path.getsize(out_path) == 0:
+        return set()
+    _drop_partial_line(out_path)
+    with open(out_path, "r", newline="", encoding="utf-8") as f:
+        if out_path.lower().endswith((".jsonl", ".json")):
+            rows = [json.loads(line) for line in f if line.strip()]
+        else:
+            rows = list(csv.DictReader(f))
+    return {row["path"] for row in rows if not (retry_errors and row.get("error"))}
+
+# === Extraction (worker processes) ===
+def _extract(path, feature_names, max_sample_rate):
+    try:
+        from voice_features import extract_features_from_wav
+        features = extract_features_from_wav(path, max_sample_rate)
+        return path, [features[name] for name in feature_names], None
+    except Exception as e:
+        return path, None, " ".join(str(e).split()) or type(e).__name__
+
+def extract_all(paths, feature_names, workers=None, max_sample_rate=None):
+    # Yields (path, feature values or None, error) in input order, with a bounded number in flight
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        it = iter(paths)
+        pending = deque()
+        for path in it:
+            pending.append(pool.submit(_extract, path, feature_names, max_sample_rate))
+            if len(pending) >= workers * 4:
+                break
+        while pending:
+            yield pending.popleft().result()
+            for path in it:
+                pending.append(pool.submit(_extract, path, feature_names, max_sample_rate))
+                break
+
+# === Scoring ===
+def score_batch(batch, feature_names, predict_batch, interpret):
+    ok = [i for i, (_, values, _) in enumerate(batch) if values is not None and np.all(np.isfinite(values))]
+    probabilities = {}
+    if ok:
+        matrix = np.array([batch[i][1] for i in ok], dtype=np.float64)
+        probabilities = dict(zip(ok, predict_batch(matrix)))  # one scaler + model call per batch
+
+    rows = []
+    for i, (path, values, error) in enumerate(batch):
+        row = {"path": path, "probability": "", "label": "", "error": error or ""}
+        if values is not None:
+            row.update(zip(feature_names, values))
+            if i in probabilities:
+                row["probability"] = float(probabilities[i])
+                row["label"] = interpret(probabilities[i])
+            elif not error:
+                row["error"] = "no voiced speech (undefined features)"
+        rows.append(row)
+    return rows
+
+def analyze(paths, out_path, feature_names, predict_batch, interpret, workers=None, batch_files=BATCH_FILES,
+            max_sample_rate=None, retry_errors=False, progress=None):
+    """Extracts, scores and appends every path not yet in out_path. Returns (analysed, skipped, seconds)."""
+    done = completed_paths(out_path, retry_errors)
+    todo = [p for p in paths if p not in done]
+    fields = ["path"] + list(feature_names) + ["probability", "label", "error"]
+    start = time.perf_counter()
+    analysed = 0
+    with ResultWriter(out_path, fields, append=True) as writer:
+        batch = []
+        for result in extract_all(todo, feature_names, workers, max_sample_rate):
+            batch.append(result)
+            if len(batch) == batch_files:
+                writer.write_rows(score_batch(batch, feature_names, predict_batch, interpret))
+                analysed += len(batch)
+                batch = []
+                if progress:
+                    progress(analysed, len(todo), time.perf_counter() - start)
+        if batch:
+            writer.write_rows(score_batch(batch, feature_names, predict_batch, interpret))
+            analysed += len(batch)
+    return analysed, len(paths) - len(todo), time.perf_counter() - start
+
+if __name__ == "__main__":
+    import park_gui
+
+    parser = argparse.ArgumentParser(description="Analyse every WAV under the given folders.")
+    parser.add_argument("inputs", nargs="+", help="WAV files, directories, or @file_list.txt")
+    parser.add_argument("-o", "--output", default="park_results.csv", help=".csv or .jsonl (appended to)")
+    parser.add_argument("--model", default="Random Forest", choices=list(park_gui.model_paths))
+    parser.add_argument("--workers", type=int, default=None, help="extraction processes (default: one per core)")
+    parser.add_argument("--batch-files", type=int, default=BATCH_FILES, help="files per scoring call")
+    parser.add_argument("--max-sample-rate", type=int, default=None, help="see voice_features.py")
+    parser.add_argument("--retry-errors", action="store_true", help="re-analyse files that failed last time")
+    args = parser.parse_args()
+
+    def progress(done, total, elapsed):
+        print(f"{done}/{total} files, {done / elapsed:.1f} files/sec", flush=True)
+
+    analysed, skipped, elapsed = analyze(
+        collect_wavs(args.inputs), args.output, park_gui.feature_names,
+        lambda matrix: park_gui.predict_batch(args.model, matrix), park_gui.interpret_probability,
+        args.workers, args.batch_files, args.max_sample_rate, args.retry_errors, progress)
+    print(f"Analysed {analysed} files in {elapsed:.2f}s ({analysed / max(elapsed, 1e-9):.1f} files/sec), "
+          f"{skipped} already done -> {args.output}")
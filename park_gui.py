@@ -1,85 +1,145 @@
+from startup_timer import lazy_import, mark, warm_up_in_background
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
 import numpy as np
-import joblib
-import json
 import os
-import sounddevice as sd
-from scipy.io.wavfile import write
-from tensorflow.keras.models import load_model
-import parselmouth
-from parselmouth.praat import call
 import subprocess
+import model_registry
+from model_cache import model_cache
+import linear_fusion
+from inference_executor import TaskStatus
+from voice_stream import VoiceStream, save_recording
+from stage_timer import stage, timed
+from audit_log import audit
 
-# Load feature list
-model_dir = "modelsp"  # Folder where all model files are stored
+RECORD_SECONDS = 5
+SAMPLE_RATE = 16000
+KERAS_BATCH_SIZE = int(os.environ.get("MEDAI_KERAS_BATCH", "8192"))  # see runtime_profile.py
 
-with open(os.path.join(model_dir, "feature_list.json"), "r") as f:
-    feature_names = json.load(f)
+# Load feature list (modelsp/feature_list.json, via the manifest)
+feature_names = model_registry.features("park")
 
-# Load scaler
-scaler = joblib.load(os.path.join(model_dir, "scaler.pkl"))
+# Scaler (loaded on first use)
+def get_scaler():
+    return model_registry.load("park.scaler")
 
-# Define model file paths
-model_paths = {
-    "Random Forest": os.path.join(model_dir, "rf_classifier.pkl"),
-    "Logistic Regression": os.path.join(model_dir, "logreg_classifier.pkl"),
-    "SVM": os.path.join(model_dir, "svm_classifier.pkl"),
-    "KNN": os.path.join(model_dir, "knn_classifier.pkl"),
-    "AdaBoost": os.path.join(model_dir, "adaboost_classifier.pkl"),
-    "MLP (Keras)": os.path.join(model_dir, "parkinsons_mlp_model.h5")
+# Models, by registry name
+model_keys = {
+    "Random Forest": "park.random_forest",
+    "Logistic Regression": "park.logistic_regression",
+    "SVM": "park.svm",
+    "KNN": "park.knn",
+    "AdaBoost": "park.adaboost",
+    "MLP (Keras)": "park.mlp"
 }
+model_paths = {name: model_registry.path(key) for name, key in model_keys.items()}
 
-# Extract features from a WAV file
-def extract_features_from_wav(path):
-    snd = parselmouth.Sound(path)
-    pitch = call(snd, "To Pitch", 0.0, 75, 600)
-    pp = call(snd, "To PointProcess (periodic, cc)", 75, 600)
-    hnr_obj = call(snd, "To Harmonicity (cc)", 0.01, 75, 0.1, 1.0)
-    hnr = call(hnr_obj, "Get mean", 0, 0)
-
-    return {
-        "Jitter(%)": call(pp, "Get jitter (local)", 0, 0, 0.0001, 0.02, 1.3),
-        "Jitter(Abs)": call(pp, "Get jitter (local, absolute)", 0, 0, 0.0001, 0.02, 1.3),
-        "Jitter:RAP": call(pp, "Get jitter (rap)", 0, 0, 0.0001, 0.02, 1.3),
-        "Jitter:PPQ5": call(pp, "Get jitter (ppq5)", 0, 0, 0.0001, 0.02, 1.3),
-        "Jitter:DDP": 3 * call(pp, "Get jitter (rap)", 0, 0, 0.0001, 0.02, 1.3),
-        "Shimmer": call([snd, pp], "Get shimmer (local)", 0, 0, 0.0001, 0.02, 1.3, 1.6),
-        "Shimmer(dB)": call([snd, pp], "Get shimmer (local_dB)", 0, 0, 0.0001, 0.02, 1.3, 1.6),
-        "Shimmer:APQ3": call([snd, pp], "Get shimmer (apq3)", 0, 0, 0.0001, 0.02, 1.3, 1.6),
-        "Shimmer:APQ5": call([snd, pp], "Get shimmer (apq5)", 0, 0, 0.0001, 0.02, 1.3, 1.6),
-        "Shimmer:APQ11": call([snd, pp], "Get shimmer (apq11)", 0, 0, 0.0001, 0.02, 1.3, 1.6),
-        "Shimmer:DDA": 3 * call([snd, pp], "Get shimmer (apq3)", 0, 0, 0.0001, 0.02, 1.3, 1.6),
-        "NHR": 1 / (hnr + 1e-6),
-        "HNR": hnr,
-        "RPDE": 0.81, "DFA": 1.34, "PPE": 0.005, "age": 65.0, "sex": 1.0
-    }
+# Loaded on first use and kept resident in the shared model cache
+def get_model(model_name):
+    return model_registry.load(model_keys[model_name])
+
+# Scaler folded into linear models (None for models that cannot be fused)
+def get_fused(model_name):
+    scaler, model = get_scaler(), get_model(model_name)
+    return model_cache.get(("fused", model_registry.path("park.scaler"), model_paths[model_name]),
+                           lambda: linear_fusion.fuse_scaler_linear(scaler, model), size=0)
 
 # Prediction logic
+@timed("park.predict")
 def predict(model_name, inputs):
+    with audit("park", model_keys[model_name], inputs=inputs) as record:
+        record.output = _predict(model_name, inputs)
+    return record.output
+
+def _predict(model_name, inputs):
     model_path = model_paths[model_name]
-    if "mlp" in model_path:
-        model = load_model(model_path)
-    else:
-        model = joblib.load(model_path)
+    model = get_model(model_name)
+    scaler = get_scaler()
 
-    scaled_input = scaler.transform([inputs])
+    fused = None if "mlp" in model_path else get_fused(model_name)
+    if fused is not None:
+        with stage("park.fused_linear"):
+            prob = fused.predict_proba([inputs])[0][1]
+        return interpret_probability(prob), prob
+    with stage("park.scaler"):
+        scaled_input = scaler.transform([inputs])
+    with stage("park.model"):
+        if "mlp" in model_path:
+            prob = model.predict(scaled_input)[0][0]
+        else:
+            prob = model.predict_proba(scaled_input)[0][1]
+
+    return interpret_probability(prob), prob
+
+# Probabilities for a matrix of feature rows: one scaler + model call (park_batch)
+def predict_batch(model_name, matrix):
+    model_path = model_paths[model_name]
+    fused = None if "mlp" in model_path else get_fused(model_name)
+    if fused is not None:
+        return fused.predict_proba(matrix)[:, 1]
+    scaled = get_scaler().transform(matrix)
+    model = get_model(model_name)
     if "mlp" in model_path:
-        prob = model.predict(scaled_input)[0][0]
-    else:
-        prob = model.predict_proba(scaled_input)[0][1]
+        return model.predict(scaled, batch_size=KERAS_BATCH_SIZE, verbose=0)[:, 0]
+    return model.predict_proba(scaled)[:, 1]
+
+def interpret_probability(prob):
+    return "Likely Parkinson’s" if prob >= 0.5 else "Likely Healthy"
+
+# Extract features from a WAV file or in-memory samples and predict (runs on the background executor)
+@timed("park.predict_wav")
+def predict_wav(model_name, audio, sample_rate=None):
+    with audit("park", model_keys[model_name], inputs=audio) as record:
+        features = lazy_import("voice_features").extract_features(audio, sample_rate=sample_rate)
+        input_vals = [features[f] for f in feature_names]
+        record.output = predict(model_name, input_vals)
+    return record.output
+
+# Bulk analysis of a folder of recordings (resumes into an existing results file)
+def analyze_folder(model_name, folder, out_path):
+    park_batch = lazy_import("park_batch")
+    with audit("park", model_keys[model_name], inputs=folder) as record:
+        analysed, skipped, seconds = park_batch.analyze(park_batch.collect_wavs([folder]), out_path, feature_names,
+                                                        lambda matrix: predict_batch(model_name, matrix),
+                                                        interpret_probability)
+        record.output = {"analysed": analysed, "skipped": skipped, "path": out_path}
+    return analysed, skipped, seconds
+
+# Background warm-up: Praat, audio I/O, scaler and the default model
+def warm_up():
+    lazy_import("voice_features")
+    lazy_import("sounddevice")
+    get_scaler()
+    get_model("Random Forest")
+
+# Probability for one window of live audio (None if the window is unvoiced);
+# not audited: finish_recording logs the estimate that is shown
+def analyze_window(snd, model_name):
+    features = lazy_import("voice_features").extract_features(snd)
+    input_vals = [features[f] for f in feature_names]
+    if not np.all(np.isfinite(input_vals)):
+        return None
+    return _predict(model_name, input_vals)[1]
 
-    result = "Likely Parkinson’s" if prob >= 0.5 else "Likely Healthy"
-    return result, prob
+# Stops capture (joins the analysis worker, which may analyse a short take); runs on the background executor
+def finish_recording(stream, model_name):
+    with audit("park", model_keys[model_name]) as record:
+        record.output = stream.stop()
+        record.inputs = stream.recording()
+        save_recording(record.inputs, SAMPLE_RATE, prefix="park")  # analysis already ran on the array
+        if stream.error is not None and record.output is None:
+            raise stream.error
+    return record.output
 
 # Main App GUI
-class ParkinsonApp(tk.Tk):
-    def __init__(self):
-        super().__init__()
-        self.title("Parkinson's Predictor")
-        self.geometry("800x600")
+class ParkinsonApp(tk.Frame):
+    def __init__(self, master, on_back=None):
+        super().__init__(master)
+        self.on_back = on_back
+        self.stream = None
+        self.stream_model = None  # model the live windows are scored with
+        warm_up_in_background("park_gui", warm_up)
         self.create_widgets()
-        self.protocol("WM_DELETE_WINDOW", self.on_closing)  # Handle close button
 
     def create_widgets(self):
         self.model_var = tk.StringVar(value="Random Forest")
@@ -97,59 +157,123 @@ class ParkinsonApp(tk.Tk):
 
         tk.Button(self, text="Predict from Manual Input", command=self.manual_predict).pack(pady=10)
         tk.Button(self, text="Upload and Predict from Voice File", command=self.upload_voice).pack(pady=5)
-        tk.Button(self, text="🎙️ Record from Microphone", command=self.record_voice).pack(pady=5)
+        self.record_btn = tk.Button(self, text="🎙️ Record from Microphone", command=self.record_voice)
+        self.record_btn.pack(pady=5)
+        tk.Button(self, text="📂 Analyze Folder of Recordings", command=self.analyze_folder).pack(pady=5)
         tk.Button(self, text="⬅️ Back to Main Menu", command=self.back_to_main_menu).pack(pady=10)
 
+        self.tasks = TaskStatus(self)
+        self.tasks.pack()
         self.result_label = tk.Label(self, text="", font=("Helvetica", 14))
         self.result_label.pack(pady=10)
 
+    def show_result(self, result):
+        label, prob = result
+        self.result_label.config(text=f"{label} ({prob*100:.2f}%)")
+        mark("first_prediction")
+
     def manual_predict(self):
         try:
             input_vals = [float(self.entries[f].get()) for f in feature_names]
-            label, prob = predict(self.model_var.get(), input_vals)
-            self.result_label.config(text=f"{label} ({prob*100:.2f}%)")
         except Exception as e:
             messagebox.showerror("Error", str(e))
+            return
+        self.tasks.submit(predict, self.model_var.get(), input_vals, on_done=self.show_result,
+                          on_error=lambda e: messagebox.showerror("Error", str(e)))
 
     def upload_voice(self):
         filepath = filedialog.askopenfilename(filetypes=[("WAV files", "*.wav")])
         if filepath:
             self.predict_from_path(filepath)
 
+    # Streams the microphone and updates the estimate while the user speaks
     def record_voice(self):
-        fs = 16000
-        duration = 5
+        if self.stream is not None:
+            self.finish_recording()
+            return
         try:
             messagebox.showinfo("Recording", "Recording will start. Speak now...")
-            sd.default.device = (2, None)
-            recording = sd.rec(int(duration * fs), samplerate=fs, channels=1)
-            sd.wait()
-            filename = "recorded_voice.wav"
-            write(filename, fs, recording)
-            messagebox.showinfo("Done", f"Recording saved as {filename}")
-            self.predict_from_path(filename)
+            lazy_import("sounddevice").default.device = (2, None)
+            model_name = self.stream_model = self.model_var.get()
+            self.stream = VoiceStream(lambda snd: analyze_window(snd, model_name),
+                                      sample_rate=SAMPLE_RATE).start()
         except Exception as e:
+            self.stream = None
             messagebox.showerror("Recording Error", str(e))
+            return
+        self.record_btn.config(text="⏹ Stop Recording")
+        self.after(200, self.poll_recording)
+
+    def poll_recording(self):
+        if self.stream is None:
+            return
+        if self.stream.elapsed >= RECORD_SECONDS:
+            self.finish_recording()
+            return
+        text = f"🎙️ Listening... {self.stream.elapsed:.1f}s"
+        prob = self.stream.estimate
+        if prob is not None:
+            text += f"\n{interpret_probability(prob)} ({prob*100:.2f}%)"
+        self.result_label.config(text=text)
+        self.after(200, self.poll_recording)
+
+    def finish_recording(self):
+        stream, self.stream = self.stream, None
+        self.record_btn.config(text="🎙️ Record from Microphone")
+        self.result_label.config(text="")  # the task status shows progress
+
+        def done(prob):
+            if prob is None:
+                messagebox.showwarning("Recording", "No voiced speech detected. Please try again.")
+                return
+            self.result_label.config(text=f"{interpret_probability(prob)} ({prob*100:.2f}%)")
+            mark("first_prediction")
+
+        self.tasks.submit(finish_recording, stream, self.stream_model, on_done=done,
+                          on_error=lambda e: messagebox.showerror("Recording Error", str(e)))
+
+    def analyze_folder(self):
+        folder = filedialog.askdirectory()
+        if not folder:
+            return
+        out_path = filedialog.asksaveasfilename(defaultextension=".csv", initialfile="park_results.csv",
+                                                filetypes=[("CSV", "*.csv"), ("JSON Lines", "*.jsonl")],
+                                                confirmoverwrite=False)
+        if not out_path:
+            return
+
+        def done(result):
+            analysed, skipped, elapsed = result
+            messagebox.showinfo("Analysis Complete", f"Analysed {analysed} recordings in {elapsed:.1f}s "
+                                f"({skipped} already in the results file)\n\nSaved to {out_path}")
+
+        self.tasks.submit(analyze_folder, self.model_var.get(), folder, out_path, on_done=done,
+                          on_error=lambda e: messagebox.showerror("Analysis Error", str(e)))
 
     def predict_from_path(self, path):
-        try:
-            features = extract_features_from_wav(path)
-            input_vals = [features[f] for f in feature_names]
-            label, prob = predict(self.model_var.get(), input_vals)
-            self.result_label.config(text=f"{label} ({prob*100:.2f}%)")
-        except Exception as e:
-            messagebox.showerror("Prediction Error", str(e))
+        self.tasks.submit(predict_wav, self.model_var.get(), path, on_done=self.show_result,
+                          on_error=lambda e: messagebox.showerror("Prediction Error", str(e)))
 
     def back_to_main_menu(self):
-        self.destroy()
+        if self.on_back:
+            self.on_back()
+            return
+        self.winfo_toplevel().destroy()
         subprocess.Popen(["python", "main_menu.py"])
 
     def on_closing(self):
-        self.destroy()
+        self.winfo_toplevel().destroy()
         subprocess.Popen(["python", "main_menu.py"])
 
 # Run the app
 if __name__ == "__main__":
-    app = ParkinsonApp()
-    app.state('zoomed')  # Fullscreen
-    app.mainloop()
+    root = tk.Tk()
+    root.title("Parkinson's Predictor")
+    root.geometry("800x600")
+    app = ParkinsonApp(root)
+    app.pack(fill="both", expand=True)
+    root.protocol("WM_DELETE_WINDOW", app.on_closing)  # Handle close button
+    root.state('zoomed')  # Fullscreen
+    root.update()
+    mark("first_window")
+    root.mainloop()
@@ -1,32 +1,102 @@
+from startup_timer import lazy_import, mark, warm_up_in_background
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
 import numpy as np
-import joblib
 import os
-import sounddevice as sd
-from scipy.io.wavfile import write
-import threading
-import time
+import model_registry
+from inference_executor import TaskStatus
+from voice_stream import VoiceStream, save_recording
+from stage_timer import stage, timed
+from audit_log import audit
 import subprocess  # ✅ for launching main_menu.py
 
 # --- SETTINGS ---
-MODEL_DIR = "newmodels"
-MODEL_PATH = os.path.join(MODEL_DIR, "best_model.pkl")
-SCALER_PATH = os.path.join(MODEL_DIR, "scaler.pkl")
 RECORD_SECONDS = 5
 SAMPLE_RATE = 16000
 FEATURES_TXT = "mic_features.txt"
 
-feature_names = [
-    "Jitter(%)", "Jitter(Abs)", "Jitter:RAP", "Jitter:PPQ5", "Jitter:DDP",
-    "Shimmer", "Shimmer(dB)", "Shimmer:APQ3", "Shimmer:APQ5", "Shimmer:APQ11",
-    "Shimmer:DDA", "NHR", "HNR", "RPDE", "DFA",
-    "PPE", "Intensity", "Final PointProcess"
-]
+feature_names = model_registry.features("py3")  # model input order
 
-# Load model and scaler
-model = joblib.load(MODEL_PATH)
-scaler = joblib.load(SCALER_PATH)
+# Model and scaler (loaded on first use, see models_manifest.json)
+def get_model():
+    return model_registry.load("py3.model")
+
+def get_scaler():
+    return model_registry.load("py3.scaler")
+
+def warm_up():
+    lazy_import("voice_features")
+    lazy_import("sounddevice")
+    get_scaler()
+    get_model()
+
+# Inference, run on the background executor
+@timed("py3.predict")
+def predict_updrs(values):
+    with audit("py3", "py3.model", inputs=values) as record:
+        record.output = _predict_updrs(values)
+    return record.output
+
+def _predict_updrs(values):
+    scaler = get_scaler()
+    with stage("py3.scaler"):
+        scaled = scaler.transform([values])
+    model = get_model()
+    with stage("py3.regressor"):
+        return model.predict(scaled)[0]
+
+# WAV -> the 18 features -> one scaler + regressor call for all files
+@timed("py3.predict_wavs")
+def predict_wavs(paths):
+    """[(path, motor_UPDRS or None, error or None)] for each WAV, in order."""
+    with audit("py3", "py3.model", inputs=list(paths)) as record:
+        extracted = lazy_import("voice_features").extract_updrs_features_from_wavs(paths)
+        results = [[path, None, error] for path, (_, error) in zip(paths, extracted)]
+        ok = []
+        for i, (features, _) in enumerate(extracted):
+            if features is None:
+                continue
+            values = [features[name] for name in feature_names]
+            if np.all(np.isfinite(values)):
+                ok.append((i, values))
+            else:
+                results[i][2] = "No voiced speech detected"
+        if ok:
+            with stage("py3.scaler"):
+                scaled = get_scaler().transform([values for _, values in ok])
+            with stage("py3.regressor"):
+                predictions = get_model().predict(scaled)
+            for (i, _), value in zip(ok, predictions):
+                results[i][1] = float(value)
+        record.output = [tuple(r) for r in results]
+    return record.output
+
+# Recorded samples go straight to Praat; no WAV round trip
+@timed("py3.predict_recording")
+def predict_recording(samples, sample_rate):
+    with audit("py3", "py3.model", inputs=samples) as record:
+        features = lazy_import("voice_features").extract_updrs_features(samples, sample_rate=sample_rate)
+        values = [features[name] for name in feature_names]
+        if not np.all(np.isfinite(values)):
+            raise ValueError("No voiced speech detected. Please try again.")
+        record.output = predict_updrs(values)
+    return record.output
+
+# Running score for one window of live audio (None if the window is unvoiced);
+# not audited: only the final score of the take is shown and logged
+def analyze_window(snd):
+    features = lazy_import("voice_features").extract_updrs_features(snd)
+    values = [features[name] for name in feature_names]
+    if not np.all(np.isfinite(values)):
+        return None
+    return _predict_updrs(values)
+
+# Stops capture (joins the analysis worker) and scores the whole take; runs on the background executor
+def finish_recording(stream):
+    stream.stop()
+    samples = stream.recording()[:RECORD_SECONDS * SAMPLE_RATE]
+    save_recording(samples, SAMPLE_RATE, prefix="updrs")
+    return predict_recording(samples, SAMPLE_RATE)
 
 # Classifier label logic
 def interpret_updrs(value):
@@ -39,146 +109,191 @@ def interpret_updrs(value):
     else:
         return "🔴 Severe Parkinsonism"
 
-# Record only and save as WAV
-def record_voice_only():
-    def record():
-        file_path = "mic_input.wav"
-        recording = sd.rec(int(RECORD_SECONDS * SAMPLE_RATE), samplerate=SAMPLE_RATE, channels=1)
-        for i in range(RECORD_SECONDS, 0, -1):
-            countdown_label.config(text=f"⏳ Recording... {i} seconds left")
-            time.sleep(1)
-        sd.wait()
-        countdown_label.config(text="✅ Recording complete")
-        write(file_path, SAMPLE_RATE, recording)
-        messagebox.showinfo("Saved", f"Recording saved as {file_path}. Please upload features to proceed.")
-    threading.Thread(target=record).start()
-
-# Predict from .txt file
-def predict_from_txt_file():
-    file_path = filedialog.askopenfilename(filetypes=[("Text files", "*.txt")])
-    if not file_path:
+# Popup with the predicted score
+def show_result(prediction):
+    label = interpret_updrs(prediction)
+    result_window = tk.Toplevel()
+    result_window.title("Prediction Result")
+    result_window.geometry("300x150")
+    result_window.update_idletasks()
+    x = (result_window.winfo_screenwidth() - result_window.winfo_reqwidth()) // 2
+    y = (result_window.winfo_screenheight() - result_window.winfo_reqheight()) // 2
+    result_window.geometry(f"+{x}+{y}")
+    tk.Label(result_window, text=f"Predicted motor_UPDRS: {prediction:.2f}\nStatus: {label}", font=("Arial", 12)).pack(pady=30)
+    mark("first_prediction")
+
+# Scores for several uploaded files at once
+def show_results(results):
+    if len(results) == 1 and results[0][2] is None:
+        show_result(results[0][1])
         return
-    try:
-        with open(file_path, 'r') as f:
-            values = list(map(float, f.read().strip().split()))
-            if len(values) != 18:
-                raise ValueError("Expected 18 features in the text file.")
-            scaled = scaler.transform([values])
-            prediction = model.predict(scaled)[0]
-            label = interpret_updrs(prediction)
-            result_window = tk.Toplevel()
-            result_window.title("Prediction Result")
-            result_window.geometry("300x150")
-            result_window.update_idletasks()
-            x = (result_window.winfo_screenwidth() - result_window.winfo_reqwidth()) // 2
-            y = (result_window.winfo_screenheight() - result_window.winfo_reqheight()) // 2
-            result_window.geometry(f"+{x}+{y}")
-            tk.Label(result_window, text=f"Predicted motor_UPDRS: {prediction:.2f}\nStatus: {label}", font=("Arial", 12)).pack(pady=30)
-    except Exception as e:
-        messagebox.showerror("Error", f"Failed to read or predict: {e}")
-
-# Manual input
-def predict_from_text_input():
-    try:
-        values = [float(e.get()) for e in manual_entries]
-        if len(values) != 18:
-            raise ValueError("Exactly 18 features are required.")
-        scaled = scaler.transform([values])
-        prediction = model.predict(scaled)[0]
-        label = interpret_updrs(prediction)
-        result_window = tk.Toplevel()
-        result_window.title("Prediction Result")
-        result_window.geometry("300x150")
-        result_window.update_idletasks()
-        x = (result_window.winfo_screenwidth() - result_window.winfo_reqwidth()) // 2
-        y = (result_window.winfo_screenheight() - result_window.winfo_reqheight()) // 2
-        result_window.geometry(f"+{x}+{y}")
-        tk.Label(result_window, text=f"Predicted motor_UPDRS: {prediction:.2f}\nStatus: {label}", font=("Arial", 12)).pack(pady=30)
-    except Exception as e:
-        messagebox.showerror("Error", f"Invalid input: {e}")
-
-# Function to return to main menu
-def back_to_main_menu():
-    root.destroy()
-    subprocess.Popen(["python", "main_menu.py"])
+    lines = [f"{os.path.basename(path)}: {value:.2f} {interpret_updrs(value)}" if error is None
+             else f"{os.path.basename(path)}: {error}" for path, value, error in results]
+    messagebox.showinfo("Prediction Results", "\n".join(lines))
+    mark("first_prediction")
 
 # GUI
-root = tk.Tk()
-root.title("Parkinson's Voice Predictor")
-root.state('zoomed')  # Windows maximized view
-root.protocol("WM_DELETE_WINDOW", back_to_main_menu)  # ✅ Return to main menu when closing
+class ParkinsonUPDRSApp(tk.Frame):
+    def __init__(self, master, on_back=None):
+        super().__init__(master)
+        self.on_back = on_back
+        self.stream = None
+        warm_up_in_background("py3_gui", warm_up)
+
+        # Layout
+        outer_frame = tk.Frame(self)
+        outer_frame.pack(expand=True, fill='both')
+
+        canvas = tk.Canvas(outer_frame)
+        scrollbar = tk.Scrollbar(outer_frame, orient="vertical", command=canvas.yview)
+        canvas.configure(yscrollcommand=scrollbar.set)
+
+        scrollbar.pack(side="right", fill="y")
+        canvas.pack(side="left", fill="both", expand=True)
 
-# Layout
-outer_frame = tk.Frame(root)
-outer_frame.pack(expand=True, fill='both')
+        scrollable_frame = tk.Frame(canvas)
 
-canvas = tk.Canvas(outer_frame)
-scrollbar = tk.Scrollbar(outer_frame, orient="vertical", command=canvas.yview)
-canvas.configure(yscrollcommand=scrollbar.set)
+        content_frame = tk.Frame(scrollable_frame)
+        content_frame.pack(expand=True)
 
-scrollbar.pack(side="right", fill="y")
-canvas.pack(side="left", fill="both", expand=True)
+        scrollable_frame.bind(
+            "<Configure>",
+            lambda e: canvas.configure(scrollregion=canvas.bbox("all"))
+        )
 
-scrollable_frame = tk.Frame(canvas)
+        canvas.create_window((650, 0), window=scrollable_frame, anchor="n")
 
-content_frame = tk.Frame(scrollable_frame)
-content_frame.pack(expand=True)
+        frame = content_frame
 
-scrollable_frame.bind(
-    "<Configure>",
-    lambda e: canvas.configure(scrollregion=canvas.bbox("all"))
-)
+        tk.Label(frame, text="", height=2).pack()
 
-canvas.create_window((650, 0), window=scrollable_frame, anchor="n")
+        label = tk.Label(frame, text="Parkinson's UPDRS Predictor\nUpload, Record or Manually Enter Features", font=("Arial", 18))
+        label.pack(pady=10)
 
-frame = content_frame
+        upload_btn = tk.Button(frame, text="📁 Upload Voice File (.wav)", font=("Arial", 12), command=self.predict_from_wav_files)
+        upload_btn.pack(pady=5)
 
-tk.Label(frame, text="", height=2).pack()
+        record_btn = tk.Button(frame, text="🎙️ Record Voice", font=("Arial", 12), command=self.record_voice_only)
+        record_btn.pack(pady=5)
 
-label = tk.Label(frame, text="Parkinson's UPDRS Predictor\nUpload, Record or Manually Enter Features", font=("Arial", 18))
-label.pack(pady=10)
+        self.countdown_label = tk.Label(frame, text="", font=("Arial", 12))
+        self.countdown_label.pack(pady=5)
 
-upload_btn = tk.Button(frame, text="📁 Upload Voice File (.wav)", font=("Arial", 12), command=lambda: messagebox.showinfo("Note", "Feature extraction is disabled. Upload a .txt file instead."))
-upload_btn.pack(pady=5)
+        self.tasks = TaskStatus(frame)
+        self.tasks.pack(pady=5)
 
-record_btn = tk.Button(frame, text="🎙️ Record Voice (WAV only)", font=("Arial", 12), command=record_voice_only)
-record_btn.pack(pady=5)
+        tk.Label(frame, text="Manual Feature Input (18 values)", font=("Arial", 12)).pack(pady=5)
+        self.manual_entries = []
 
-countdown_label = tk.Label(frame, text="", font=("Arial", 12))
-countdown_label.pack(pady=5)
+        input_frame = tk.Frame(frame)
+        input_frame.pack(pady=5)
 
-tk.Label(frame, text="Manual Feature Input (18 values)", font=("Arial", 12)).pack(pady=5)
-manual_entries = []
+        left_column = tk.Frame(input_frame)
+        right_column = tk.Frame(input_frame)
+        left_column.pack(side=tk.LEFT, padx=20)
+        right_column.pack(side=tk.LEFT, padx=20)
 
-input_frame = tk.Frame(frame)
-input_frame.pack(pady=5)
+        for i, name in enumerate(feature_names):
+            col = left_column if i < 9 else right_column
+            row = tk.Frame(col)
+            row.pack(pady=1)
+            label = tk.Label(row, text=name, font=("Arial", 9), width=18, anchor='w')
+            label.pack(side=tk.LEFT)
+            entry = tk.Entry(row, width=8, font=("Arial", 10))
+            entry.pack(side=tk.LEFT)
+            self.manual_entries.append(entry)
 
-left_column = tk.Frame(input_frame)
-right_column = tk.Frame(input_frame)
-left_column.pack(side=tk.LEFT, padx=20)
-right_column.pack(side=tk.LEFT, padx=20)
+        predict_manual_btn = tk.Button(frame, text="📊 Predict from Manual Input", font=("Arial", 12), command=self.predict_from_text_input)
+        predict_manual_btn.pack(pady=5)
 
-for i, name in enumerate(feature_names):
-    col = left_column if i < 9 else right_column
-    row = tk.Frame(col)
-    row.pack(pady=1)
-    label = tk.Label(row, text=name, font=("Arial", 9), width=18, anchor='w')
-    label.pack(side=tk.LEFT)
-    entry = tk.Entry(row, width=8, font=("Arial", 10))
-    entry.pack(side=tk.LEFT)
-    manual_entries.append(entry)
+        load_txt_btn = tk.Button(frame, text="📄 Predict from .txt File (18 values)", font=("Arial", 12), command=self.predict_from_txt_file)
+        load_txt_btn.pack(pady=5)
 
-predict_manual_btn = tk.Button(frame, text="📊 Predict from Manual Input", font=("Arial", 12), command=predict_from_text_input)
-predict_manual_btn.pack(pady=5)
+        # ✅ Back to main menu button
+        back_btn = tk.Button(frame, text="⬅️ Back to Main Menu", font=("Arial", 12), command=self.back_to_main_menu)
+        back_btn.pack(pady=5)
 
-load_txt_btn = tk.Button(frame, text="📄 Predict from .txt File (18 values)", font=("Arial", 12), command=predict_from_txt_file)
-load_txt_btn.pack(pady=5)
+        quit_btn = tk.Button(frame, text="❌ Quit", font=("Arial", 12), command=lambda: self.winfo_toplevel().destroy())
+        quit_btn.pack(pady=10)
 
-# ✅ Back to main menu button
-back_btn = tk.Button(frame, text="⬅️ Back to Main Menu", font=("Arial", 12), command=back_to_main_menu)
-back_btn.pack(pady=5)
+    # Predict from one or more WAV files
+    def predict_from_wav_files(self):
+        paths = filedialog.askopenfilenames(filetypes=[("WAV files", "*.wav")])
+        if not paths:
+            return
+        self.tasks.submit(predict_wavs, list(paths), on_done=show_results,
+                          on_error=lambda e: messagebox.showerror("Error", f"Failed to analyse the recording: {e}"))
+
+    # Record and predict: a running estimate while audio arrives, then the whole take is scored
+    def record_voice_only(self):
+        if self.stream is not None:
+            return
+        try:
+            self.stream = VoiceStream(analyze_window, sample_rate=SAMPLE_RATE).start()
+        except Exception as e:
+            self.stream = None
+            messagebox.showerror("Recording Error", str(e))
+            return
+        self.poll_recording()
+
+    def poll_recording(self):
+        left = RECORD_SECONDS - self.stream.elapsed
+        if left > 0:
+            text = f"⏳ Recording... {int(left) + 1} seconds left"
+            value = self.stream.estimate
+            if value is not None:
+                text += f"\nRunning estimate: {value:.2f} {interpret_updrs(value)}"
+            self.countdown_label.config(text=text)
+            self.after(100, self.poll_recording)
+            return
+        stream, self.stream = self.stream, None
+        self.countdown_label.config(text="✅ Recording complete")
+        self.tasks.submit(finish_recording, stream, on_done=show_result,
+                          on_error=lambda e: messagebox.showerror("Error", f"Failed to analyse the recording: {e}"))
+
+    # Predict from .txt file
+    def predict_from_txt_file(self):
+        file_path = filedialog.askopenfilename(filetypes=[("Text files", "*.txt")])
+        if not file_path:
+            return
+        try:
+            with open(file_path, 'r') as f:
+                values = list(map(float, f.read().strip().split()))
+                if len(values) != 18:
+                    raise ValueError("Expected 18 features in the text file.")
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to read or predict: {e}")
+            return
+        self.tasks.submit(predict_updrs, values, on_done=show_result,
+                          on_error=lambda e: messagebox.showerror("Error", f"Failed to read or predict: {e}"))
+
+    # Manual input
+    def predict_from_text_input(self):
+        try:
+            values = [float(e.get()) for e in self.manual_entries]
+            if len(values) != 18:
+                raise ValueError("Exactly 18 features are required.")
+        except Exception as e:
+            messagebox.showerror("Error", f"Invalid input: {e}")
+            return
+        self.tasks.submit(predict_updrs, values, on_done=show_result,
+                          on_error=lambda e: messagebox.showerror("Error", f"Invalid input: {e}"))
 
-quit_btn = tk.Button(frame, text="❌ Quit", font=("Arial", 12), command=root.destroy)
-quit_btn.pack(pady=10)
+    # Function to return to main menu
+    def back_to_main_menu(self):
+        if self.on_back:
+            self.on_back()
+            return
+        self.winfo_toplevel().destroy()
+        subprocess.Popen(["python", "main_menu.py"])
 
-root.mainloop()
+if __name__ == "__main__":
+    root = tk.Tk()
+    root.title("Parkinson's Voice Predictor")
+    root.state('zoomed')  # Windows maximized view
+    app = ParkinsonUPDRSApp(root)
+    app.pack(expand=True, fill='both')
+    root.protocol("WM_DELETE_WINDOW", app.back_to_main_menu)  # ✅ Return to main menu when closing
+    root.update()
+    mark("first_window")
+    root.mainloop()
@@ -0,0 +1,55 @@
+import csv
+import json
+import os
+
+# === Streaming result files ===
+# Batch modes write one record per input as soon as a batch is scored.
+# The format follows the file extension: .jsonl/.json for JSON lines, CSV otherwise.
+
+def collect_files(inputs, extensions):
+    """Input paths for a batch run: files as given, folders walked in sorted order, @list files expanded."""
+    paths = []
+    for item in inputs:
+        if item.startswith("@"):
+            # File list, one path per line
+            with open(item[1:], "r", encoding="utf-8") as f:
+                paths.extend(line.strip() for line in f if line.strip())
+        elif os.path.isdir(item):
+            for dirpath, dirnames, filenames in os.walk(item):
+                dirnames.sort()
+                for name in sorted(filenames):
+                    if name.lower().endswith(extensions):
+                        paths.append(os.path.join(dirpath, name))
+        else:
+            paths.append(item)
+    return paths
+
+class ResultWriter:
+    def __init__(self, path, fieldnames, append=False):
+        self.path = path
+        self.fieldnames = list(fieldnames)
+        self.jsonl = path.lower().endswith((".jsonl", ".json"))
+        has_header = append and os.path.exists(path) and os.path.getsize(path) > 0
+        self.file = open(path, "a" if append else "w", newline="", encoding="utf-8")
+        self.writer = None
+        if not self.jsonl:
+            self.writer = csv.DictWriter(self.file, fieldnames=self.fieldnames, extrasaction="ignore")
+            if not has_header:
+                self.writer.writeheader()
+
+    def write_rows(self, rows):
+        if self.jsonl:
+            for row in rows:
+                self.file.write(json.dumps({k: row.get(k) for k in self.fieldnames}, default=str) + "\n")
+        else:
+            self.writer.writerows(rows)
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
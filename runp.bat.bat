@@ -1,3 +1,3 @@
 @echo off
-c:\Users\anasr\anaconda3\envs\rsm\python.exe parkinsons_gui_app.py
+c:\Users\anasr\anaconda3\envs\rsm\python.exe park_gui.py
 pause
\ No newline at end of file
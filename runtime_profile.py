@@ -0,0 +1,58 @@
+import json
+import os
+import sys
+
+# === Tuned thread counts and batch sizes ===
+# autotune.py measures thread and batch settings on this machine and saves the
+# best ones to tuning_profile.json (MEDAI_TUNING_PROFILE=path overrides, empty
+# disables). Importing this module applies the profile as environment defaults,
+# so it must happen before numpy / TensorFlow load: startup_timer imports it,
+# and the batch scripts import it first. Variables already set in the
+# environment win over the profile.
+#
+#   OMP_NUM_THREADS, OPENBLAS_NUM_THREADS, MKL_NUM_THREADS   BLAS / OpenMP pools
+#   TF_NUM_INTRAOP_THREADS, TF_NUM_INTEROP_THREADS           TensorFlow pools
+#   MEDAI_SKLEARN_JOBS       n_jobs for loaded sklearn/XGBoost models (model_registry.py)
+#   MEDAI_DENSENET_BATCH     batch_size for the DenseNet forward pass (feature_extractor.py)
+#   MEDAI_KERAS_BATCH        batch_size for the heart / Parkinson's Keras MLPs
+#   MEDAI_SKLEARN_CHUNK_ROWS rows per sklearn call in heart_batch.py
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+PROFILE_PATH = os.environ.get("MEDAI_TUNING_PROFILE", os.path.join(REPO_DIR, "tuning_profile.json"))
+BLAS_VARIABLES = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS")
+
+applied = {}  # variables this module set, for reports
+
+def load_profile(path=PROFILE_PATH):
+    """The saved profile, or None if there is none or it was tuned on a machine with a different core count."""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            profile = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Ignoring tuning profile {path}: {e}", file=sys.stderr)
+        return None
+    if profile.get("cpu_count") != os.cpu_count():
+        print(f"Ignoring tuning profile {path}: tuned for {profile.get('cpu_count')} cores, "
+              f"this machine has {os.cpu_count()} (run python autotune.py)", file=sys.stderr)
+        return None
+    return profile
+
+def apply(profile):
+    for name, value in profile.get("env", {}).items():
+        if name not in os.environ:
+            os.environ[name] = str(value)
+            applied[name] = str(value)
+    # Too late for the variables if numpy is already loaded; resize its pools directly
+    blas = next((applied[name] for name in BLAS_VARIABLES if name in applied), None)
+    if blas and "numpy" in sys.modules:
+        try:
+            from threadpoolctl import threadpool_limits
+            threadpool_limits(int(blas), user_api="blas")
+        except ImportError:
+            pass
+
+_profile = load_profile()
+if _profile is not None:
+    apply(_profile)
@@ -1,16 +1,15 @@
+from startup_timer import lazy_import, mark, warm_up_in_background
 import tkinter as tk
 from tkinter import filedialog, messagebox
 from PIL import Image, ImageTk
 import numpy as np
-import joblib
-import os
 import subprocess
-from tensorflow.keras.applications import DenseNet169
-from tensorflow.keras.applications.densenet import preprocess_input
-from tensorflow.keras.preprocessing import image
-
-# Load DenseNet169 feature extractor
-base_model = DenseNet169(weights='imagenet', include_top=False, pooling='avg')
+from feature_extractor import get_embedding, get_model as get_extractor
+import model_registry
+from inference_executor import TaskStatus
+from stage_timer import stage, timed
+from audit_log import audit
+import image_ingest
 
 # Class map (must match your training labels)
 class_map = {
@@ -23,60 +22,85 @@ class_map = {
     6: 'Vascular Lesion'
 }
 
-# Load all models
-models = {
-    "Random Forest": joblib.load("modelsskin\model_rf_7class.pkl"),
-    "SVM": joblib.load("modelsskin\model_svm_7class.pkl"),
-    "KNN": joblib.load("modelsskin\model_knn_7class.pkl"),
-    "XGBoost": joblib.load("modelsskin\model_xgb_7class.pkl"),
-    "Voting Classifier": joblib.load("modelsskin\model_voting_7class.pkl")
+# Models, loaded on first use through the registry (see models_manifest.json)
+model_keys = {
+    "Random Forest": "skin.random_forest",
+    "SVM": "skin.svm",
+    "KNN": "skin.knn",
+    "XGBoost": "skin.xgboost",
+    "Voting Classifier": "skin.voting"
 }
-
-# Extract features from image
+model_paths = {name: model_registry.path(key) for name, key in model_keys.items()}
+
+def get_model(model_name):
+    return model_registry.load(model_keys[model_name])
+
+# Background warm-up: TensorFlow, DenseNet169 and the default classifier
+def warm_up():
+    lazy_import("tensorflow.keras.applications.densenet")
+    get_extractor()
+    get_model("Voting Classifier")
+
+# Preprocess image (cache variant "skin")
+def preprocess_image(img_path):
+    preprocess_input = lazy_import("tensorflow.keras.applications.densenet").preprocess_input
+    with stage("skin.decode_resize"):
+        # Same result as image.load_img(target_size=(224, 224)), from the preview's decode
+        img = image_ingest.load(img_path).resize((224, 224), Image.NEAREST)
+        x = np.asarray(img, dtype=np.float32)
+    with stage("skin.preprocess_input"):
+        return preprocess_input(x)
+
+# Extract features from image (shared DenseNet169, cached per image)
 def extract_features(img_path):
-    img = image.load_img(img_path, target_size=(224, 224))
-    x = image.img_to_array(img)
-    x = preprocess_input(np.expand_dims(x, axis=0))
-    feat = base_model.predict(x)
-    return feat.flatten()
+    return get_embedding(img_path, "skin", preprocess_image)
+
+# Full prediction, run on the background executor
+@timed("skin.classify")
+def classify(img_path, model_name):
+    with audit("skin", model_keys[model_name], inputs=img_path) as record:
+        features = extract_features(img_path).reshape(1, -1)
+        model = get_model(model_name)
+        with stage("skin.classifier"):
+            pred = model.predict(features)[0]
+        record.output = class_map[pred]
+    return record.output
 
 # GUI
-class SkinCancerApp:
-    def __init__(self, master):
-        
-        self.master = master
-        self.master.title("Skin Cancer Classifier (7-Class)")
-        self.master.geometry("600x500")
-        self.master.state('zoomed')
+class SkinCancerApp(tk.Frame):
+    def __init__(self, master, on_back=None):
+        super().__init__(master)
+        self.on_back = on_back
+        warm_up_in_background("skin_gui", warm_up)
         # Title
-        tk.Label(master, text="🧬 Skin Cancer Classifier", font=("Arial", 18, "bold")).pack(pady=10)
+        tk.Label(self, text="🧬 Skin Cancer Classifier", font=("Arial", 18, "bold")).pack(pady=10)
 
-        self.label = tk.Label(master, text="Choose an image:", font=("Arial", 14))
+        self.label = tk.Label(self, text="Choose an image:", font=("Arial", 14))
         self.label.pack(pady=5)
 
-        self.img_label = tk.Label(master)
+        self.img_label = tk.Label(self)
         self.img_label.pack()
 
-        self.upload_btn = tk.Button(master, text="Upload Image", command=self.upload_image)
+        self.upload_btn = tk.Button(self, text="Upload Image", command=self.upload_image)
         self.upload_btn.pack(pady=5)
 
         self.model_var = tk.StringVar()
         self.model_var.set("Voting Classifier")
-        self.model_menu = tk.OptionMenu(master, self.model_var, *models.keys())
+        self.model_menu = tk.OptionMenu(self, self.model_var, *model_paths.keys())
         self.model_menu.pack(pady=5)
 
-        self.predict_btn = tk.Button(master, text="Predict", command=self.predict)
+        self.predict_btn = tk.Button(self, text="Predict", command=self.predict)
         self.predict_btn.pack(pady=10)
 
-        # Loading label
-        self.loading_label = tk.Label(master, text="", font=("Arial", 12), fg="green")
-        self.loading_label.pack()
+        # Loading label / cancel
+        self.tasks = TaskStatus(self, busy_text="🔄 Predicting...")
+        self.tasks.pack()
 
-        self.result_label = tk.Label(master, text="", font=("Arial", 14))
+        self.result_label = tk.Label(self, text="", font=("Arial", 14))
         self.result_label.pack(pady=10)
 
         # Back to main menu button
-        self.back_btn = tk.Button(master, text="⬅ Back to Main Menu", command=self.back_to_main_menu)
+        self.back_btn = tk.Button(self, text="⬅ Back to Main Menu", command=self.back_to_main_menu)
         self.back_btn.pack(pady=5)
 
         self.file_path = None
@@ -85,36 +109,40 @@ class SkinCancerApp:
         path = filedialog.askopenfilename(filetypes=[("Image files", "*.jpg *.jpeg *.png")])
         if path:
             self.file_path = path
-            img = Image.open(path)
-            img = img.resize((200, 200))
-            tk_img = ImageTk.PhotoImage(img)
+            tk_img = ImageTk.PhotoImage(image_ingest.preview(path, (200, 200)))
             self.img_label.config(image=tk_img)
             self.img_label.image = tk_img
             self.result_label.config(text="")
-            self.loading_label.config(text="")
 
     def predict(self):
         if not self.file_path:
             messagebox.showerror("Error", "Please upload an image first.")
             return
-        self.loading_label.config(text="🔄 Predicting...")
-        self.master.update_idletasks()
-
-        features = extract_features(self.file_path).reshape(1, -1)
         model_name = self.model_var.get()
-        model = models[model_name]
-        pred = model.predict(features)[0]
-        label = class_map[pred]
+        self.tasks.submit(classify, self.file_path, model_name,
+                          on_done=lambda label: self.show_result(label, model_name),
+                          on_error=lambda e: messagebox.showerror("Prediction Error", str(e)))
 
-        self.loading_label.config(text="")
-        self.result_label.config(text=f"Prediction: {label}", fg="blue")
+    def show_result(self, label, model_name):
+        self.result_label.config(text=f"Prediction: {label}\n({model_name})", fg="blue")
+        mark("first_prediction")
 
     def back_to_main_menu(self):
-        self.master.destroy()
+        if self.on_back:
+            self.on_back()
+            return
+        self.winfo_toplevel().destroy()
         subprocess.Popen(["python", "main_menu.py"])
 
 # Run app
-root = tk.Tk()
+if __name__ == "__main__":
+    root = tk.Tk()
+    root.title("Skin Cancer Classifier (7-Class)")
+    root.geometry("600x500")
+    root.state('zoomed')
+    app = SkinCancerApp(root)
+    app.pack(fill="both", expand=True)
+    root.update()
+    mark("first_window")
+    root.mainloop()
 
-app = SkinCancerApp(root)
-root.mainloop()
@@ -0,0 +1,234 @@
+import atexit
+import bisect
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+# === Per-stage timing ===
+# Each prediction pipeline wraps its stages (decode, resize, DenseNet forward
+# pass, scaler, classifier, Praat calls, ...) in stage("module.step"), and the
+# durations go into fixed-bucket histograms. Recording a stage costs two
+# perf_counter() calls and a bucket increment.
+#
+#   MEDAI_STAGE_REPORT=stages.json python brain_gui.py   -> histograms written on exit
+#                                                           (.prom/.txt for Prometheus text)
+#   MEDAI_STAGE_TIMING=0                                  -> stages not recorded at all
+#   MEDAI_PROFILE_DIR=profiles python skin_gui.py        -> sampling profile of the first
+#                                                           prediction, in folded-stack format
+#
+# Folded stacks load directly in speedscope or flamegraph.pl.
+
+ENABLED = os.environ.get("MEDAI_STAGE_TIMING", "1") != "0"
+PROFILE_DIR = os.environ.get("MEDAI_PROFILE_DIR")
+PROFILE_INTERVAL_S = 0.001
+BUCKETS_S = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Histogram:
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS_S) + 1)  # last bucket is +Inf
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS_S, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-th observation
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(BUCKETS_S + (self.max,), self.counts):
+            seen += n
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+_histograms = {}
+_lock = threading.Lock()
+_local = threading.local()  # per-thread trace, see trace()
+
+def observe(name, seconds):
+    with _lock:
+        hist = _histograms.get(name)
+        if hist is None:
+            hist = _histograms[name] = Histogram()
+        hist.observe(seconds)
+
+class _Stage:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.start
+        observe(self.name, seconds)
+        stages = getattr(_local, "trace", None)
+        if stages is not None:
+            stages[self.name] = stages.get(self.name, 0.0) + seconds
+
+class _NoStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+_NO_STAGE = _NoStage()
+
+def stage(name):
+    """Context manager that records how long the block took under name."""
+    return _Stage(name) if ENABLED else _NO_STAGE
+
+def timed(name):
+    """Decorator form of stage() for a whole prediction; also takes a pending profile."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _profile_pending:
+                return _profiled(name, fn, args, kwargs)
+            with stage(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+class trace:
+    """Collects {stage: seconds} for the stages this thread runs inside the block.
+
+    Used for per-prediction timings (audit_log.py); a nested trace stays empty.
+    """
+
+    def __enter__(self):
+        self.stages = {}
+        self.outermost = getattr(_local, "trace", None) is None
+        if self.outermost:
+            _local.trace = self.stages
+        return self.stages
+
+    def __exit__(self, *exc):
+        if self.outermost:
+            _local.trace = None
+
+def reset():
+    with _lock:
+        _histograms.clear()
+
+# === Dumps ===
+def snapshot():
+    with _lock:
+        items = [(name, list(h.counts), h.count, h.total, h.max, h.quantile(0.5), h.quantile(0.99))
+                 for name, h in sorted(_histograms.items())]
+    return {
+        name: {
+            "count": count,
+            "total_s": round(total, 6),
+            "mean_ms": round(total / count * 1000, 3) if count else None,
+            "p50_ms": round(p50 * 1000, 3) if p50 is not None else None,
+            "p99_ms": round(p99 * 1000, 3) if p99 is not None else None,
+            "max_ms": round(peak * 1000, 3),
+            "buckets_s": dict(zip([str(b) for b in BUCKETS_S] + ["+Inf"], counts)),
+        }
+        for name, counts, count, total, peak, p50, p99 in items
+    }
+
+def prometheus_text(metric="medai_stage_seconds"):
+    lines = [f"# HELP {metric} Duration of each prediction pipeline stage.", f"# TYPE {metric} histogram"]
+    with _lock:
+        for name, h in sorted(_histograms.items()):
+            cumulative = 0
+            for bound, n in zip([str(b) for b in BUCKETS_S] + ["+Inf"], h.counts):
+                cumulative += n
+                lines.append(f'{metric}_bucket{{stage="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'{metric}_sum{{stage="{name}"}} {h.total:.6f}')
+            lines.append(f'{metric}_count{{stage="{name}"}} {h.count}')
+    return "\n".join(lines) + "\n"
+
+def dump(path):
+    text = prometheus_text() if path.lower().endswith((".prom", ".txt")) else json.dumps(snapshot(), indent=2)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+    return path
+
+if os.environ.get("MEDAI_STAGE_REPORT"):
+    atexit.register(dump, os.environ["MEDAI_STAGE_REPORT"])
+
+# === Opt-in sampling profiler ===
+class SamplingProfiler:
+    """Samples one thread's Python stack every interval and counts folded stacks."""
+
+    def __init__(self, thread_id=None, interval=PROFILE_INTERVAL_S):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="sampling-profiler")
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def write_folded(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
+
+_profile_pending = 1 if PROFILE_DIR else 0
+last_profile = None
+
+def request_profile(count=1):
+    """Profiles the next `count` predictions that go through a timed() entry point."""
+    global _profile_pending
+    _profile_pending += count
+
+def _profiled(name, fn, args, kwargs):
+    global _profile_pending, last_profile
+    with _lock:
+        if not _profile_pending:
+            run = False
+        else:
+            _profile_pending -= 1
+            run = True
+    if not run:
+        with stage(name):
+            return fn(*args, **kwargs)
+
+    profiler = SamplingProfiler()
+    try:
+        with profiler, stage(name):
+            return fn(*args, **kwargs)
+    finally:
+        path = os.path.join(PROFILE_DIR or "profiles", f"{name}-{time.strftime('%Y%m%d-%H%M%S')}.folded")
+        last_profile = profiler.write_folded(path)
@@ -0,0 +1,131 @@
+import argparse
+import atexit
+import importlib
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import runtime_profile  # noqa: F401  tuned thread/batch settings, before numpy or TensorFlow load
+
+# === Startup timing ===
+# Heavy dependencies (TensorFlow, OpenCV, parselmouth, sounddevice, pandas)
+# are imported through lazy_import() on first use, and models are loaded by a
+# background warm-up after the window is shown. This module records how long
+# each of those steps takes so start-up regressions are visible.
+#
+#   MEDAI_STARTUP_REPORT=1 python heart_gui.py   -> report printed on exit
+#   python startup_timer.py                      -> cold-start report for every module
+
+_T0 = time.perf_counter()  # scripts import this module first, so ~launch time
+import_times = {}
+events = {}
+warm_up_errors = {}
+
+def elapsed():
+    return time.perf_counter() - _T0
+
+def lazy_import(name):
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    import_times.setdefault(name, time.perf_counter() - start)
+    return module
+
+def mark(event):
+    # Only the first occurrence counts (e.g. the first prediction)
+    events.setdefault(event, elapsed())
+
+def warm_up_in_background(name, warm_up):
+    """Runs warm_up() (imports + model loading) on a daemon thread."""
+    def run():
+        start = time.perf_counter()
+        try:
+            warm_up()
+            mark(f"{name}_ready")
+        except Exception as e:
+            warm_up_errors[name] = str(e)
+        events.setdefault(f"{name}_warm_up_s", time.perf_counter() - start)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+def report():
+    return {
+        "import_s": {name: round(t, 4) for name, t in sorted(import_times.items(), key=lambda kv: -kv[1])},
+        "events_s": {name: round(t, 4) for name, t in sorted(events.items(), key=lambda kv: kv[1])},
+        "warm_up_errors": dict(warm_up_errors),
+    }
+
+if os.environ.get("MEDAI_STARTUP_REPORT"):
+    atexit.register(lambda: print(json.dumps(report(), indent=2), file=sys.stderr))
+
+# === Cold-start measurement, one fresh interpreter per module ===
+HEAVY_DEPENDENCIES = [
+    "numpy", "joblib", "sklearn", "pandas", "PIL", "cv2",
+    "tensorflow", "parselmouth", "sounddevice", "scipy.io.wavfile",
+]
+
+_PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+import startup_timer
+import tkinter as tk
+module = startup_timer.lazy_import(sys.argv[1])
+root = tk.Tk()
+app = getattr(module, sys.argv[2])(root)
+app.pack(fill="both", expand=True)
+root.update()
+startup_timer.mark("first_window")
+start = time.perf_counter()
+try:
+    module.warm_up()
+    startup_timer.mark("models_ready")
+except Exception as e:
+    startup_timer.warm_up_errors[sys.argv[1]] = str(e)
+root.destroy()
+result = startup_timer.report()
+result["module_import_s"] = startup_timer.import_times.get(sys.argv[1])
+print(json.dumps(result))
+"""
+
+def measure_dependency(name):
+    code = f"import time; t = time.perf_counter(); import {name}; print(time.perf_counter() - t)"
+    proc = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+    return round(float(proc.stdout.strip()), 4) if proc.returncode == 0 else None
+
+def measure_module(module_name, app_class):
+    proc = subprocess.run([sys.executable, "-c", _PROBE, module_name, app_class],
+                          capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    if proc.returncode != 0:
+        return {"error": proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "failed"}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+if __name__ == "__main__":
+    from main_menu import MODULES
+
+    parser = argparse.ArgumentParser(description="Cold-start report for every GUI module.")
+    parser.add_argument("-o", "--output", default="startup_report.json")
+    parser.add_argument("--modules", nargs="*", help="subset of module names, e.g. heart_gui")
+    args = parser.parse_args()
+
+    results = {"dependencies_s": {name: measure_dependency(name) for name in HEAVY_DEPENDENCIES}, "modules": {}}
+    for _, module_name, app_class, *_ in MODULES:
+        if args.modules and module_name not in args.modules:
+            continue
+        results["modules"][module_name] = measure_module(module_name, app_class)
+
+    for name, seconds in results["dependencies_s"].items():
+        print(f"import {name:<18} {'missing' if seconds is None else f'{seconds:.3f}s'}")
+    for name, result in results["modules"].items():
+        ev = result.get("events_s", {})
+        print(f"{name:<10} first window {ev.get('first_window', float('nan')):.3f}s, "
+              f"models ready {ev.get('models_ready', float('nan')):.3f}s {result.get('error', '')}")
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Saved {args.output}")
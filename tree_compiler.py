@@ -0,0 +1,377 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# === Compiled tree ensembles ===
+# Fitted random forests, gradient boosting, XGBoost models and voting
+# ensembles of them are flattened into a few contiguous arrays (feature,
+# threshold, children, leaf values). Small batches - the GUIs score one row at
+# a time - walk all trees at once with NumPy gathers and skip sklearn's
+# per-call validation, joblib dispatch and per-tree Python calls. Batches above
+# NATIVE_ROWS go to the library's own compiled predictor instead, split into
+# row blocks that run in parallel on a thread pool (rows are independent, so
+# the result is the same as one call).
+#
+# Outputs match the original models: the same float32 input cast, the same
+# comparisons (sklearn: x <= t, XGBoost: x < t, NaN -> default branch) and the
+# same summation order over trees. sklearn outputs are bit-identical; XGBoost
+# margins are bit-identical and probabilities within one float32 ulp (expf).
+# compile_model() returns None for anything else, and callers keep the
+# original model.
+#
+#   python tree_compiler.py            # parity + 1 row / 100k rows timing per compiled model
+
+CHUNK_ROWS = 4096
+NATIVE_ROWS = int(os.environ.get("MEDAI_TREE_NATIVE_ROWS", "256"))
+MAX_THREADS = int(os.environ.get("MEDAI_SKLEARN_JOBS") or min(8, os.cpu_count() or 1))
+
+_pool = None
+
+def _thread_pool():
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(max_workers=MAX_THREADS, thread_name_prefix="trees")
+    return _pool
+
+def _sklearn_version():
+    import sklearn
+    return tuple(int(p) for p in sklearn.__version__.split(".")[:2])
+
+class FlatTrees:
+    """All trees of an ensemble in flat arrays; leaves point to themselves."""
+
+    def __init__(self, trees, strict=False, threshold_dtype=np.float64):
+        # trees: list of dicts with feature, threshold, left, right, default_left, value
+        offsets = np.cumsum([0] + [len(t["feature"]) for t in trees])
+        self.roots = offsets[:-1].astype(np.int64)
+        n = offsets[-1]
+        self.feature = np.zeros(n, dtype=np.int64)
+        self.threshold = np.zeros(n, dtype=threshold_dtype)
+        self.children = np.zeros((n, 2), dtype=np.int64)  # [left, right] per node
+        self.default_right = np.zeros(n, dtype=np.int64)
+        self.value = np.concatenate([t["value"] for t in trees])
+        for t, start in zip(trees, self.roots):
+            ids = np.arange(len(t["feature"])) + start
+            leaf = t["left"] < 0
+            self.feature[ids] = np.where(leaf, 0, t["feature"])
+            self.threshold[ids] = t["threshold"]
+            self.children[ids, 0] = np.where(leaf, ids, t["left"] + start)
+            self.children[ids, 1] = np.where(leaf, ids, t["right"] + start)
+            self.default_right[ids] = ~np.asarray(t["default_left"], dtype=bool)
+        self.children = self.children.ravel()
+        self.is_leaf = self.children[0::2] == np.arange(n)
+        self.strict = strict
+        self.n_trees = len(trees)
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.feature, self.threshold, self.children, self.default_right,
+                                      self.value, self.is_leaf))
+
+    def apply(self, X):
+        """Leaf node index for every (row, tree): shape (n_rows, n_trees)."""
+        n, n_features = X.shape
+        flat = X.ravel()
+        has_nan = bool(np.isnan(flat).any())
+        out = np.empty(n * self.n_trees, dtype=np.int64)
+        pos = np.arange(n * self.n_trees)
+        node = np.tile(self.roots, n)
+        row = np.repeat(np.arange(n, dtype=np.int64) * n_features, self.n_trees)
+        level = 0
+        while pos.size:
+            values = flat.take(row + self.feature.take(node))
+            threshold = self.threshold.take(node)
+            right = values >= threshold if self.strict else values > threshold
+            if has_nan:
+                right = np.where(np.isnan(values), self.default_right.take(node), right)
+            node = self.children.take(2 * node + right)
+            level += 1
+            if level % 3 == 0 or len(pos) < 64:  # finished (row, tree) pairs leave the active set
+                done = self.is_leaf.take(node)
+                out[pos[done]] = node[done]
+                pos, node, row = pos[~done], node[~done], row[~done]
+        return out.reshape(n, self.n_trees)
+
+def _sklearn_tree(tree, value):
+    t = tree.tree_
+    missing = getattr(t, "missing_go_to_left", None)
+    return {"feature": t.feature, "threshold": t.threshold, "left": t.children_left, "right": t.children_right,
+            "default_left": missing.astype(bool) if missing is not None else np.zeros(t.node_count, dtype=bool),
+            "value": value}
+
+def _sequential_sum(values, axis):
+    # Left-to-right float sum, the order the libraries accumulate trees in
+    return np.add.accumulate(values, axis=axis).take(-1, axis=axis)
+
+class CompiledModel:
+    """Base class: flat traversal for small batches, the original model in row blocks for large ones."""
+
+    def _dispatch(self, method, X):
+        if len(X) > NATIVE_ROWS:
+            fn = getattr(self.model, method)
+            if len(X) <= CHUNK_ROWS or MAX_THREADS == 1:
+                return fn(X)
+            parts = [X[i:i + CHUNK_ROWS] for i in range(0, len(X), CHUNK_ROWS)]
+            return np.concatenate(list(_thread_pool().map(fn, parts)))
+        return getattr(self, "_" + method)(np.ascontiguousarray(X, dtype=np.float32))
+
+    def predict_proba(self, X):
+        return self._dispatch("predict_proba", X)
+
+    def predict(self, X):
+        return self._dispatch("predict", X)
+
+# --- sklearn random forest / extra trees / single decision tree ---
+class CompiledForest(CompiledModel):
+    def __init__(self, model):
+        from sklearn.base import is_classifier
+        self.model = model
+        self.classifier = is_classifier(model)
+        self.classes_ = getattr(model, "classes_", None)
+        self.n_features_in_ = model.n_features_in_
+        estimators = getattr(model, "estimators_", [model])
+        legacy = _sklearn_version() < (1, 4)  # older trees store counts, normalised at predict time
+        trees = []
+        for est in estimators:
+            value = est.tree_.value[:, 0, :]
+            if self.classifier:
+                value = value[:, :len(self.classes_)]
+                if legacy:
+                    normalizer = value.sum(axis=1)[:, None]
+                    normalizer[normalizer == 0.0] = 1.0
+                    value = value / normalizer
+            else:
+                value = value[:, :1]
+            trees.append(_sklearn_tree(est, value))
+        self.trees = FlatTrees(trees)
+        self.single = estimators == [model]
+
+    def _predict_proba(self, X):
+        out = _sequential_sum(self.trees.value.take(self.trees.apply(X), axis=0), axis=1)
+        if not self.single:
+            out /= self.trees.n_trees
+        return out
+
+    def _predict(self, X):
+        out = self._predict_proba(X)
+        if self.classifier:
+            return self.classes_.take(np.argmax(out, axis=1), axis=0)
+        return out[:, 0]
+
+# --- sklearn gradient boosting ---
+class CompiledGradientBoosting(CompiledModel):
+    def __init__(self, model):
+        from sklearn.base import is_classifier
+        self.model = model  # init estimator and loss link stay sklearn's own
+        self.classifier = is_classifier(model)
+        self.classes_ = getattr(model, "classes_", None)
+        self.n_features_in_ = model.n_features_in_
+        self.learning_rate = model.learning_rate
+        self.k = model.estimators_.shape[1]
+        estimators = model.estimators_.ravel()  # stage-major, class-minor: predict_stages order
+        self.trees = FlatTrees([_sklearn_tree(est, est.tree_.value[:, 0, 0]) for est in estimators])
+
+    def _decision_function(self, X):
+        steps = self.learning_rate * self.trees.value.take(self.trees.apply(X))
+        raw = self.model._raw_predict_init(X)
+        raw = _sequential_sum(np.concatenate([raw[:, None, :], steps.reshape(len(X), -1, self.k)], axis=1), axis=1)
+        return raw.ravel() if raw.shape[1] == 1 else raw
+
+    def decision_function(self, X):
+        return self._dispatch("decision_function", X)
+
+    def _predict_proba(self, X):
+        return self.model._loss.predict_proba(self._decision_function(X))
+
+    def _predict(self, X):
+        raw = self._decision_function(X)
+        if not self.classifier:
+            return raw
+        encoded = (raw >= 0).astype(int) if raw.ndim == 1 else np.argmax(raw, axis=1)
+        return self.classes_[encoded]
+
+# --- XGBoost (gbtree, numerical splits) ---
+def _expf(x):
+    # Correctly rounded float32 exp, as XGBoost's expf
+    return np.exp(x.astype(np.float64)).astype(np.float32)
+
+class CompiledXGBoost(CompiledModel):
+    def __init__(self, model):
+        self.model = model
+        self.classes_ = getattr(model, "classes_", None)
+        self.n_features_in_ = model.n_features_in_
+        learner = json.loads(model.get_booster().save_raw("json"))["learner"]
+        booster = learner["gradient_booster"]
+        if booster["name"] != "gbtree":
+            raise TypeError(f"booster {booster['name']} is not supported")
+        self.objective = learner["objective"]["name"]
+        if self.objective not in ("binary:logistic", "multi:softprob"):
+            raise TypeError(f"objective {self.objective} is not supported")
+        trees = []
+        for tree in booster["model"]["trees"]:
+            if any(tree.get("split_type", [])):
+                raise TypeError("categorical splits are not supported")
+            split = np.asarray(tree["split_conditions"], dtype=np.float32)  # leaf weight at leaves
+            trees.append({"feature": np.asarray(tree["split_indices"]), "threshold": split,
+                          "left": np.asarray(tree["left_children"]), "right": np.asarray(tree["right_children"]),
+                          "default_left": np.asarray(tree["default_left"], dtype=bool), "value": split})
+        self.trees = FlatTrees(trees, strict=True, threshold_dtype=np.float32)
+        self.groups = np.asarray(booster["model"]["tree_info"])
+        self.n_groups = int(self.groups.max()) + 1
+        self.base_margin = self._base_margin(learner)
+
+    def _base_margin(self, learner):
+        # base_score is stored in output space; XGBoost converts it with float32 math
+        score = np.asarray(json.loads(learner["learner_model_param"]["base_score"]), dtype=np.float32)
+        if self.objective == "binary:logistic":
+            score = -np.log(np.float32(1.0) / score - np.float32(1.0))
+        return np.broadcast_to(score.reshape(-1), (self.n_groups,)).astype(np.float32)
+
+    def _margin(self, X):
+        leaf_values = self.trees.value.take(self.trees.apply(X))
+        margin = np.empty((len(X), self.n_groups), dtype=np.float32)
+        for g in range(self.n_groups):
+            base = np.full((len(X), 1), self.base_margin[g], dtype=np.float32)
+            margin[:, g] = _sequential_sum(np.hstack([base, leaf_values[:, self.groups == g]]), axis=1)
+        return margin
+
+    def _predict_proba(self, X):
+        margin = self._margin(X)
+        if self.objective == "binary:logistic":
+            p = np.float32(1.0) / (_expf(np.minimum(-margin[:, 0], np.float32(88.7))) + np.float32(1.0))
+            return np.vstack((np.float32(1.0) - p, p)).T
+        e = _expf(margin - margin.max(axis=1, keepdims=True))
+        total = _sequential_sum(e.astype(np.float64), axis=1)  # XGBoost sums in double
+        return e / total.astype(np.float32)[:, None]
+
+    def _predict(self, X):
+        proba = self._predict_proba(X)
+        encoded = (proba[:, 1] > 0.5).astype(int) if self.objective == "binary:logistic" else np.argmax(proba, axis=1)
+        return self.classes_[encoded] if self.classes_ is not None else encoded
+
+    def _dispatch(self, method, X):
+        if len(X) > NATIVE_ROWS:  # XGBoost's own predictor is already multi-threaded
+            return getattr(self.model, method)(X)
+        return super()._dispatch(method, X)
+
+# --- VotingClassifier: compiled members, sklearn's voting rule ---
+class CompiledVoting(CompiledModel):
+    def __init__(self, model):
+        self.model = model
+        self.classes_ = model.classes_
+        self.n_features_in_ = model.n_features_in_
+        self.members = [compile_model(est) or est for est in model.estimators_]
+        self.weights = model._weights_not_none
+
+    def _dispatch(self, method, X):
+        if len(X) > NATIVE_ROWS:
+            return super()._dispatch(method, X)
+        return getattr(self, "_" + method)(X)  # members that stay uncompiled get X unchanged
+
+    def _predict_proba(self, X):
+        probas = np.asarray([m.predict_proba(X) for m in self.members])
+        return np.average(probas, axis=0, weights=self.weights)
+
+    def _predict(self, X):
+        if self.model.voting == "soft":
+            maj = np.argmax(self._predict_proba(X), axis=1)
+        else:
+            predictions = np.asarray([m.predict(X) for m in self.members]).T
+            votes = np.zeros((len(predictions), len(self.classes_)))
+            weights = self.weights if self.weights is not None else np.ones(len(self.members))
+            for j, w in enumerate(weights):  # bincount order: estimator by estimator
+                votes[np.arange(len(predictions)), predictions[:, j]] += w
+            maj = np.argmax(votes, axis=1)
+        return self.model.le_.inverse_transform(maj)
+
+def compile_model(model):
+    """Returns a compiled equivalent of model, or None if it is not a supported tree ensemble."""
+    from sklearn.ensemble import (ExtraTreesClassifier, ExtraTreesRegressor, GradientBoostingClassifier,
+                                  GradientBoostingRegressor, RandomForestClassifier, RandomForestRegressor,
+                                  VotingClassifier)
+    from sklearn.tree import BaseDecisionTree
+    if getattr(model, "n_outputs_", 1) != 1:
+        return None
+    if isinstance(model, (RandomForestClassifier, RandomForestRegressor, ExtraTreesClassifier,
+                          ExtraTreesRegressor, BaseDecisionTree)):
+        return CompiledForest(model)
+    if isinstance(model, (GradientBoostingClassifier, GradientBoostingRegressor)):
+        return CompiledGradientBoosting(model)
+    if isinstance(model, VotingClassifier):
+        compiled = CompiledVoting(model)
+        return compiled if any(m is not e for m, e in zip(compiled.members, model.estimators_)) else None
+    if type(model).__module__.startswith("xgboost"):
+        try:
+            return CompiledXGBoost(model)
+        except TypeError:
+            return None
+    return None
+
+# === Parity and speed against the original models ===
+CHECK_BYTES = 512 * 2**20
+
+def _best_ms(fn, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+def check_model(name, model, rows=100_000, seed=0):
+    compiled = compile_model(model)
+    if compiled is None:
+        return name, None
+    rows = min(rows, max(NATIVE_ROWS * 4, CHECK_BYTES // (8 * model.n_features_in_)))  # skin rows are 1664 wide
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(rows, model.n_features_in_))
+    method = "predict_proba" if hasattr(model, "predict_proba") and not hasattr(model, "voting") else "predict"
+    result = {"method": method, "rows": rows}
+    for label, Z in (("small", X[:NATIVE_ROWS]), ("large", X)):  # both leaf lookup paths
+        ref, out = np.asarray(getattr(model, method)(Z)), np.asarray(getattr(compiled, method)(Z))
+        if np.issubdtype(ref.dtype, np.number):
+            result[f"{label}_max_diff"] = float(np.max(np.abs(ref.astype(float) - out.astype(float))))
+        else:
+            result[f"{label}_max_diff"] = float(np.mean(ref != out))
+    ulp = np.finfo(np.float32).eps if ref.dtype == np.float32 else 0.0
+    result["ok"] = max(result["small_max_diff"], result["large_max_diff"]) <= ulp
+    result["labels_equal"] = bool(np.array_equal(model.predict(X), compiled.predict(X)))
+    result["one_row_ms"] = (_best_ms(lambda: getattr(model, method)(X[:1]), 20),
+                            _best_ms(lambda: getattr(compiled, method)(X[:1]), 20))
+    result["many_rows_ms"] = (_best_ms(lambda: getattr(model, method)(X), 2),
+                              _best_ms(lambda: getattr(compiled, method)(X), 2))
+    return name, result
+
+COMPILE_TARGETS = ["heart.random_forest", "heart.gradient_boosting", "skin.random_forest",
+                   "skin.xgboost", "skin.voting"]
+
+if __name__ == "__main__":
+    import model_registry
+
+    parser = argparse.ArgumentParser(description="Parity and speed of compiled tree ensembles.")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--models", nargs="*", default=COMPILE_TARGETS, help="registry names")
+    args = parser.parse_args()
+
+    failed = False
+    for key in args.models:
+        try:
+            name, r = check_model(key, model_registry.load(key, compiled=False), args.rows)
+        except Exception as e:
+            print(f"SKIP {key}: {e}")
+            continue
+        if r is None:
+            print(f"SKIP {key}: not a supported tree ensemble")
+            continue
+        failed |= not (r["ok"] and r["labels_equal"])
+        (ref1, fast1), (refn, fastn) = r["one_row_ms"], r["many_rows_ms"]
+        diff = max(r["small_max_diff"], r["large_max_diff"])
+        print(f"{'OK  ' if r['ok'] and r['labels_equal'] else 'FAIL'} {key} ({r['method']}, max diff {diff:.1e}, "
+              f"labels {'equal' if r['labels_equal'] else 'DIFFER'}): "
+              f"1 row {ref1:.2f} -> {fast1:.2f} ms ({ref1 / fast1:.1f}x), "
+              f"{r['rows']} rows {refn:.0f} -> {fastn:.0f} ms ({refn / fastn:.1f}x)")
+    raise SystemExit(1 if failed else 0)
@@ -0,0 +1,316 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import parselmouth
+from parselmouth.praat import call
+
+from stage_timer import stage, timed
+
+# === Voice feature extraction (Praat) ===
+# The point process and harmonicity are built once per sound. Jitter and
+# shimmer come from the glottal period and peak amplitude arrays in one NumPy
+# pass, using Praat's own definitions (PointProcess / AmplitudeTier jitter and
+# shimmer, with the same period and amplitude factors). They match the
+# per-measure "Get jitter"/"Get shimmer" calls to within TOLERANCE (float
+# rounding only), so models trained on Praat features need no retraining.
+#
+# Speed: that step is 1.3-3.8x faster than the nine Praat calls it replaces
+# (1-35 ms saved), but the point process and Harmonicity (cc) take over 90%
+# of the time, so a whole file is only ~1.0-1.2x faster than the per-call
+# version (1.0x on 5 s recordings and on long 44.1 kHz audio). The first call
+# in a process also pays the scipy.io import in read_wav (~150 ms).
+
+PITCH_FLOOR = 75
+PITCH_CEILING = 600
+PERIOD_FLOOR = 0.0001
+PERIOD_CEILING = 0.02
+MAX_PERIOD_FACTOR = 1.3
+MAX_AMPLITUDE_FACTOR = 1.6
+TOLERANCE = 1e-9  # max relative difference against the per-call Praat version
+
+# Optional speed-up: Harmonicity (cc) dominates the cost and scales with the
+# sample rate. Analysing 44.1 kHz audio at 16 kHz is ~4x faster but moves
+# jitter/shimmer/HNR by up to ~5% relative, so it is opt-in.
+FAST_SAMPLE_RATE = 16000
+
+# Not measured from audio; constants the Parkinson's models were trained with
+PLACEHOLDER_FEATURES = {"RPDE": 0.81, "DFA": 1.34, "PPE": 0.005, "age": 65.0, "sex": 1.0}
+
+# PCM scaling Praat applies when it reads a WAV (8-bit WAV is unsigned)
+_PCM_SCALE = {np.dtype(np.uint8): 128.0, np.dtype(np.int16): 32768.0, np.dtype(np.int32): 2147483648.0}
+
+def _mean(values):
+    return float(values.mean()) if values.size else float("nan")
+
+def _ratio(a, b):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.maximum(a, b) / np.minimum(a, b)
+
+def _windows(values, size):
+    return np.lib.stride_tricks.sliding_window_view(values, size)
+
+# === Point process ===
+def point_times(pp):
+    # One call for all glottal pulse times instead of one per measure
+    return np.asarray(call(pp, "To Matrix").values, dtype=np.float64).reshape(-1)
+
+def peak_amplitudes(snd, pp):
+    tier = call([snd, pp], "To AmplitudeTier (period)", 0, 0, PERIOD_FLOOR, PERIOD_CEILING, MAX_PERIOD_FACTOR)
+    table = np.asarray(call(call(tier, "Down to TableOfReal"), "To Matrix").values, dtype=np.float64)
+    if table.size == 0:
+        return np.empty(0), np.empty(0)
+    return table[:, 0], table[:, 1]
+
+def _valid_periods(periods):
+    # Praat's isPeriod(): in range, and not out of factor with both neighbours
+    ok = (periods > 0) & (periods >= PERIOD_FLOOR) & (periods <= PERIOD_CEILING)
+    prev = np.r_[np.nan, periods[:-1]]
+    nxt = np.r_[periods[1:], np.nan]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        prev_factor = periods / prev
+        next_factor = periods / nxt
+    has_prev = np.isfinite(prev_factor)
+    has_next = np.isfinite(next_factor)
+    prev_bad = has_prev & ((prev_factor > MAX_PERIOD_FACTOR) | (1 / prev_factor > MAX_PERIOD_FACTOR))
+    next_bad = has_next & ((next_factor > MAX_PERIOD_FACTOR) | (1 / next_factor > MAX_PERIOD_FACTOR))
+    return ok & (has_prev | has_next) & ~(prev_bad & (next_bad | ~has_next))
+
+# === Jitter family from pulse times ===
+def jitter_measures(times):
+    nan = float("nan")
+    periods = np.diff(times)
+    n = len(periods)
+    if n < 2:
+        return {"local": nan, "local_absolute": nan, "rap": nan, "ppq5": nan}
+
+    in_range = (periods >= PERIOD_FLOOR) & (periods <= PERIOD_CEILING)
+    mean_period = _mean(periods[_valid_periods(periods)])
+
+    # local: consecutive period differences
+    p1, p2 = periods[:-1], periods[1:]
+    ok = in_range[:-1] & in_range[1:] & (_ratio(p1, p2) <= MAX_PERIOD_FACTOR)
+    count = n - np.count_nonzero(~ok)
+    local_abs = np.abs(p1 - p2)[ok].sum() / (count - 1) if count >= 2 else nan
+
+    # rap: three-period running average
+    rap = nan
+    if n >= 3:
+        w = _windows(periods, 3)
+        ok = _windows(in_range, 3).all(axis=1) & (_ratio(w[:, 1:], w[:, :-1]) <= MAX_PERIOD_FACTOR).all(axis=1)
+        count = n - np.count_nonzero(~ok)
+        if count >= 3:
+            rap = np.abs(w[:, 1] - w.mean(axis=1))[ok].sum() / (count - 2) / mean_period
+
+    # ppq5: five-period running average
+    ppq5 = nan
+    if n >= 5:
+        w = _windows(periods, 5)
+        ok = _windows(in_range, 5).all(axis=1) & (_ratio(w[:, 1:], w[:, :-1]) <= MAX_PERIOD_FACTOR).all(axis=1)
+        count = n - np.count_nonzero(~ok)
+        if count >= 5:
+            ppq5 = np.abs(w[:, 2] - w.mean(axis=1))[ok].sum() / (count - 4) / mean_period
+
+    return {"local": local_abs / mean_period, "local_absolute": local_abs, "rap": rap, "ppq5": ppq5}
+
+# === Shimmer family from per-period peak amplitudes ===
+def shimmer_measures(times, amplitudes):
+    nan = float("nan")
+    if len(amplitudes) < 2:
+        return {"local": nan, "local_dB": nan, "apq3": nan, "apq5": nan, "apq11": nan}
+
+    periods = np.diff(times)
+    in_range = (periods >= PERIOD_FLOOR) & (periods <= PERIOD_CEILING)
+    mean_amplitude = np.abs(amplitudes[:-1]).mean()
+
+    a1, a2 = amplitudes[:-1], amplitudes[1:]
+    ok = in_range & (_ratio(a1, a2) <= MAX_AMPLITUDE_FACTOR)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        local = _mean(np.abs(a1 - a2)[ok]) / mean_amplitude
+        local_db = _mean(np.abs(20 * np.log10(a2[ok] / a1[ok])))
+
+    result = {"local": local, "local_dB": local_db}
+    for size in (3, 5, 11):
+        if len(amplitudes) < size:
+            result[f"apq{size}"] = nan
+            continue
+        w = _windows(amplitudes, size)
+        ok = _windows(in_range, size - 1).all(axis=1) & (_ratio(w[:, 1:], w[:, :-1]) <= MAX_AMPLITUDE_FACTOR).all(axis=1)
+        result[f"apq{size}"] = _mean(np.abs(w[:, size // 2] - w.mean(axis=1))[ok]) / mean_amplitude
+    return result
+
+# === WAV input ===
+def read_wav(path):
+    """parselmouth.Sound for a WAV file, read through a memory map.
+
+    Samples go straight from the mapped file into the float buffer Praat
+    analyses, with no intermediate copy of the file; the values are the ones
+    parselmouth.Sound(path) produces. Formats scipy cannot map fall back to Praat's reader.
+    """
+    from scipy.io import wavfile
+    try:
+        rate, data = wavfile.read(path, mmap=True)
+    except ValueError:
+        return parselmouth.Sound(path)
+    scale = _PCM_SCALE.get(data.dtype)
+    samples = np.empty(data.shape[::-1], dtype=np.float64)  # (channels, samples), as Praat stores them
+    if data.ndim == 1:
+        np.copyto(samples, data)
+    else:
+        np.copyto(samples, data.T)
+    if data.dtype == np.uint8:
+        samples -= 128.0
+    if scale is not None:
+        samples /= scale
+    return parselmouth.Sound(samples, sampling_frequency=rate)
+
+def as_sound(audio, sample_rate=None):
+    """parselmouth.Sound from a Sound, a WAV path, or an in-memory sample array.
+
+    Arrays are (samples,) or (samples, channels) at sample_rate, float in
+    [-1, 1] as recorded by sounddevice; nothing is written to disk.
+    """
+    if isinstance(audio, parselmouth.Sound):
+        return audio
+    if isinstance(audio, (str, os.PathLike)):
+        with stage("voice.read_wav"):
+            return read_wav(audio)
+    if sample_rate is None:
+        raise ValueError("sample_rate is required for in-memory audio")
+    samples = np.asarray(audio, dtype=np.float64)
+    return parselmouth.Sound(samples.T if samples.ndim == 2 else samples, sampling_frequency=sample_rate)
+
+# === Feature dicts used by park_gui and py3_gui ===
+def _measure(snd, max_sample_rate=None):
+    if max_sample_rate and snd.sampling_frequency > max_sample_rate:
+        with stage("voice.resample"):
+            snd = snd.resample(max_sample_rate)
+
+    with stage("voice.point_process"):
+        pp = call(snd, "To PointProcess (periodic, cc)", PITCH_FLOOR, PITCH_CEILING)
+    with stage("voice.harmonicity"):
+        hnr_obj = call(snd, "To Harmonicity (cc)", 0.01, PITCH_FLOOR, 0.1, 1.0)
+        hnr = call(hnr_obj, "Get mean", 0, 0)
+
+    with stage("voice.jitter"):
+        jitter = jitter_measures(point_times(pp))
+    with stage("voice.shimmer"):
+        shimmer = shimmer_measures(*peak_amplitudes(snd, pp))
+
+    features = {
+        "Jitter(%)": jitter["local"],
+        "Jitter(Abs)": jitter["local_absolute"],
+        "Jitter:RAP": jitter["rap"],
+        "Jitter:PPQ5": jitter["ppq5"],
+        "Jitter:DDP": 3 * jitter["rap"],
+        "Shimmer": shimmer["local"],
+        "Shimmer(dB)": shimmer["local_dB"],
+        "Shimmer:APQ3": shimmer["apq3"],
+        "Shimmer:APQ5": shimmer["apq5"],
+        "Shimmer:APQ11": shimmer["apq11"],
+        "Shimmer:DDA": 3 * shimmer["apq3"],
+        "NHR": 1 / (hnr + 1e-6),
+        "HNR": hnr,
+    }
+    features.update(PLACEHOLDER_FEATURES)
+    return features, snd, pp
+
+@timed("voice.extract_features")
+def extract_features(audio, max_sample_rate=None, sample_rate=None):
+    """Parkinson's features from a Sound, a WAV path, or samples at sample_rate."""
+    return _measure(as_sound(audio, sample_rate), max_sample_rate)[0]
+
+def extract_features_from_wav(path, max_sample_rate=None):
+    return extract_features(path, max_sample_rate)
+
+# The UPDRS regressor (py3_gui) adds mean intensity and the glottal pulse
+# count to the same measures, reusing the point process built above
+@timed("voice.extract_updrs_features")
+def extract_updrs_features(audio, max_sample_rate=None, sample_rate=None):
+    features, snd, pp = _measure(as_sound(audio, sample_rate), max_sample_rate)
+    with stage("voice.intensity"):
+        intensity = call(snd, "To Intensity", PITCH_FLOOR, 0.0, "yes")
+        features["Intensity"] = call(intensity, "Get mean", 0, 0, "energy")
+    features["Final PointProcess"] = float(call(pp, "Get number of points"))
+    return features
+
+def extract_updrs_features_from_wav(path, max_sample_rate=None):
+    return extract_updrs_features(path, max_sample_rate)
+
+def _updrs_or_error(path, max_sample_rate):
+    try:
+        return extract_updrs_features_from_wav(path, max_sample_rate), None
+    except Exception as e:
+        return None, " ".join(str(e).split()) or type(e).__name__
+
+def extract_updrs_features_from_wavs(paths, max_sample_rate=None, workers=None):
+    """[(features or None, error or None)] per path, in order; several files run in a process pool."""
+    workers = min(workers or os.cpu_count() or 1, len(paths))
+    if workers <= 1:
+        return [_updrs_or_error(path, max_sample_rate) for path in paths]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_updrs_or_error, paths, [max_sample_rate] * len(paths)))
+
+# Original one-call-per-measure version, kept as the reference for check_parity
+def extract_features_reference(path):
+    snd = parselmouth.Sound(path)
+    pitch = call(snd, "To Pitch", 0.0, 75, 600)
+    pp = call(snd, "To PointProcess (periodic, cc)", 75, 600)
+    hnr_obj = call(snd, "To Harmonicity (cc)", 0.01, 75, 0.1, 1.0)
+    hnr = call(hnr_obj, "Get mean", 0, 0)
+
+    return {
+        "Jitter(%)": call(pp, "Get jitter (local)", 0, 0, 0.0001, 0.02, 1.3),
+        "Jitter(Abs)": call(pp, "Get jitter (local, absolute)", 0, 0, 0.0001, 0.02, 1.3),
+        "Jitter:RAP": call(pp, "Get jitter (rap)", 0, 0, 0.0001, 0.02, 1.3),
+        "Jitter:PPQ5": call(pp, "Get jitter (ppq5)", 0, 0, 0.0001, 0.02, 1.3),
+        "Jitter:DDP": 3 * call(pp, "Get jitter (rap)", 0, 0, 0.0001, 0.02, 1.3),
+        "Shimmer": call([snd, pp], "Get shimmer (local)", 0, 0, 0.0001, 0.02, 1.3, 1.6),
+        "Shimmer(dB)": call([snd, pp], "Get shimmer (local_dB)", 0, 0, 0.0001, 0.02, 1.3, 1.6),
+        "Shimmer:APQ3": call([snd, pp], "Get shimmer (apq3)", 0, 0, 0.0001, 0.02, 1.3, 1.6),
+        "Shimmer:APQ5": call([snd, pp], "Get shimmer (apq5)", 0, 0, 0.0001, 0.02, 1.3, 1.6),
+        "Shimmer:APQ11": call([snd, pp], "Get shimmer (apq11)", 0, 0, 0.0001, 0.02, 1.3, 1.6),
+        "Shimmer:DDA": 3 * call([snd, pp], "Get shimmer (apq3)", 0, 0, 0.0001, 0.02, 1.3, 1.6),
+        "NHR": 1 / (hnr + 1e-6),
+        "HNR": hnr,
+        "RPDE": 0.81, "DFA": 1.34, "PPE": 0.005, "age": 65.0, "sex": 1.0
+    }
+
+def _relative_error(a, b):
+    if np.isnan(a) and np.isnan(b):
+        return 0.0
+    return abs(a - b) / max(abs(b), 1e-300)
+
+def check_parity(path, repeats=3, max_sample_rate=None):
+    """Times both implementations on one file.
+
+    Returns (max relative error, speedup, reference seconds, fast seconds).
+    """
+    def best_of(fn, *args):
+        best, out = float("inf"), None
+        for _ in range(repeats):
+            start = time.perf_counter()
+            out = fn(path, *args)
+            best = min(best, time.perf_counter() - start)
+        return out, best
+
+    reference, ref_time = best_of(extract_features_reference)
+    fast, fast_time = best_of(extract_features_from_wav, max_sample_rate)
+    error = max(_relative_error(fast[k], reference[k]) for k in reference)
+    return error, ref_time / fast_time, ref_time, fast_time
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare fast voice features with the per-call Praat version.")
+    parser.add_argument("wavs", nargs="+")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--max-sample-rate", type=int, default=None,
+                        help=f"analyse at most at this rate, e.g. {FAST_SAMPLE_RATE} (approximate)")
+    args = parser.parse_args()
+
+    for path in args.wavs:
+        error, speedup, ref_time, fast_time = check_parity(path, args.repeats, args.max_sample_rate)
+        status = "OK" if error <= TOLERANCE else ("APPROX" if args.max_sample_rate else "MISMATCH")
+        print(f"{path}: {ref_time * 1000:.1f} ms -> {fast_time * 1000:.1f} ms "
+              f"({speedup:.2f}x), max rel. error {error:.2e} [{status}]")
@@ -0,0 +1,161 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from startup_timer import lazy_import
+
+# === Streaming microphone analysis ===
+# The sounddevice callback only copies samples into a ring buffer. A worker
+# thread analyses the latest window every hop while audio keeps arriving, so
+# a running estimate is available during capture and the final one is ready
+# as soon as capture stops. Recordings reach the analysis as arrays; saving
+# them to disk is optional and happens off the calling thread.
+
+SAVE_RECORDINGS = os.environ.get("MEDAI_SAVE_RECORDINGS", "1") != "0"
+RECORDINGS_DIR = os.environ.get("MEDAI_RECORDINGS_DIR", "recordings")
+
+class RingBuffer:
+    def __init__(self, capacity):
+        self.data = np.zeros(capacity, dtype=np.float32)
+        self.capacity = capacity
+        self.total = 0  # samples written since start
+        self._lock = threading.Lock()
+
+    def extend(self, samples):
+        count = len(samples)
+        samples = samples[-self.capacity:]
+        with self._lock:
+            start = (self.total + count - len(samples)) % self.capacity
+            first = min(len(samples), self.capacity - start)
+            self.data[start:start + first] = samples[:first]
+            self.data[:len(samples) - first] = samples[first:]
+            self.total += count
+
+    def latest(self, n):
+        # Last n samples (or fewer) in chronological order
+        with self._lock:
+            n = min(n, self.total, self.capacity)
+            end = self.total % self.capacity
+            if n <= end:
+                return self.data[end - n:end].copy()
+            return np.concatenate((self.data[self.capacity - (n - end):], self.data[:end]))
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+class VoiceStream:
+    """Captures mono audio and runs analyze(sound) over sliding windows.
+
+    analyze receives a parselmouth.Sound and returns a number, or None when the
+    window holds no usable voice. It runs on a worker thread; GUIs should poll
+    estimate/elapsed from the Tk thread (e.g. with after) rather than touch
+    widgets from it.
+    """
+
+    def __init__(self, analyze=None, sample_rate=16000, window_seconds=3.0, hop_seconds=0.5,
+                 buffer_seconds=30.0, device=None):
+        self.analyze = analyze
+        self.sample_rate = sample_rate
+        self.window = int(window_seconds * sample_rate)
+        self.hop = int(hop_seconds * sample_rate)
+        self.device = device
+        self.buffer = RingBuffer(int(buffer_seconds * sample_rate))
+        self.estimates = []
+        self.estimate = None
+        self.error = None
+        self._stream = None
+        self._worker = None
+        self._stop = threading.Event()
+        self._new_audio = threading.Event()
+
+    @property
+    def elapsed(self):
+        return self.buffer.total / self.sample_rate
+
+    @property
+    def running(self):
+        return self._stream is not None and not self._stop.is_set()
+
+    def _callback(self, indata, frames, time_info, status):
+        self.buffer.extend(indata[:, 0])
+        self._new_audio.set()
+
+    def start(self):
+        sd = lazy_import("sounddevice")
+        self._stream = sd.InputStream(samplerate=self.sample_rate, channels=1, dtype="float32",
+                                      device=self.device, callback=self._callback)
+        self._stream.start()
+        if self.analyze is not None:
+            self._worker = threading.Thread(target=self._run, daemon=True)
+            self._worker.start()
+        return self
+
+    def _run(self):
+        analysed = 0
+        while not self._stop.is_set():
+            self._new_audio.wait(0.1)
+            self._new_audio.clear()
+            total = self.buffer.total
+            if total - analysed < self.hop or total < self.window:
+                continue
+            analysed = total
+            self._analyse(self.buffer.latest(self.window))
+
+    def _analyse(self, samples):
+        try:
+            parselmouth = lazy_import("parselmouth")
+            value = self.analyze(parselmouth.Sound(samples.astype(np.float64), sampling_frequency=self.sample_rate))
+        except Exception as e:
+            self.error = e
+            return
+        if value is None or not np.isfinite(value):
+            return
+        self.estimates.append(float(value))
+        self.estimate = float(np.mean(self.estimates))
+
+    def stop(self):
+        """Stops capture and returns the final estimate (None if nothing was analysed)."""
+        self._stop.set()
+        if self._stream is not None:
+            self._stream.stop()
+            self._stream.close()
+        if self._worker is not None:
+            self._worker.join()
+        # Short takes never filled a window: analyse what there is once
+        if self.analyze is not None and not self.estimates and len(self.buffer):
+            self._analyse(self.buffer.latest(self.window))
+        return self.estimate
+
+    def recording(self):
+        # Everything captured, up to the last buffer_seconds
+        return self.buffer.latest(self.buffer.capacity)
+
+# === Optional, asynchronous saving ===
+_writer = None
+_writer_lock = threading.Lock()
+
+def _write_wav(path, sample_rate, samples):
+    tmp_path = path + ".part"
+    lazy_import("scipy.io.wavfile").write(tmp_path, sample_rate, samples)
+    os.replace(tmp_path, path)  # never a half-written file under the final name
+    return path
+
+def save_recording(samples, sample_rate, prefix="recording"):
+    """Writes samples to a new, uniquely named WAV in RECORDINGS_DIR on a background thread.
+
+    Returns a Future with the path, or None when MEDAI_SAVE_RECORDINGS=0.
+    Concurrent recordings never share a file name.
+    """
+    global _writer
+    if not SAVE_RECORDINGS:
+        return None
+    with _writer_lock:
+        if _writer is None:
+            _writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="recording-writer")
+    os.makedirs(RECORDINGS_DIR, exist_ok=True)
+    name = f"{prefix}-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}.wav"
+    return _writer.submit(_write_wav, os.path.join(RECORDINGS_DIR, name), sample_rate, np.array(samples))